@@ -1,6 +1,9 @@
 """
 We provide some infrastructure to build extensible database models.
 """
+import os
+import time
+import threading
 from copy import copy
 from datetime import datetime
 try:
@@ -14,6 +17,7 @@ from sqlalchemy import (
     DateTime,
     String,
     Boolean,
+    Unicode,
     desc,
     exc,
     event,
@@ -28,9 +32,19 @@ from sqlalchemy.orm import (
     sessionmaker,
     object_mapper,
     class_mapper,
+    deferred,
 )
 from sqlalchemy.types import TypeDecorator, VARCHAR
-from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
+try:
+    from sqlalchemy.dialects.postgresql import JSON
+except ImportError:  # pragma: no cover
+    # native JSON columns are only supported with sqlalchemy >= 0.9
+    JSON = None
+from sqlalchemy.orm.exc import (
+    NoResultFound, MultipleResultsFound,
+)
 
 from zope.sqlalchemy import ZopeTransactionExtension
 
@@ -38,8 +52,22 @@ from clld.db.versioned import versioned_session
 from clld.util import NO_DEFAULT, UnicodeMixin
 
 
+@event.listens_for(Pool, "connect")
+def record_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
 @event.listens_for(Pool, "checkout")
 def ping_connection(dbapi_connection, connection_record, connection_proxy):
+    pid = os.getpid()
+    if connection_record.info.get('pid', pid) != pid:
+        # the connection was inherited from the parent process: we must neither use nor
+        # close it - closing would terminate the parent's connection as well.
+        connection_record.connection = connection_proxy.connection = None
+        raise exc.DisconnectionError(
+            "Connection record belongs to pid %s, attempting to check out in pid %s"
+            % (connection_record.info['pid'], pid))
+
     cursor = dbapi_connection.cursor()
     try:
         cursor.execute("SELECT 1")
@@ -59,26 +87,204 @@ VersionedDBSession = scoped_session(versioned_session(
     sessionmaker(autoflush=False, extension=ZopeTransactionExtension())))
 
 
+class Replicas(object):
+    """Read replicas of the primary database, handed out round-robin.
+
+    Replicas are checked by opening a connection - i.e. by running the ping on checkout -
+    at most every check_interval seconds; replicas failing the check are skipped until
+    they pass a subsequent check.
+    """
+    def __init__(self, engines=None, check_interval=5):
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.configure(engines or [])
+
+    def configure(self, engines):
+        self.engines = list(engines)
+        self.status = {}
+        self.index = 0
+
+    def check(self, engine):
+        try:
+            engine.connect().close()
+            return True
+        except Exception:
+            return False
+
+    def healthy(self, engine):
+        now = time.time()
+        with self.lock:
+            ok, checked = self.status.get(engine, (True, None))
+        if checked is None or now - checked > self.check_interval:
+            # the check itself may take a while, so we do not hold the lock meanwhile.
+            ok = self.check(engine)
+            with self.lock:
+                self.status[engine] = (ok, now)
+        return ok
+
+    def engine(self):
+        """
+        :return: the next healthy replica or None.
+        """
+        for i in range(len(self.engines)):
+            with self.lock:
+                engine = self.engines[self.index % len(self.engines)]
+                self.index += 1
+            if self.healthy(engine):
+                return engine
+
+
+REPLICAS = Replicas()
+
+
+# Sessions for requests which do not write to the db need neither the zope transaction
+# machinery nor autoflush nor expiration of objects on commit.
+ReadOnlySession = sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+@event.listens_for(ReadOnlySession, "after_begin")
+def set_transaction_read_only(session, transaction, connection):
+    if connection.dialect.name == 'postgresql':  # pragma: no cover
+        connection.execute('SET TRANSACTION READ ONLY')
+
+
+def readonly_session():
+    """Replace the session of DBSession - in the current thread - with a read-only
+    session.
+
+    Read-only sessions are bound to one of the REPLICAS if any is available, otherwise to
+    the primary database.
+
+    :return: the read-only session; it is discarded upon the next call of \
+    DBSession.remove.
+    """
+    DBSession.remove()
+    session = ReadOnlySession(
+        bind=REPLICAS.engine() or DBSession.session_factory.kw.get('bind'))
+    DBSession.registry.set(session)
+    return session
+
+
+def engines():
+    """
+    :return: list of the engines the sessions and the metadata are bound to.
+    """
+    res = []
+    for bind in [
+        DBSession.session_factory.kw.get('bind'),
+        VersionedDBSession.session_factory.kw.get('bind'),
+        Base.metadata.bind,
+    ] + REPLICAS.engines:
+        if bind is not None and hasattr(bind, 'pool') and bind not in res:
+            res.append(bind)
+    return res
+
+
+def prefork(event=None):
+    """Release all sessions and pooled connections of the current process.
+
+    To be called by pre-forking servers before worker processes are forked, so that no
+    connection is shared between processes.
+    """
+    for session in [DBSession, VersionedDBSession]:
+        session.remove()
+    for engine in engines():
+        engine.dispose()
+
+
+def after_fork():
+    """Give the current - forked - process fresh connection pools.
+
+    Connections inherited from the parent are dropped without being closed.
+    """
+    for session in [DBSession, VersionedDBSession]:
+        session.registry.clear()
+    for engine in engines():
+        engine.pool = engine.pool.recreate()
+
+
+def gunicorn_pre_fork(server, worker):  # pragma: no cover
+    """gunicorn pre_fork hook, see http://docs.gunicorn.org/en/latest/settings.html
+    """
+    prefork()
+
+
+def gunicorn_post_fork(server, worker):  # pragma: no cover
+    """gunicorn post_fork hook.
+    """
+    after_fork()
+
+
 class JSONEncodedDict(TypeDecorator):
     """Represents an immutable structure as a json-encoded string.
 
+    On PostgreSQL a native JSON column can be used - if supported by sqlalchemy - by
+    setting clld.native_json = true, once the jsondata columns have been migrated with
+    clld.db.migration.jsondata_to_json. The setting is stored on the dialect of each
+    engine - see JSONEncodedDict.configure - so apps sharing a process don't interfere.
+
     Usage::
 
         JSONEncodedDict(255)
     """
     impl = VARCHAR
 
+    @staticmethod
+    def configure(engine, native=False):
+        """Switch native JSON columns on or off for the connections of engine.
+
+        Must be called before the engine is used, because sqlalchemy caches the
+        dialect-specific type implementation.
+        """
+        engine.dialect.clld_native_json = native
+        return engine
+
+    @staticmethod
+    def native(dialect):
+        return getattr(dialect, 'clld_native_json', False) \
+            and JSON is not None and dialect.name == 'postgresql'
+
+    def load_dialect_impl(self, dialect):
+        if self.native(dialect):
+            return dialect.type_descriptor(JSON())  # pragma: no cover
+        return dialect.type_descriptor(self.impl)
+
     def process_bind_param(self, value, dialect):
-        if value is not None:
+        if value is not None and not self.native(dialect):
             value = json.dumps(value)
         return value
 
     def process_result_value(self, value, dialect):
-        if value is not None:
+        # Note: the DBAPI driver may already have decoded native JSON columns.
+        if isinstance(value, basestring):
             value = json.loads(value)
         return value
 
 
+class json_value(FunctionElement):
+    """SQL expression extracting the value stored for a key in a JSON column on the
+    server, suitable for filtering and sorting::
+
+        DBSession.query(Source).filter(json_value(Source.jsondata, 'gbs_id') == 'x')
+    """
+    type = Unicode()
+    name = 'json_value'
+
+
+@compiles(json_value)
+def _compile_json_value(element, compiler, **kw):
+    col, key = list(element.clauses)
+    return "json_extract(%s, '$.' || %s)" % (
+        compiler.process(col, **kw), compiler.process(key, **kw))
+
+
+@compiles(json_value, 'postgresql')
+def _compile_json_value_pg(element, compiler, **kw):  # pragma: no cover
+    col, key = list(element.clauses)
+    return "(CAST(%s AS JSON) ->> %s)" % (
+        compiler.process(col, **kw), compiler.process(key, **kw))
+
+
 class Base(UnicodeMixin):
     """All our models have an integer primary key which has nothing to do with
     the kind of data stored in a table. 'Natural' candidates for primary keys
@@ -104,8 +310,12 @@ class Base(UnicodeMixin):
     # filters out inactive records.
     active = Column(Boolean, default=True)
 
-    # To allow storage of key,value pairs with typed values:
-    jsondata = Column(JSONEncodedDict)
+    # To allow storage of key,value pairs with typed values. Since the data may be big
+    # and is rarely needed when listing objects, it is only loaded - and decoded - upon
+    # first access; use the query option undefer('jsondata') to load it eagerly.
+    @declared_attr
+    def jsondata(cls):
+        return deferred(Column('jsondata', JSONEncodedDict))
 
     def update_jsondata(self, **kw):
         d = copy(self.jsondata) or {}
@@ -182,6 +392,13 @@ class PolymorphicBaseMixin(object):
     """We use joined table inheritance to allow projects to augment base clld
     models with project specific attributes. This mixin class prepares
     models to serve as base classes for inheritance.
+
+    .. note::
+
+        Plain queries do not join the tables of custom models; attributes of custom
+        models are loaded upon first access. DataTables and detail pages load them
+        eagerly by default, see clld.db.util.with_polymorphic and
+        clld.db.util.load_polymorphic.
     """
     polymorphic_type = Column(String(20))
 
@@ -190,7 +407,6 @@ class PolymorphicBaseMixin(object):
         return {
             'polymorphic_on': cls.polymorphic_type,
             'polymorphic_identity': 'base',
-            'with_polymorphic': '*',
         }
 
 
@@ -204,4 +420,4 @@ class CustomModelMixin(object):
     """
     @declared_attr
     def __mapper_args__(cls):
-        return {'polymorphic_identity': 'custom'}  # pragma: no cover
+        return {'polymorphic_identity': 'custom'}
@@ -0,0 +1,56 @@
+"""
+Functions to be called from the alembic migrations of clld apps.
+
+To switch the jsondata columns of an existing PostgreSQL database to native JSON, add a
+revision to the app's alembic environment::
+
+    from clld.db.migration import jsondata_to_json, jsondata_to_text
+
+    def upgrade():
+        jsondata_to_json(op)
+
+    def downgrade():
+        jsondata_to_text(op)
+
+and set clld.native_json = true in the app config once the migration has run.
+
+Databases created before the introduction of materialized statistics get the statistic
+table with a revision calling add_statistic - and drop_statistic to downgrade.
+"""
+from sqlalchemy.engine.reflection import Inspector
+
+from clld.db.meta import Base
+from clld.db.models.common import Statistic
+
+
+def jsondata_tables(bind):
+    """
+    :return: sorted list of names of the tables in the database with a jsondata column.
+    """
+    inspector = Inspector.from_engine(bind)
+    return sorted(
+        table.name for table in Base.metadata.sorted_tables
+        if 'jsondata' in table.c
+        and table.name in inspector.get_table_names()
+        and 'jsondata' in [c['name'] for c in inspector.get_columns(table.name)])
+
+
+def jsondata_to_json(op):
+    for table in jsondata_tables(op.get_bind()):
+        op.execute(
+            'ALTER TABLE %s ALTER COLUMN jsondata TYPE JSON USING jsondata::json' % table)
+
+
+def jsondata_to_text(op):
+    for table in jsondata_tables(op.get_bind()):
+        op.execute(
+            'ALTER TABLE %s ALTER COLUMN jsondata TYPE VARCHAR '
+            'USING jsondata::text' % table)
+
+
+def add_statistic(op):
+    Statistic.__table__.create(bind=op.get_bind(), checkfirst=True)
+
+
+def drop_statistic(op):
+    Statistic.__table__.drop(bind=op.get_bind(), checkfirst=True)
@@ -24,6 +24,7 @@ from sqlalchemy.orm import (
     relationship,
     validates,
     backref,
+    class_mapper,
 )
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
@@ -49,6 +50,81 @@ class Config(Base):
     value = Column(Unicode)
 
 
+class Statistic(Base):
+    """Materialized counts, computed with clld.db.util.compute_stats when priming the
+    cache.
+
+    Totals per resource are stored with object_type and object_pk set to NULL, counts of
+    related objects per entity - e.g. the number of valuesets for a parameter - with the
+    name of the entity's base model and its pk.
+
+    .. note::
+
+        Statistics are not updated when data is edited; compute_stats must be re-run after
+        edits. Existing databases get the table via clld.db.migration.add_statistic; as
+        long as the table does not exist or is empty, counts are computed live.
+    """
+    __table_args__ = (UniqueConstraint('object_type', 'object_pk', 'key'),)
+    object_type = Column(String)
+    object_pk = Column(Integer)
+    key = Column(String)
+    value = Column(Integer)
+
+    @staticmethod
+    def object_type_for(obj):
+        """
+        :return: Name of the table of the base model for obj, i.e. 'language' for \
+        instances of custom language models.
+        """
+        return class_mapper(type(obj)).base_mapper.class_.__name__.lower()
+
+    # engines of databases known to have a statistic table:
+    _available = set()
+
+    @classmethod
+    def available(cls):
+        """
+        :return: flag signaling whether the database has a statistic table.
+        """
+        conn = DBSession.connection()
+        if conn.engine not in cls._available:
+            if not cls.__table__.exists(bind=conn):
+                return False
+            cls._available.add(conn.engine)
+        return True
+
+    @classmethod
+    def totals(cls):
+        """
+        :return: dict mapping resource names to total counts.
+        """
+        if not cls.available():
+            return {}
+        return dict(DBSession.query(cls.key, cls.value).filter(cls.object_pk == None))
+
+    @classmethod
+    def counts(cls, objs, key):
+        """Retrieve the counts of related objects for a list of objects in one query.
+
+        :return: dict mapping object pks to counts.
+        """
+        objs = list(objs)
+        if not objs or not cls.available():
+            return {}
+        return dict(
+            DBSession.query(cls.object_pk, cls.value)
+            .filter(cls.object_type == cls.object_type_for(objs[0]))
+            .filter(cls.object_pk.in_([obj.pk for obj in objs]))
+            .filter(cls.key == key))
+
+    @classmethod
+    def count(cls, obj, key, default=None):
+        """
+        :return: The materialized count of key-objects related to obj or default.
+        """
+        return cls.counts([obj], key).get(obj.pk, default)
+
+
 class IdNameDescriptionMixin(object):
     """id is to be used as string identifier which can be used for sorting and as
     URL part.
@@ -189,8 +265,14 @@ class Dataset(Base,
     contact = Column(String)
 
     def get_stats(self, resources, **filters):
+        """Unfiltered counts are read from the materialized statistics if available.
+        """
         res = OrderedDict()
+        totals = Statistic.totals()
         for rsc in resources:
+            if rsc.name not in filters and rsc.name in totals:
+                res[rsc.name] = totals[rsc.name]
+                continue
             query = DBSession.query(rsc.model)
             if rsc.name in filters:
                 query = query.filter(filters[rsc.name])
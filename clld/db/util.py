@@ -1,13 +1,52 @@
-from sqlalchemy.orm import joinedload
+from collections import defaultdict
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Full
+from threading import Event
 
-from clld.db.meta import DBSession
+from sqlalchemy import func, create_engine, or_, and_, exists
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, undefer, object_mapper
+
+from clld.db.meta import DBSession, Base
 from clld.db.models import common
+from clld.util import as_utc
 
 
 def icontains(col, qs):
     return col.ilike('%' + qs + '%')
 
 
+def with_polymorphic(query, loading='eager'):
+    """Control how attributes of custom models are loaded for the objects of a query.
+
+    :param query: A query for a single model class, without criteria.
+    :param loading: 'eager' to load attributes of custom models via LEFT OUTER JOINs in \
+    the query itself; 'selectin' to load them in one additional query per custom model \
+    (see load_polymorphic); None to load them upon first access.
+    """
+    if loading == 'eager':
+        return query.with_polymorphic('*')
+    return query
+
+
+def load_polymorphic(objs, session=None):
+    """Load the attributes of custom models for a list of objects, issuing one query per
+    custom model.
+
+    :param session: the session the objects belong to, defaults to DBSession.
+    :return: list of objects.
+    """
+    objs = list(objs)
+    pks = defaultdict(list)
+    for obj in objs:
+        mapper = object_mapper(obj)
+        if mapper.inherits:
+            pks[mapper].append(obj.pk)
+    for mapper, _pks in pks.items():
+        (session or DBSession).query(mapper).filter(mapper.class_.pk.in_(_pks)).all()
+    return objs
+
+
 def compute_language_sources(*references):
     """compute relations between languages and sources by going through the relevant
     models derived from the HasSource mixin.
@@ -34,7 +73,7 @@ def compute_number_of_values():
     """compute number of values per valueset and store it in valueset's jsondata.
     """
     for valueset in DBSession.query(common.ValueSet).options(
-        joinedload(common.ValueSet.values)
+        joinedload(common.ValueSet.values), undefer('jsondata')
     ):
         d = valueset.jsondata if valueset.jsondata else {}
         d['_number_of_values'] = len(valueset.values)
@@ -43,3 +82,217 @@ def compute_number_of_values():
 
 def get_distinct_values(col, key=None):
     return sorted([r[0] for r in DBSession.query(col).distinct() if r[0]], key=key)
+
+
+def _related_counts():
+    """
+    :return: Iterator of (object_type, key, query) triples, where query yields pairs \
+    (object_pk, count).
+    """
+    V, VS = common.Value, common.ValueSet
+    for attr in ['parameter', 'language', 'contribution']:
+        col = getattr(VS, attr + '_pk')
+        yield attr, 'valueset', DBSession.query(col, func.count(VS.pk)).group_by(col)
+        yield attr, 'value', DBSession.query(col, func.count(V.pk))\
+            .join(V, V.valueset_pk == VS.pk).group_by(col)
+    yield 'domainelement', 'value', \
+        DBSession.query(V.domainelement_pk, func.count(V.pk))\
+        .group_by(V.domainelement_pk)
+
+
+def compute_stats(resources=None):
+    """compute total counts per resource and counts of related objects per parameter,
+    language, contribution and domainelement, and store them as Statistic objects.
+
+    Only statistics which changed since the last run are updated. Since statistics are
+    not updated automatically, this must be re-run after each edit of the data.
+    """
+    if resources is None:
+        from clld import RESOURCES as resources
+
+    stats = {}
+    for rsc in resources:
+        stats[(None, None, rsc.name)] = DBSession.query(rsc.model).count()
+    for object_type, key, query in _related_counts():
+        for pk, count in query:
+            if pk is not None:
+                stats[(object_type, pk, key)] = count
+
+    for stat in DBSession.query(common.Statistic):
+        _key = (stat.object_type, stat.object_pk, stat.key)
+        if _key not in stats:
+            DBSession.delete(stat)
+        else:
+            value = stats.pop(_key)
+            if stat.value != value:
+                stat.value = value
+
+    for (object_type, pk, key), value in stats.items():
+        DBSession.add(common.Statistic(
+            object_type=object_type, object_pk=pk, key=key, value=value))
+
+
+def changes(model, since=None, limit=None, since_id=None):
+    """Changes of the objects of a model, as recorded in their created, updated and \
+    active columns and - for versioned models - in their history table.
+
+    Objects marked as inactive count as deleted, as do versioned objects for which only
+    history rows exist; the history row of a deleted object records the time of deletion.
+
+    :param since: datetime - naive datetimes are taken to be in UTC; if None, all \
+    changes are listed.
+    :param limit: maximal number of changes to list.
+    :param since_id: if not None, changes at exactly since are listed as well, for \
+    objects with ids greater than since_id - allowing to resume a listing.
+    :return: list of tuples (change, id, updated, version) where change is one of \
+    'created', 'updated', 'deleted', ordered by time of change and id.
+    """
+    history_mapper = getattr(model, '__history_mapper__', None)
+    cols = [model.id, model.created, model.updated, model.active]
+    if history_mapper:
+        cols.append(model.version)
+
+    res = []
+    # timestamps are read as aware datetimes from PostgreSQL, but as naive datetimes
+    # from SQLite, so we compare them in UTC.
+    since = as_utc(since) if since else None
+
+    def after(updated, id_):
+        if since_id is None:
+            return updated > since
+        return or_(updated > since, and_(updated == since, id_ > since_id))
+
+    query = DBSession.query(*cols)
+    if since:
+        query = query.filter(after(model.updated, model.id))
+    query = query.order_by(model.updated, model.id)
+    if limit:
+        query = query.limit(limit)
+    for row in query:
+        if not row.active:
+            change = 'deleted'
+        elif since is None or (row.created and as_utc(row.created) > since):
+            change = 'created'
+        else:
+            change = 'updated'
+        res.append((change, row.id, row.updated, row.version if history_mapper else None))
+
+    if history_mapper:
+        H = history_mapper.class_
+        last_updated = func.max(H.updated)
+        # objects are looked up by primary key for the history rows in question only,
+        # rather than listing all existing objects.
+        query = DBSession.query(H.id, last_updated, func.max(H.version))\
+            .filter(~exists().where(model.pk == H.pk))
+        if since:
+            query = query.filter(H.updated >= since)
+        query = query.group_by(H.id)
+        if since:
+            query = query.having(after(last_updated, H.id))
+        query = query.order_by(last_updated, H.id)
+        if limit:
+            query = query.limit(limit)
+        for id_, updated, version in query:
+            res.append(('deleted', id_, updated, version))
+
+    res = sorted(res, key=lambda c: (c[2], c[1]))
+    return res[:limit] if limit else res
+
+
+def _blocks(bind, table, blocksize):
+    """
+    :return: generator of lists of row dicts, read from table in streamed chunks.
+    """
+    keys = [col.key for col in table.columns]
+    conn = bind.connect()
+    try:
+        res = conn.execution_options(stream_results=True).execute(table.select())
+        while True:
+            rows = res.fetchmany(blocksize)
+            if not rows:
+                break
+            yield [dict(zip(keys, row)) for row in rows]
+    finally:
+        conn.close()
+
+
+def _parallel_blocks(engine, tables, blocksize, workers):
+    """Read tables concurrently, one connection per worker.
+
+    :return: generator of pairs (table, list of row dicts).
+    """
+    queue = Queue(maxsize=2 * workers)
+    # set when the consumer is done - possibly because of an error - so that readers
+    # blocked on a full queue give up rather than hang.
+    stopped = Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def read(table):
+        try:
+            for block in _blocks(engine, table, blocksize):
+                if not put((table, block)):
+                    break
+        finally:
+            put((table, None))
+
+    pool = ThreadPool(workers)
+    result = pool.map_async(read, tables)
+    try:
+        pending = len(tables)
+        while pending:
+            table, block = queue.get()
+            if block is None:
+                pending -= 1
+            else:
+                yield table, block
+    finally:
+        stopped.set()
+        pool.close()
+        pool.join()
+    # re-raise errors from the readers:
+    result.get()
+
+
+def dump_sqlite(bind, fname, metadata=None, blocksize=10000, workers=1):
+    """Copy all tables of a database into a new SQLite database.
+
+    Rows are read in streamed chunks via Core selects and inserted via executemany in a
+    single transaction.
+
+    :param bind: engine or connection of the source database.
+    :param fname: path of the SQLite database file to create.
+    :param metadata: MetaData of the tables to copy; defaults to Base.metadata.
+    :param workers: number of tables read concurrently; only used if bind is an engine.
+    :return: fname
+    """
+    metadata = metadata or Base.metadata
+    tables = metadata.sorted_tables
+    target = create_engine('sqlite:///%s' % fname)
+    metadata.create_all(target)
+
+    if workers > 1 and isinstance(bind, Engine):
+        blocks = _parallel_blocks(bind, tables, blocksize, workers)
+    else:
+        blocks = (
+            (table, block) for table in tables
+            for block in _blocks(bind, table, blocksize))
+
+    conn = target.connect()
+    try:
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA journal_mode = MEMORY')
+        with conn.begin():
+            for table, block in blocks:
+                conn.execute(table.insert(), block)
+    finally:
+        conn.close()
+    target.dispose()
+    return fname
@@ -1,6 +1,8 @@
 """
 Support for per-record versioning; based on an sqlalchemy recipe.
 """
+from datetime import datetime
+
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import mapper, attributes, object_mapper
 from sqlalchemy.orm.exc import UnmappedColumnError
@@ -179,6 +181,9 @@ def create_version(obj, session, deleted=False):
         return  # pragma: no cover
 
     attr['version'] = obj.version
+    if deleted and 'updated' in attr:
+        # the history row of a deleted object records the time of deletion.
+        attr['updated'] = datetime.utcnow()
     hist = history_cls()
     for key, value in attr.items():
         setattr(hist, key, value)
@@ -42,6 +42,10 @@ class App(object):
     def www(self):
         return self.home.joinpath('www')
 
+    @property
+    def static_site(self):
+        return self.www.joinpath('static-site')
+
     @property
     def config(self):
         return self.home.joinpath('config.ini')
@@ -98,6 +98,24 @@ def create_downloads(environment):
     execute(util.create_downloads, APP)
 
 
+@hosts('localhost')
+@task
+def prime_caches(environment, top=500):
+    """replay the most popular requests, to prime the caches of the app
+    """
+    _assign_host(environment)
+    execute(util.prime_caches, APP, top=top)
+
+
+@hosts('localhost')
+@task
+def export_static(environment, force=False):
+    """export the app as static site, to be served by nginx
+    """
+    _assign_host(environment)
+    execute(util.export_static, APP, force=force)
+
+
 @hosts('localhost')
 @task
 def copy_files(environment):
@@ -91,7 +91,37 @@ server {{
 
     root {app.www};
 
+    # the manifest and the types of the static site export are not to be served:
+    location ~ /\.|\.types$ {{
+            return 404;
+    }}
+
+    # pages exported with clld.scripts.export_static are served as files, unless the
+    # request has a query string or asks for a format other than HTML.
     location / {{
+{auth}
+            # set while the app is primed after a deployment:
+            if (-f {app.www}/maintenance) {{
+                return 503;
+            }}
+            root {app.static_site};
+            include {app.static_site}/*.types;
+            charset utf-8;
+            error_page 418 = @app;
+            set $dynamic "";
+            if ($args) {{
+                set $dynamic 1;
+            }}
+            if ($http_accept !~ "text/html|\*/\*|^$") {{
+                set $dynamic 1;
+            }}
+            if ($dynamic) {{
+                return 418;
+            }}
+            try_files $uri $uri.html $uri/index.html @app;
+    }}
+
+    location @app {{
 {auth}
             proxy_pass_header Server;
             proxy_set_header Host $http_host;
@@ -100,7 +130,7 @@ server {{
             proxy_set_header X-Scheme $scheme;
             proxy_connect_timeout 10;
             proxy_read_timeout 10;
-            proxy_pass http://127.0.0.1:{app.port}/;
+            proxy_pass http://127.0.0.1:{app.port};
     }}
 
     location /clld-static/ {{
@@ -206,6 +236,9 @@ sqlalchemy.url = {app.sqlalchemy_url}
 exclog.extra_info = true
 clld.environment = production
 clld.files = {app.www}/files
+clld.load_templates = true
+clld.warm_up = true
+mako.module_directory = {app.home}/mako_modules
 
 %s
 
@@ -214,6 +247,9 @@ use = egg:waitress#main
 host = 0.0.0.0
 port = {app.port}
 workers = {app.workers}
+preload_app = true
+pre_fork = clld.db.meta.gunicorn_pre_fork
+post_fork = clld.db.meta.gunicorn_post_fork
 proc_name = {app.name}
 
 [loggers]
@@ -373,6 +409,34 @@ def http_auth(app):
     return ''
 
 
+@task
+def prime_caches(app, top=500, url=None):
+    """replay the most popular requests of the previous day - or the URLs of the sitemap,
+    if there is no access log of the previous day.
+
+    By default requests are sent through nginx, to prime varnish as well, if the app is
+    cached.
+    """
+    access_log = app.logs.joinpath('access.log.1')
+    with virtualenv(app.venv):
+        sudo('python -m clld.scripts.prime_caches %s%s --top %s --url %s' % (
+            app.config,
+            ' --log %s' % access_log if exists(access_log) else '',
+            top,
+            url or 'http://%s' % app.domain))
+
+
+@task
+def export_static(app, force=False):
+    require.files.directory(app.static_site, use_sudo=True)
+    sudo('chown {0.name} {0.static_site}'.format(app))
+    with virtualenv(app.venv):
+        sudo(
+            'python -m clld.scripts.export_static %s %s --base-url http://%s%s' % (
+                app.config, app.static_site, app.domain, ' --force' if force else ''),
+            user=app.name)
+
+
 @task
 def copy_files(app):
     data_dir = data_file(import_module(app.name))
@@ -425,7 +489,7 @@ def deploy(app, environment, with_alembic=False):
         require.python.package('gunicorn', use_sudo=True)
         install_repos('clld')
         install_repos(app.name)
-        sudo('webassets -m %s.assets build' % app.name)
+        sudo('python -m clld.scripts.build_assets %s' % app.name)
 
     require_bibutils(app)
 
@@ -483,15 +547,30 @@ def deploy(app, environment, with_alembic=False):
 
     create_file_as_root(
         app.config, CONFIG_TEMPLATES[environment].format(**template_variables))
+    with virtualenv(app.venv):
+        sudo('python -m clld.scripts.compile_templates %s' % app.config, user=app.name)
+    if environment == 'production':
+        # the static site must reflect the data of the new release - in particular
+        # after a database upgrade - before the app is put back into service.
+        export_static(app)
     create_file_as_root(
         app.newrelic_config, NEWRELIC_TEMPLATE.format(**template_variables))
 
+    maintenance_flag = app.www.joinpath('maintenance')
+    if environment == 'production':
+        # nginx keeps serving the maintenance page until the app is primed:
+        sudo('touch %s' % maintenance_flag)
+
     supervisor(app, 'run', template_variables)
 
     time.sleep(5)
     res = run('curl http://localhost:%s/_ping' % app.port)
     assert json.loads(res)['status'] == 'ok'
 
+    if environment == 'production':
+        prime_caches(app, url='http://localhost:%s' % app.port)
+        sudo('rm -f %s' % maintenance_flag)
+
 
 @task
 def run_script(app, script_name, *args):
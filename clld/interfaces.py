@@ -224,3 +224,22 @@ class IOlacConfig(Interface):
     def parse_identifier(self, req, id_):
         """
         """
+
+
+class IFragmentCache(Interface):
+    """utility to store rendered HTML fragments
+
+    The default implementation is an in-process LRU cache; apps running several
+    processes may register an implementation backed by a shared store like memcached.
+    """
+    def get(self, key):
+        """
+        :param key: str
+        :return: cached unicode string or None.
+        """
+
+    def set(self, key, value):
+        """
+        :param key: str
+        :param value: unicode string to be cached.
+        """
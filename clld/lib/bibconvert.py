@@ -0,0 +1,279 @@
+"""
+Conversion of BibTeX records to RIS, EndNote (refer) and MODS.
+
+This is a native replacement for the conversions via bibutils (see
+:py:mod:`clld.lib.bibutils`), which spawn two processes per call. All converters work on
+iterables of records and produce the output incrementally, so whole databases can be
+exported in one pass.
+
+.. seealso:: http://en.wikipedia.org/wiki/RIS_(file_format)
+.. seealso:: http://www.loc.gov/standards/mods/
+"""
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+
+RIS_TYPES = {
+    'article': 'JOUR',
+    'book': 'BOOK',
+    'booklet': 'PAMP',
+    'conference': 'CONF',
+    'inbook': 'CHAP',
+    'incollection': 'CHAP',
+    'inproceedings': 'CONF',
+    'manual': 'BOOK',
+    'mastersthesis': 'THES',
+    'phdthesis': 'THES',
+    'proceedings': 'CONF',
+    'techreport': 'RPRT',
+    'unpublished': 'UNPB',
+}
+
+ENDNOTE_TYPES = {
+    'article': 'Journal Article',
+    'book': 'Book',
+    'booklet': 'Pamphlet',
+    'conference': 'Conference Paper',
+    'inbook': 'Book Section',
+    'incollection': 'Book Section',
+    'inproceedings': 'Conference Paper',
+    'manual': 'Book',
+    'mastersthesis': 'Thesis',
+    'phdthesis': 'Thesis',
+    'proceedings': 'Conference Proceedings',
+    'techreport': 'Report',
+    'unpublished': 'Unpublished Work',
+}
+
+MODS_GENRES = {
+    'article': 'journal article',
+    'book': 'book',
+    'booklet': 'book',
+    'conference': 'conference publication',
+    'inbook': 'book chapter',
+    'incollection': 'book chapter',
+    'inproceedings': 'conference publication',
+    'manual': 'instruction',
+    'mastersthesis': 'Masters thesis',
+    'phdthesis': 'Ph.D. thesis',
+    'proceedings': 'conference publication',
+    'techreport': 'technical report',
+    'unpublished': 'unpublished',
+}
+
+# genres of records which are part of a host publication:
+IN_HOST = ['article', 'inbook', 'incollection', 'inproceedings', 'conference']
+
+PAGES = re.compile('\s*(?P<start>[^\-\s]+)\s*-+\s*(?P<end>[^\-\s]+)\s*$')
+
+
+def _genre(record):
+    return getattr(record.genre, 'value', record.genre) or 'misc'
+
+
+def _pages(record):
+    """
+    :return: pair (start page, end page), where end page may be None.
+    """
+    pages = record.get('pages')
+    if not pages:
+        return None, None
+    m = PAGES.match(record['pages'])
+    if m:
+        return m.group('start'), m.group('end')
+    return record['pages'], None
+
+
+def _name_parts(name):
+    """
+    >>> assert _name_parts('Meier, Hans') == ('Meier', 'Hans')
+    >>> assert _name_parts('Hans Meier') == ('Meier', 'Hans')
+    >>> assert _name_parts('Meier') == ('Meier', '')
+    """
+    if ',' in name:
+        family, given = name.split(',', 1)
+    else:
+        parts = name.split()
+        family, given = parts[-1] if parts else '', ' '.join(parts[:-1])
+    return family.strip(), given.strip()
+
+
+def _name(name):
+    family, given = _name_parts(name)
+    return '%s, %s' % (family, given) if given else family
+
+
+def _publisher(record):
+    for field in ['publisher', 'school', 'institution', 'organization']:
+        if record.get(field):
+            return record[field]
+
+
+def _tagged(tags, record, fields):
+    """
+    :param tags: Mapping of field names to tags.
+    :return: generator of (tag, value) pairs.
+    """
+    for field in fields:
+        if record.get(field):
+            yield tags[field], record[field]
+
+
+def ris(records):
+    """
+    :return: generator of unicode chunks, one per record, of the RIS serialization.
+    """
+    tags = dict(
+        title='TI', volume='VL', number='IS', address='CY', edition='ET', series='T3',
+        note='N1', url='UR', isbn='SN', issn='SN', abstract='AB', doi='DO')
+    for rec in records:
+        genre = _genre(rec)
+        lines = [('TY', RIS_TYPES.get(genre, 'GEN')), ('ID', rec.id)]
+        lines.extend(('AU', _name(n)) for n in rec.getall('author'))
+        lines.extend(('ED', _name(n)) for n in rec.getall('editor'))
+        lines.extend(_tagged(tags, rec, ['title']))
+        if rec.get('journal'):
+            lines.append(('JO', rec['journal']))
+        if rec.get('booktitle'):
+            lines.append(('T2', rec['booktitle']))
+        if rec.get('year'):
+            lines.append(('PY', rec['year']))
+        lines.extend(_tagged(tags, rec, ['volume', 'number']))
+        start, end = _pages(rec)
+        if start:
+            lines.append(('SP', start))
+        if end:
+            lines.append(('EP', end))
+        if _publisher(rec):
+            lines.append(('PB', _publisher(rec)))
+        lines.extend(_tagged(
+            tags, rec, ['address', 'edition', 'series', 'isbn', 'issn', 'doi', 'url',
+                        'abstract', 'note']))
+        lines.append(('ER', ''))
+        yield '\n'.join('%s  - %s' % line for line in lines) + '\n\n'
+
+
+def endnote(records):
+    """
+    :return: generator of unicode chunks, one per record, of the EndNote (refer) \
+    serialization.
+    """
+    tags = dict(
+        title='%T', booktitle='%B', journal='%J', year='%D', volume='%V', number='%N',
+        pages='%P', address='%C', series='%S', edition='%7', note='%Z', url='%U',
+        isbn='%@', issn='%@', abstract='%X', doi='%R')
+    for rec in records:
+        lines = [('%0', ENDNOTE_TYPES.get(_genre(rec), 'Generic'))]
+        lines.extend(('%A', _name(n)) for n in rec.getall('author'))
+        lines.extend(('%E', _name(n)) for n in rec.getall('editor'))
+        lines.extend(_tagged(
+            tags, rec, ['title', 'booktitle', 'journal', 'year', 'volume', 'number',
+                        'pages']))
+        if _publisher(rec):
+            lines.append(('%I', _publisher(rec)))
+        lines.extend(_tagged(
+            tags, rec, ['address', 'series', 'edition', 'isbn', 'issn', 'doi', 'url',
+                        'abstract', 'note']))
+        lines.append(('%F', rec.id))
+        yield '\n'.join('%s %s' % line for line in lines) + '\n\n'
+
+
+def _mods_names(rec):
+    for field, role in [('author', 'author'), ('editor', 'editor')]:
+        for name in rec.getall(field):
+            family, given = _name_parts(name)
+            yield '<name type="personal">'
+            if given:
+                yield '<namePart type="given">%s</namePart>' % escape(given)
+            yield '<namePart type="family">%s</namePart>' % escape(family)
+            yield '<role><roleTerm authority="marcrelator" type="text">%s</roleTerm>' \
+                '</role></name>' % role
+
+
+def _mods_part(rec):
+    res = []
+    for field in ['volume', 'number']:
+        if rec.get(field):
+            res.append('<detail type="%s"><number>%s</number></detail>' % (
+                'issue' if field == 'number' else field, escape(rec[field])))
+    start, end = _pages(rec)
+    if start:
+        res.append('<extent unit="page"><start>%s</start>%s</extent>' % (
+            escape(start), '<end>%s</end>' % escape(end) if end else ''))
+    if res:
+        return '<part>%s</part>' % ''.join(res)
+    return ''
+
+
+def mods(records):
+    """
+    :return: generator of unicode chunks of a MODS collection.
+    """
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n' \
+        '<modsCollection xmlns="http://www.loc.gov/mods/v3">\n'
+    for rec in records:
+        genre = _genre(rec)
+        res = ['<mods ID=%s>' % quoteattr(rec.id or '')]
+        if rec.get('title'):
+            res.append('<titleInfo><title>%s</title></titleInfo>' % escape(rec['title']))
+        res.extend(_mods_names(rec))
+
+        origin = []
+        if rec.get('year'):
+            origin.append('<dateIssued>%s</dateIssued>' % escape(rec['year']))
+        if _publisher(rec):
+            origin.append('<publisher>%s</publisher>' % escape(_publisher(rec)))
+        if rec.get('address'):
+            origin.append(
+                '<place><placeTerm type="text">%s</placeTerm></place>'
+                % escape(rec['address']))
+        if rec.get('edition'):
+            origin.append('<edition>%s</edition>' % escape(rec['edition']))
+        if origin:
+            res.append('<originInfo>%s</originInfo>' % ''.join(origin))
+
+        res.append('<typeOfResource>text</typeOfResource>')
+        if genre in MODS_GENRES:
+            res.append('<genre>%s</genre>' % MODS_GENRES[genre])
+
+        host = rec['journal'] if rec.get('journal') \
+            else (rec['booktitle'] if rec.get('booktitle') else None)
+        if genre in IN_HOST and host:
+            res.append(
+                '<relatedItem type="host"><titleInfo><title>%s</title></titleInfo>%s'
+                '</relatedItem>' % (escape(host), _mods_part(rec)))
+        else:
+            res.append(_mods_part(rec))
+
+        if rec.get('series'):
+            res.append(
+                '<relatedItem type="series"><titleInfo><title>%s</title></titleInfo>'
+                '</relatedItem>' % escape(rec['series']))
+        for field in ['isbn', 'issn', 'doi']:
+            if rec.get(field):
+                res.append('<identifier type="%s">%s</identifier>' % (
+                    field, escape(rec[field])))
+        res.append('<identifier type="citekey">%s</identifier>' % escape(rec.id or ''))
+        if rec.get('url'):
+            res.append('<location><url>%s</url></location>' % escape(rec['url']))
+        if rec.get('note'):
+            res.append('<note>%s</note>' % escape(rec['note']))
+        res.append('</mods>\n')
+        yield ''.join(res)
+    yield '</modsCollection>\n'
+
+
+FORMATS = {'ris': ris, 'en': endnote, 'mods': mods}
+
+
+def iterconvert(records, fmt):
+    """Convert records in one pass.
+
+    :param fmt: one of 'ris', 'en' or 'mods'.
+    :return: generator of unicode chunks.
+    """
+    return FORMATS[fmt](records)
+
+
+def convert(records, fmt):
+    return ''.join(iterconvert(records, fmt))
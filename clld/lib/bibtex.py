@@ -5,13 +5,13 @@ Functionality to handle bibligraphical data in the BibTeX format.
 """
 from collections import OrderedDict
 import re
-import codecs
+import json
 
 from path import path
 from zope.interface import Interface, implementer
 
 from clld.util import UnicodeMixin, DeclEnum
-from clld.lib.bibutils import convert
+from clld.lib import bibconvert
 
 
 class EntryType(DeclEnum):
@@ -123,19 +123,28 @@ FIELDS = [
 
 
 class _Convertable(UnicodeMixin):
-    """Mixin adding a shortcut to clld.lib.bibutils.convert as method.
+    """Mixin adding methods to convert records to various formats.
     """
+    def iterrecords(self):
+        return [self]
+
+    def iterformat(self, fmt):
+        """
+        :return: generator of unicode chunks of the serialization in format fmt.
+        """
+        if fmt in bibconvert.FORMATS:
+            return bibconvert.iterconvert(self.iterrecords(), fmt)
+        if fmt == 'bib':
+            return (r.__unicode__() + '\n' for r in self.iterrecords())
+        return iter([self.format(fmt)])
+
     def format(self, fmt):
         if fmt == 'txt':
             if hasattr(self, 'text'):
                 return self.text()
             raise NotImplementedError()  # pragma: no cover
-        if fmt == 'en':
-            return convert(self.__unicode__(), 'bib', 'end')
-        if fmt == 'ris':
-            return convert(self.__unicode__(), 'bib', 'ris')
-        if fmt == 'mods':
-            return convert(self.__unicode__(), 'bib')
+        if fmt in bibconvert.FORMATS:
+            return bibconvert.convert(self.iterrecords(), fmt)
         return self.__unicode__()
 
 
@@ -186,53 +195,37 @@ class Record(OrderedDict, _Convertable):
 
     @classmethod
     def from_string(cls, bibtexString):
-        id_, genre, data = None, None, {}
-
-        # the following patterns are designed to match preprocessed input lines.
-        # i.e. the configuration values given in the bibtool resource file used to
-        # generate the bib-file have to correspond to these patterns.
-
-        # in particular, we assume all key-value-pairs to fit on one line,
-        # because we don't want to deal with nested curly braces!
-        lines = bibtexString.strip().split('\n')
+        """Parse the first BibTeX entry in bibtexString.
 
-        # genre and key are parsed from the @-line:
-        atLine = re.compile("^@(?P<genre>[a-zA-Z_]+)\s*{\s*(?P<key>[^,]*)\s*,\s*")
+        Values may span multiple lines, contain nested curly braces, be given in quotes
+        or as bare words, and be concatenated with "#".
 
-        # since all key-value pairs fit on one line, it's easy to determine the
-        # end of the value: right before the last closing brace!
-        fieldLine = re.compile('\s*(?P<field>[a-zA-Z_]+)\s*=\s*(\{|")(?P<value>.+)')
-
-        endLine = re.compile("}\s*")
-
-        # flag to signal, whether the @-line - starting each bibtex record - was
-        # already encountered:
-        inRecord = False
-
-        while lines:
-            line = lines.pop(0)
-            if not inRecord:
-                m = atLine.match(line)
-                if m:
-                    id_ = m.group('key').strip()
-                    genre = m.group('genre').strip().lower()
-                    inRecord = True
-            else:
-                m = fieldLine.match(line)
-                if m:
-                    value = m.group('value').strip()
-                    if value.endswith(','):
-                        value = value[:-1].strip()
-                    if value.endswith('}') or value.endswith('"'):
-                        data[m.group('field')] = value[:-1].strip()
-                else:
-                    m = endLine.match(line)
-                    if m:
-                        break
-                    # Note: fields with names not matching the expected pattern are simply
-                    # ignored.
-
-        return cls(genre, id_, **data)
+        >>> r = Record.from_string('@book{k, title = {The {IPA}\\n  chart}, year=1999}')
+        >>> assert r.genre == 'book' and r.id == 'k'
+        >>> assert r['title'] == 'The {IPA} chart' and r['year'] == '1999'
+        """
+        m = ENTRY_HEAD.search(bibtexString)
+        if not m:
+            return cls(None, None)
+
+        data, pos = [], m.end()
+        while True:
+            # fast path for the common case of a value in braces without nesting:
+            field = SIMPLE_FIELD.match(bibtexString, pos)
+            if field:
+                value, pos = field.group('value'), field.end()
+                if '\n' in value:
+                    value = NEWLINE.sub(' ', value)
+                data.append((field.group('field'), value))
+                continue
+
+            field = FIELD.match(bibtexString, pos)
+            if not field:
+                break
+            value, pos = _parse_value(bibtexString, field.end())
+            data.append((field.group('field'), value))
+
+        return cls(m.group('genre').lower(), m.group('key').strip(), *data)
 
     @staticmethod
     def sep(key):
@@ -314,28 +307,38 @@ class Database(_Convertable):
     def __unicode__(self):
         return '\n'.join(r.__unicode__() for r in self.records)
 
+    def iterrecords(self):
+        return self.records
+
     @property
     def keymap(self):
         """map bibtex record ids to list index
         """
         if self._keymap is None:
-            self._keymap = dict((r.id, i) for i, r in enumerate(self.records))
+            if isinstance(self.records, IndexedRecords):
+                self._keymap = self.records.keymap
+            else:
+                self._keymap = dict((r.id, i) for i, r in enumerate(self.records))
         return self._keymap
 
     @classmethod
-    def from_file(cls, bibFile, encoding='utf8'):
+    def from_file(cls, bibFile, encoding='utf8', lazy=False):
         """
         a bibtex database defined by a bib-file
 
         @param bibFile: path of the bibtex-database-file to be read.
+        @param lazy: if True, records are only parsed when accessed, using a persisted \
+        index of the entries in the file (see IndexedRecords).
         """
-        if path(bibFile).exists():
-            with codecs.open(bibFile, encoding=encoding) as fp:
-                content = fp.read()
-        else:
-            content = ''
+        if lazy:
+            return cls(IndexedRecords(bibFile, encoding=encoding))
 
-        return cls([Record.from_string('@' + r) for r in content.split('@')[1:]])
+        if not path(bibFile).exists():
+            return cls([])
+
+        with open(bibFile, 'rb') as fp:
+            return cls([
+                Record.from_string(text.decode(encoding)) for _, text in iterentries(fp)])
 
     def __len__(self):
         return len(self.records)
@@ -343,3 +346,173 @@ class Database(_Convertable):
     def __getitem__(self, key):
         """to access bib records by index or citation key"""
         return self.records[key if isinstance(key, int) else self.keymap[key]]
+
+
+class IndexedRecords(object):
+    """Sequence of the records in a bib-file, parsed on access.
+
+    The citation keys and byte offsets of the entries are stored in an index file next to
+    the bib-file, which is rebuilt whenever the bib-file has changed.
+    """
+    def __init__(self, bibFile, encoding='utf8', index_file=None):
+        self.bibFile = path(bibFile)
+        self.encoding = encoding
+        self.index_file = path(index_file or self.bibFile + '.idx')
+        self.entries = self.load_index()
+        self.keymap = dict((key, i) for i, (key, _, _) in enumerate(self.entries))
+
+    def _signature(self):
+        stat = self.bibFile.stat()
+        return [stat.st_size, stat.st_mtime]
+
+    def load_index(self):
+        if not self.bibFile.exists():
+            return []
+
+        signature = self._signature()
+        if self.index_file.exists():
+            with open(self.index_file, 'rb') as fp:
+                try:
+                    index = json.load(fp)
+                except ValueError:  # pragma: no cover
+                    index = {}
+            if index.get('signature') == signature:
+                return index['entries']
+
+        entries = []
+        with open(self.bibFile, 'rb') as fp:
+            for offset, text in iterentries(fp):
+                key = ENTRY_HEAD.match(text)
+                entries.append([
+                    key.group('key').strip().decode(self.encoding) if key else None,
+                    offset,
+                    len(text)])
+        try:
+            with open(self.index_file, 'wb') as fp:
+                json.dump(dict(signature=signature, entries=entries), fp)
+        except IOError:  # pragma: no cover
+            # we can live without a persisted index, e.g. for read-only directories.
+            pass
+        return entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        _, offset, length = self.entries[i]
+        with open(self.bibFile, 'rb') as fp:
+            fp.seek(offset)
+            return Record.from_string(fp.read(length).decode(self.encoding))
+
+    def __iter__(self):
+        if self.bibFile.exists():
+            with open(self.bibFile, 'rb') as fp:
+                for _, text in iterentries(fp):
+                    yield Record.from_string(text.decode(self.encoding))
+
+
+# @-lines of entries, which are not bibliographical records:
+NON_RECORDS = ['comment', 'preamble', 'string']
+
+ENTRY_START = re.compile('@\s*(?P<genre>[a-zA-Z_]+)\s*\{')
+ENTRY_HEAD = re.compile('@\s*(?P<genre>[a-zA-Z_]+)\s*\{\s*(?P<key>[^,\s}]*)\s*,?')
+FIELD = re.compile('[\s,]*(?P<field>[a-zA-Z_][\w\-:.]*)\s*=\s*')
+SIMPLE_FIELD = re.compile(
+    '[\s,]*(?P<field>[a-zA-Z_][\w\-:.]*)\s*=\s*\{\s*(?P<value>[^{}]*?)\s*\}(?!\s*#)')
+BARE_VALUE = re.compile('[^\s,#}]+')
+CONCAT = re.compile('\s*#\s*')
+BRACE = re.compile('[{}]')
+BRACE_OR_QUOTE = re.compile('[{}"]')
+NEWLINE = re.compile('\s*\n\s*')
+
+
+def iterentries(fp, blocksize=2 ** 16):
+    """Iterate over the entries of a bib-file in one pass, reading it block by block.
+
+    Entries are delimited by balancing curly braces, thus "@" within values is not
+    mistaken for the start of an entry. Since braces are counted on the raw bytes, the
+    file must use an ASCII compatible encoding like utf8 or latin1.
+
+    :param fp: file-like object opened in binary mode.
+    :return: generator of pairs (byte offset of the entry in the file, entry text).
+    """
+    # buf holds the unprocessed part of the file, starting at byte offset base; start is
+    # the index of the current entry in buf, pos the index where scanning resumes.
+    buf, base, start, pos, depth, skip = '', 0, None, 0, 0, False
+    for block in iter(lambda: fp.read(blocksize), ''):
+        buf += block
+        while True:
+            if start is None:
+                m = ENTRY_START.search(buf, pos)
+                if not m:
+                    # the start of an entry may be cut off at the end of the block:
+                    i = buf.rfind('@', pos)
+                    pos = len(buf) if i < 0 else i
+                    break
+                start, pos, depth = m.start(), m.end(), 1
+                skip = m.group('genre').lower() in NON_RECORDS
+
+            for m in BRACE.finditer(buf, pos):
+                depth += 1 if m.group() == '{' else -1
+                if depth == 0:
+                    if not skip:
+                        yield base + start, buf[start:m.end()]
+                    start, pos = None, m.end()
+                    break
+            else:
+                pos = len(buf)
+                break
+
+        cut = pos if start is None else start
+        buf, base, pos = buf[cut:], base + cut, pos - cut
+        if start is not None:
+            start = 0
+
+    if start is not None and not skip:
+        # an unterminated last entry.
+        yield base + start, buf
+
+
+def _closing(s, pos, pattern, quote=False):
+    """
+    :return: index of the brace (or quote) closing the group opened at pos.
+    """
+    depth = 0 if quote else 1
+    for m in pattern.finditer(s, pos + 1):
+        c = m.group()
+        if c == '"':
+            if depth == 0:
+                return m.start()
+        else:
+            depth += 1 if c == '{' else -1
+            if depth == 0 and not quote:
+                return m.start()
+    return len(s)
+
+
+def _parse_value(s, pos):
+    """
+    :return: pair (value, index of the first character after the value).
+    """
+    parts = []
+    while pos < len(s):
+        if s[pos] == '{':
+            end = _closing(s, pos, BRACE)
+            parts.append(s[pos + 1:end])
+            pos = end + 1
+        elif s[pos] == '"':
+            end = _closing(s, pos, BRACE_OR_QUOTE, quote=True)
+            parts.append(s[pos + 1:end])
+            pos = end + 1
+        else:
+            m = BARE_VALUE.match(s, pos)
+            if not m:
+                break
+            parts.append(m.group())
+            pos = m.end()
+
+        m = CONCAT.match(s, pos)
+        if not m:
+            break
+        pos = m.end()
+    return NEWLINE.sub(' ', ''.join(parts)).strip(), pos
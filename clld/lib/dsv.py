@@ -5,6 +5,7 @@ import csv
 import codecs
 import cStringIO
 from collections import namedtuple
+from functools import partial
 
 
 def normalize_name(s):
@@ -17,56 +18,157 @@ def normalize_name(s):
     return s.replace('-', '_')
 
 
-def rows(filename, delimiter='\t', namedtuples=False, encoding=None, newline='\n'):
+def _lines(fp, newline):
+    if newline == '\n':
+        for line in fp:
+            yield line
+    else:
+        buf = ''
+        for block in iter(partial(fp.read, 2 ** 16), ''):
+            lines = (buf + block).split(newline)
+            buf = lines.pop()
+            for line in lines:
+                yield line
+        if buf:
+            yield buf
+
+
+def iterrows(fp, delimiter='\t', namedtuples=False, encoding=None, newline='\n',
+             quotechar=None, converters=None):
+    """Iterate over the rows of a delimiter-separated file object, opened in binary mode.
+
+    See :py:func:`rows` for a description of the parameters.
     """
+    lines = _lines(fp, newline)
+    if quotechar:
+        reader = csv.reader(lines, delimiter=str(delimiter), quotechar=str(quotechar))
+        split = (
+            [s.decode(encoding) for s in row] if encoding else row
+            for row in reader if ''.join(row).strip())
+    else:
+        split = (
+            (line.decode(encoding) if encoding else line).split(delimiter)
+            for line in lines if line.strip())
+
+    cls, convs = None, None
+    for i, row in enumerate(split):
+        row = [s.strip() for s in row]
+        if i == 0:
+            if namedtuples:
+                cls = namedtuple('Row', map(normalize_name, row))
+                if converters:
+                    convs = [converters.get(name) for name in row]
+                continue
+            if converters:
+                convs = [converters.get(j) for j in range(len(row))]
+
+        if convs:
+            row = [
+                (conv(s) if s else None) if conv else s for conv, s in zip(convs, row)]
+        yield cls(*row) if cls else row
+
+
+def rows(filename, delimiter='\t', namedtuples=False, encoding=None, newline='\n',
+         quotechar=None, converters=None):
+    """Iterate over the rows of a delimiter-separated file, reading it line by line.
+
+    :param filename: path of the file.
+    :param namedtuples: if True, the first row is read as header, and rows are returned \
+    as namedtuples.
+    :param quotechar: if specified, fields quoted with quotechar may contain delimiters \
+    and newlines.
+    :param converters: dict mapping column names (for namedtuples) or indices to \
+    callables, used to convert non-empty values; empty values are converted to None.
+
     >>> assert list(rows(__file__))
     >>> from clld.tests.util import TESTS_DIR
     >>> assert list(rows(TESTS_DIR.joinpath('test.tab'), namedtuples=True, encoding='utf8'))
     """
-    cls = None
+    with open(filename, 'rb') as fp:
+        for row in iterrows(
+                fp,
+                delimiter=delimiter,
+                namedtuples=namedtuples,
+                encoding=encoding,
+                newline=newline,
+                quotechar=quotechar,
+                converters=converters):
+            yield row
 
-    with open(filename, 'r') as fp:
-        for i, line in enumerate(fp.read().split(newline)):
-            if not line.strip():
-                continue
-            if encoding:
-                line = line.decode(encoding)
-            row = [s.strip() for s in line.split(delimiter)]
-            if namedtuples and i == 0:
-                cls = namedtuple('Row', map(normalize_name, row))
-            else:
-                yield cls(*row) if cls else row
+
+def batched(items, size=1000):
+    """Group items in lists of at most size items, e.g. to insert rows in bulk:
+
+    .. code-block:: python
+
+        for batch in batched(rows(fname, namedtuples=True, converters=dict(pk=int))):
+            DBSession.execute(Value.__table__.insert(), [r._asdict() for r in batch])
+
+    >>> assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 class UnicodeCsvWriter:
     """A CSV writer which will write rows to CSV file object "fp",
     which is encoded in the given encoding.
 
+    Rows can be any sequences, e.g. tuples as returned from SQLAlchemy Core queries.
+    writerows buffers blocks of rows, so that the output is written - and if necessary
+    re-encoded - once per block rather than once per row.
+
     >>> fp = cStringIO.StringIO()
     >>> writer = UnicodeCsvWriter(fp)
     >>> writer.writerows([[1, u'\xef']])
+    >>> assert fp.getvalue() == '1,\\xc3\\xaf\\r\\n'
     """
+    blocksize = 1000
 
     def __init__(self, fp, dialect=csv.excel, encoding="utf-8", **kw):
         # Redirect output to a queue
         self.queue = cStringIO.StringIO()
         self.writer = csv.writer(self.queue, dialect=dialect, **kw)
         self.stream = fp
+        self.encoding = encoding
+        # For ASCII compatible encodings, we encode cells directly in the target
+        # encoding, otherwise we go through utf-8 and re-encode blocks of output.
+        self.direct = u'\r\n,;\t"\'x'.encode(encoding) == b'\r\n,;\t"\'x'
+        self.cell_encoding = encoding if self.direct else 'utf-8'
         self.encoder = codecs.getincrementalencoder(encoding)()
 
-    def writerow(self, row):
-        self.writer.writerow(
-            [s.encode("utf-8") if hasattr(s, 'encode') else s for s in row])
-        # Fetch UTF-8 output from the queue ...
+    def _encoded(self, row):
+        return [
+            s.encode(self.cell_encoding) if isinstance(s, unicode) else s for s in row]
+
+    def _flush(self):
         data = self.queue.getvalue()
-        data = data.decode("utf-8")
-        # ... and reencode it into the target encoding
-        data = self.encoder.encode(data)
-        # write to the target stream
+        if not self.direct:
+            # re-encode the UTF-8 output into the target encoding
+            data = self.encoder.encode(data.decode('utf-8'))
         self.stream.write(data)
         # empty queue
+        self.queue.seek(0)
         self.queue.truncate(0)
 
+    def writerow(self, row):
+        self.writer.writerow(self._encoded(row))
+        self._flush()
+
     def writerows(self, rows):
+        block = []
         for row in rows:
-            self.writerow(row)
+            block.append(self._encoded(row))
+            if len(block) == self.blocksize:
+                self.writer.writerows(block)
+                self._flush()
+                block = []
+        if block:
+            self.writer.writerows(block)
+            self._flush()
@@ -3,7 +3,14 @@
 
 .. seealso:: http://www.filemaker.com/support/product/docs/12/fms/fms12_cwp_xml_en.pdf
 """
+import os
 import re
+import time
+from io import BytesIO
+from hashlib import sha1
+from tempfile import mkstemp
+from functools import partial
+from multiprocessing.pool import ThreadPool
 from bs4 import BeautifulSoup as bs
 from logging import getLogger
 log = getLogger(__name__)
@@ -11,6 +18,7 @@ log = getLogger(__name__)
 from xml.etree import cElementTree as et
 
 import requests
+from path import path
 
 
 FF = re.compile("font-family:\s*\'[^\']+\';\s*")
@@ -52,90 +60,206 @@ def normalize_markup(s):
     return unicode(soup.html.body).replace('<body>', '').replace('</body>', '').strip() or None
 
 
+NS = '{http://www.filemaker.com/fmpxmlresult}'
+FIELD, RESULTSET, ROW, COL, DATA = [
+    NS + name for name in 'FIELD RESULTSET ROW COL DATA'.split()]
+
+
 class Result(object):
-    """Parses a filemaker pro xml result.
+    """Parses a filemaker pro xml result incrementally.
+
+    Field names and types and the total number of records found are parsed upon
+    initialization, the rows are parsed when iterating over the result - which can thus
+    be done only once. The items property provides the list of all rows.
     """
     def __init__(self, content):
-        self._root = et.fromstring(content)
-        fields = []
-        for field in self._find('field', path='.//'):
-            fields.append((field.get('NAME'), field.get('TYPE')))
-        resultset = self._find('resultset', path='.//')[0]
-        self.total = int(resultset.get('FOUND'))
-        self.items = []
-        for row in self._find('row', resultset):
-            item = {}
-            for i, col in enumerate(self._find('col', row)):
-                name, type_ = fields[i]
-                data = self._find('data', col)
-                if data:
-                    val = data[0].text
-                else:
-                    assert '::' in name
-                    val = None
-                if val and type_ == 'NUMBER':
+        self._events = et.iterparse(BytesIO(content), events=('start', 'end'))
+        self._items = None
+        self.fields = []
+        self.total = 0
+        for event, e in self._events:
+            if event == 'end' and e.tag == FIELD:
+                self.fields.append((e.get('NAME'), e.get('TYPE')))
+            elif event == 'start' and e.tag == RESULTSET:
+                self.total = int(e.get('FOUND'))
+                break
+
+    def __iter__(self):
+        for event, e in self._events:
+            if event == 'end' and e.tag == ROW:
+                yield self._item(e)
+                e.clear()
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = list(self)
+        return self._items
+
+    def _item(self, row):
+        item = {}
+        for (name, type_), col in zip(self.fields, row.findall(COL)):
+            data = col.find(DATA)
+            if data is not None:
+                val = data.text
+            else:
+                assert '::' in name
+                val = None
+            if val and type_ == 'NUMBER':
+                try:
+                    val = int(val)
+                except ValueError:
                     try:
-                        val = int(val)
+                        val = float(val)
                     except ValueError:
-                        try:
-                            val = float(val)
-                        except ValueError:
-                            #
-                            # TODO: is there a better way to handle stuff like (24, 57)?
-                            #
-                            pass
-                item[name] = val
-            self.items.append(item)
-
-    def _find(self, localname, e=None, path=''):
-        e = e or self._root
-        return e.findall(
-            path + '{http://www.filemaker.com/fmpxmlresult}' + localname.upper())
+                        #
+                        # TODO: is there a better way to handle stuff like (24, 57)?
+                        #
+                        pass
+            item[name] = val
+        return item
+
+
+class DiskCache(object):
+    """Persistent cache for raw result batches.
+
+    Each batch is stored in a file in directory, named with the sha1 hash of its key -
+    i.e. of layout, offset and limit of the request, not of the content of the batch.
+
+    :param ttl: number of seconds after which cached batches expire; if None, batches \
+    are kept until the cache is cleared explicitly.
+    """
+    def __init__(self, directory, ttl=None):
+        self.directory = path(directory)
+        self.ttl = ttl
+        if not self.directory.exists():
+            self.directory.makedirs()
+
+    def _path(self, key):
+        return self.directory.joinpath(sha1(key.encode('utf8')).hexdigest() + '.xml')
+
+    def __contains__(self, key):
+        p = self._path(key)
+        if not p.exists():
+            return False
+        if self.ttl is not None and time.time() - p.mtime > self.ttl:
+            return False
+        return True
+
+    def __getitem__(self, key):
+        with open(self._path(key), 'rb') as fp:
+            return fp.read()
+
+    def __setitem__(self, key, value):
+        # write to a temporary file first, so that concurrent readers - or an interrupted
+        # import - never see partial batches.
+        fd, tmp = mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(value)
+        os.rename(tmp, self._path(key))
+
+    def __delitem__(self, key):
+        if self._path(key).exists():
+            self._path(key).remove()
+
+    def clear(self):
+        """Remove all cached batches.
+        """
+        for p in self.directory.files('*.xml'):
+            p.remove()
 
 
 class Client(object):
     """Client for FileMaker's 'Custom Web Publishing with XML' feature.
+
+    :param cache: dict-like object or name of a directory to use as DiskCache.
+    :param cache_ttl: expiration time in seconds for batches cached in a DiskCache.
+    :param workers: maximal number of batches to retrieve concurrently.
     """
-    def __init__(self, host, db, user, password, limit=1000, cache=None, verbose=True):
+    def __init__(self, host, db, user, password, limit=1000, cache=None, verbose=True,
+                 workers=4, cache_ttl=None):
         self.host = host
         self.db = db
         self.user = user
         self.password = password
         self.limit = limit
+        if isinstance(cache, basestring):
+            cache = DiskCache(cache, ttl=cache_ttl)
         self.cache = cache if cache is not None else {}
         self.verbose = verbose
+        self.workers = workers
 
-    def _get_batch(self, what, offset=0):
+    def _get_xml(self, what, offset=0, limit=None):
+        limit = limit or self.limit
         if self.verbose:
             print what, offset  # pragma: no cover
-        key = '%s-%s-%s' % (what, offset, self.limit)
-        if key in self.cache.keys():
-            xml = self.cache[key]
-        else:
-            if self.verbose:
-                print '-- from server'  # pragma: no cover
-            log.info('retrieving %s (%s to %s)' % (what, offset, offset + self.limit))
-            res = requests.get(
-                'http://%s/fmi/xml/FMPXMLRESULT.xml' % self.host,
-                params={
-                    '-db': self.db,
-                    '-lay': what,
-                    '-findall': '',
-                    '-skip': str(offset),
-                    '-max': str(self.limit)},
-                auth=(self.user, self.password))
-            xml = res.text.encode('utf8')
-            self.cache[key] = xml
-        return Result(xml)
+        key = '%s-%s-%s' % (what, offset, limit)
+        if key in self.cache:
+            return self.cache[key]
 
-    def get(self, what):
+        if self.verbose:
+            print '-- from server'  # pragma: no cover
+        log.info('retrieving %s (%s to %s)' % (what, offset, offset + limit))
+        res = requests.get(
+            'http://%s/fmi/xml/FMPXMLRESULT.xml' % self.host,
+            params={
+                '-db': self.db,
+                '-lay': what,
+                '-findall': '',
+                '-skip': str(offset),
+                '-max': str(limit)},
+            auth=(self.user, self.password))
+        # error responses must not end up in the cache:
+        res.raise_for_status()
+        xml = res.text.encode('utf8')
+        self.cache[key] = xml
+        return xml
+
+    def _get_batch(self, what, offset=0, limit=None):
+        return Result(self._get_xml(what, offset=offset, limit=limit))
+
+    def _get_range(self, what, offset, size):
+        """
+        :return: list of the items in the range of size rows starting at offset; the \
+        rest of the range is re-requested as long as the server returns short batches.
+        """
         items = []
+        while len(items) < size:
+            batch = list(self._get_batch(
+                what, offset=offset + len(items), limit=size - len(items)))
+            if not batch:
+                break  # pragma: no cover
+            items.extend(batch)
+        return items[:size]
+
+    def iterget(self, what):
+        """
+        :return: generator of items; batches are retrieved concurrently, but returned \
+        in order.
+
+        Since servers may cap the number of rows per batch below limit, the ranges to
+        retrieve concurrently are determined by the size of the first batch.
+        """
         batch = self._get_batch(what)
-        items.extend(batch.items)
-        while len(items) < batch.total:
-            batch = self._get_batch(what, offset=len(items))
-            items.extend(batch.items)
-        return items
+        size = 0
+        for item in batch:
+            size += 1
+            yield item
+
+        offsets = range(size, batch.total, size) if size else []
+        if offsets:
+            pool = ThreadPool(min(self.workers, len(offsets)))
+            try:
+                for items in pool.imap(
+                        partial(self._get_range, what, size=size), offsets):
+                    for item in items:
+                        yield item
+            finally:
+                pool.close()
+                pool.join()
+
+    def get(self, what):
+        return list(self.iterget(what))
 
     def get_layouts(self):
         from PyFileMaker import FMServer
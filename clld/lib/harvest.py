@@ -0,0 +1,172 @@
+"""
+Concurrent, rate-limited harvesting of JSON resources from web APIs.
+
+Harvested data is stored in a single SQLite database keyed by an arbitrary string key,
+e.g. the id of the source a Google Books search was done for.
+"""
+import json
+import time
+import sqlite3
+import threading
+from multiprocessing.pool import ThreadPool
+from logging import getLogger
+log = getLogger(__name__)
+
+import requests
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket, to limit the rate of requests.
+
+    :param rate: number of tokens added per second.
+    :param capacity: maximal number of tokens, i.e. the size of bursts.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token from the bucket, waiting for one to become available if necessary.
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class JsonStore(object):
+    """Key-value store for JSON objects in a SQLite database.
+
+    >>> store = JsonStore(':memory:')
+    >>> store['a'] = {'totalItems': 0}
+    >>> assert 'a' in store and store['a']['totalItems'] == 0 and len(store) == 1
+    """
+    def __init__(self, fname):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fname, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS item (key TEXT PRIMARY KEY, value TEXT)')
+
+    def __contains__(self, key):
+        with self.lock:
+            return bool(self.db.execute(
+                'SELECT count(*) FROM item WHERE key = ?', (key,)).fetchone()[0])
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT count(*) FROM item').fetchone()[0]
+
+    def __getitem__(self, key):
+        res = self.get(key)
+        if res is None:
+            raise KeyError(key)
+        return res
+
+    def get(self, key, default=None):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT value FROM item WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            with self.db:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO item (key, value) VALUES (?, ?)',
+                    (key, json.dumps(value)))
+
+    def keys(self):
+        with self.lock:
+            return [r[0] for r in self.db.execute('SELECT key FROM item')]
+
+    def items(self):
+        """
+        :return: list of all (key, object) pairs, read in one query.
+        """
+        with self.lock:
+            rows = self.db.execute('SELECT key, value FROM item').fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+
+class Harvester(object):
+    """Retrieve JSON resources concurrently and store them in a JsonStore.
+
+    :param workers: maximal number of concurrent requests.
+    :param rate: maximal number of requests per second, or None for no limit.
+    :param retries: number of retries for requests failing with a server error (5xx), \
+    rate limit response (429) or connection error.
+    :param backoff: seconds to wait before the first retry; doubled for each retry.
+    """
+    def __init__(self, store, workers=4, rate=None, retries=3, backoff=1.0,
+                 headers=None):
+        self.store = store
+        self.workers = workers
+        self.bucket = TokenBucket(rate, capacity=workers) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = headers or {'accept': 'application/json'}
+        self.stopped = threading.Event()
+
+    def fetch(self, item):
+        """
+        :return: pair (key, HTTP status code or None); the status is None if no valid \
+        response could be retrieved, e.g. if the body of a 200 response is no valid JSON.
+        """
+        key, url = item
+        status = None
+        for attempt in range(self.retries + 1):
+            if self.stopped.is_set():
+                return key, None
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                res = requests.get(url, headers=self.headers)
+                status = res.status_code
+            except requests.ConnectionError:
+                res, status = None, None
+            log.info('%s - %s' % (status, url))
+            if status == 200:
+                try:
+                    self.store[key] = res.json()
+                except ValueError:
+                    log.warn('invalid JSON - %s' % url)
+                    return key, None
+                return key, status
+            if status == 403:
+                # quota exceeded: there is no point in going on.
+                log.warn('limit reached')
+                self.stopped.set()
+                return key, status
+            if status is not None and status != 429 and status < 500:
+                return key, status
+            if attempt < self.retries:
+                # no point in waiting after the last attempt.
+                time.sleep(self.backoff * 2 ** attempt)
+        return key, status
+
+    def harvest(self, items):
+        """
+        :param items: iterable of (key, url) pairs; items with keys already in the store \
+        are skipped.
+        :return: dict mapping keys to the HTTP status codes of the last response.
+        """
+        items = [item for item in items if item[0] not in self.store]
+        if not items:
+            return {}
+        pool = ThreadPool(min(self.workers, len(items)))
+        try:
+            return dict(pool.imap_unordered(self.fetch, items))
+        finally:
+            pool.close()
+            pool.join()
@@ -48,7 +48,9 @@ functionality to gather information about iso-639-3 codes from sil.org
 #Effective   date         NOT NULL)     -- The date the retirement became effective
 #"""
 from collections import namedtuple
+import itertools
 import re
+import sqlite3
 
 import requests
 from bs4 import BeautifulSoup as bs
@@ -63,10 +65,16 @@ def get(path):
     return requests.get("http://www.sil.org/iso639-3/" + path).content
 
 
+# we cache the urls of the tab files, to not scrape the download page for each table.
+TABURLS = {}
+
+
 def get_taburls():
     """retrieves the current (date-stamped) file names for download files from sil's
     download page.
     """
+    if TABURLS:
+        return TABURLS
     soup = bs(get('download.asp'))
     name_map = {
         None: 'codes',
@@ -79,22 +87,30 @@ def get_taburls():
         match = TAB_NAME_PATTERN.match(a['href'])
         if match:
             res[name_map.get(match.group('name'))] = a['href']
+    TABURLS.update(res)
     return res
 
 
-def get_tab(name):
-    """generator for entries in a tab file specified by name.
+def iter_tab(lines):
+    """generator for entries in the lines of a tab file.
     """
-    lines = get(get_taburls()[name]).split('\n')
-    fields = lines[0].split('\t')
-    cls = namedtuple('Row', lines[0].lower().strip())
-    for line in lines[1:]:
+    lines = iter(lines)
+    header = next(lines).strip()
+    fields = header.split('\t')
+    cls = namedtuple('Row', header.lower())
+    for line in lines:
         row = line.strip().split('\t')
         while len(row) < len(fields):
             row.append(None)
         yield cls(*row)
 
 
+def get_tab(name):
+    """generator for entries in a tab file specified by name.
+    """
+    return iter_tab(get(get_taburls()[name]).split('\n'))
+
+
 def _text(e):
     return e.text.strip()
 
@@ -112,3 +128,132 @@ def get_documentation(code):
         assert len(tds) == 2
         info[_text(tds[0])] = _text(tds[1])
     return info
+
+
+class Mirror(object):
+    """A local copy of the ISO 639-3 code tables, stored in a SQLite database.
+
+    >>> m = Mirror(':memory:')
+    >>> m.load(codes=['Id\\tRef_Name', 'abc\\tA'], names=['Id\\tPrint_Name', 'abc\\tAbc'])
+    >>> assert m.code('abc').ref_name == 'A' and m.by_name('ABC')[0].id == 'abc'
+    """
+    # indexes, to allow fast lookups by table and column:
+    INDEXES = [
+        ('codes', 'id'),
+        ('names', 'id'),
+        ('names', 'lower_name'),
+        ('macrolanguages', 'm_id'),
+        ('macrolanguages', 'i_id'),
+        ('retired', 'id'),
+    ]
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.db = sqlite3.connect(fname)
+        self._columns = {}
+        for table, in self.db.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"):
+            self._columns[table] = [
+                r[1] for r in self.db.execute('PRAGMA table_info(%s)' % table)]
+
+    @classmethod
+    def download(cls, fname):
+        """Download the current tables from the SIL site into a new mirror.
+        """
+        res = cls(fname)
+        res.load(**dict(
+            (name, get(url).decode('utf-8-sig').split('\n'))
+            for name, url in get_taburls().items()))
+        return res
+
+    def load(self, **tabs):
+        """(Re-)load tables.
+
+        :param tabs: mapping of table names ('codes', 'names', 'macrolanguages', \
+        'retired') to iterables of lines of the corresponding tab file.
+        """
+        with self.db:
+            for name, lines in tabs.items():
+                rows = iter_tab(line for line in lines if line.strip())
+                first = next(rows, None)
+                self.db.execute('DROP TABLE IF EXISTS %s' % name)
+                if first is None:
+                    self._columns.pop(name, None)
+                    continue
+                columns = list(first._fields)
+                rows = (tuple(row) for row in itertools.chain([first], rows))
+                if 'print_name' in columns:
+                    # we store lowercased names, to allow case-insensitive lookups.
+                    i = columns.index('print_name')
+                    columns.append('lower_name')
+                    rows = (row + ((row[i] or '').lower(),) for row in rows)
+                self._columns[name] = columns
+                self.db.execute('CREATE TABLE %s (%s)' % (
+                    name, ', '.join('%s TEXT' % c for c in columns)))
+                self.db.executemany(
+                    'INSERT INTO %s VALUES (%s)' % (name, ', '.join('?' * len(columns))),
+                    rows)
+                for table, column in self.INDEXES:
+                    if table == name and column in columns:
+                        self.db.execute('CREATE INDEX %s_%s ON %s (%s)' % (
+                            table, column, table, column))
+
+    def _rows(self, table, where, *args):
+        if table not in self._columns:
+            return []
+        cls = namedtuple('Row', self._columns[table])
+        return [cls(*row) for row in self.db.execute(
+            'SELECT * FROM %s WHERE %s' % (table, where), args)]
+
+    def code(self, code):
+        """
+        :return: row of the code table for an active code or None.
+        """
+        res = self._rows('codes', 'id = ?', code)
+        return res[0] if res else None
+
+    def retirement(self, code):
+        """
+        :return: row of the retirements table for a retired code or None.
+        """
+        res = self._rows('retired', 'id = ?', code)
+        return res[0] if res else None
+
+    def names(self, code):
+        return [row.print_name for row in self._rows('names', 'id = ?', code)]
+
+    def by_name(self, name):
+        """
+        :return: list of code table rows for codes associated with name.
+        """
+        codes = set(r.id for r in self._rows('names', 'lower_name = ?', name.lower()))
+        return list(filter(None, [self.code(code) for code in sorted(codes)]))
+
+    def macrolanguage(self, code):
+        """
+        :return: the code of the macrolanguage code belongs to or None.
+        """
+        res = self._rows('macrolanguages', 'i_id = ?', code)
+        return res[0].m_id if res else None
+
+    def enrich(self, identifiers):
+        """Add reference names as description to ISO 639-3 identifiers.
+
+        :param identifiers: iterable of clld.db.models.common.Identifier instances.
+        :return: dict mapping retired codes to the corresponding row of the retirements \
+        table.
+        """
+        identifiers = [i for i in identifiers if i.type == 'iso639-3']
+        codes, retired = {}, {}
+        for i in range(0, len(identifiers), 500):
+            chunk = [ident.name for ident in identifiers[i:i + 500]]
+            where = 'id IN (%s)' % ', '.join('?' * len(chunk))
+            for row in self._rows('codes', where, *chunk):
+                codes[row.id] = row
+            for row in self._rows('retired', where, *chunk):
+                retired[row.id] = row
+
+        for identifier in identifiers:
+            if not identifier.description and identifier.name in codes:
+                identifier.description = codes[identifier.name].ref_name
+        return retired
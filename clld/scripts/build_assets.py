@@ -0,0 +1,51 @@
+"""
+Build the asset bundles of a clld app for production.
+
+python build_assets.py <app package> [--brotli]
+python build_assets.py production.ini [--brotli]
+
+Bundles are compiled, minified and content-hashed, compressed copies are written next to
+the output files - in the app's static directory or the directory configured as
+clld.assets_directory - and the URLs are recorded in a manifest, which is read by the app
+when running with clld.environment = production.
+"""
+import logging
+from importlib import import_module
+
+from path import path
+from pyramid.paster import get_appsettings, setup_logging
+
+from clld.web.assets import build, output_directory
+from clld.scripts.util import get_app_package
+
+
+def build_assets(name, brotli_=False, config_uri=None):  # pragma: no cover
+    """
+    :param name: name of the app package.
+    :param config_uri: ini file of the app, providing the clld.assets_directory setting.
+    :return: dict mapping bundle names to lists of URLs.
+    """
+    if config_uri:
+        setup_logging(config_uri)
+    else:
+        logging.basicConfig(level=logging.INFO)
+    log = logging.getLogger(name)
+    # importing the app's assets module registers its assets with the environment.
+    import_module('{0}.assets'.format(name))
+    directory = output_directory(
+        name, get_appsettings(config_uri) if config_uri else None)
+    manifest = build(directory, '/{0}:static/'.format(name), brotli_=brotli_)
+    for bundle, urls in sorted(manifest.items()):
+        log.info('%s %s' % (bundle, ' '.join(urls)))
+    log.info('manifest written to %s' % directory)
+    return manifest
+
+
+if __name__ == '__main__':  # pragma: no cover
+    import sys
+    arg, kw = sys.argv[1], {}
+    if path(arg.split('#')[0]).exists():
+        # an ini file - the package is the one providing the app factory:
+        arg, kw = get_app_package(arg), dict(config_uri=arg)
+    build_assets(arg, '--brotli' in sys.argv, **kw)
+    sys.exit(0)
@@ -0,0 +1,27 @@
+"""
+Compile the mako templates of a clld app.
+
+python compile_templates.py production.ini
+
+The compiled templates are written to the directory configured as mako.module_directory,
+from where they are imported by the app processes instead of being compiled on first
+render.
+"""
+from clld.web.warmup import template_lookup, compile_templates, NO_WARM_UP
+from clld.scripts.util import get_app
+
+
+def main(config_uri):  # pragma: no cover
+    registry = get_app(config_uri, **NO_WARM_UP).registry
+    if not template_lookup(registry).module_directory:
+        print 'no mako.module_directory configured; templates are compiled in memory only'
+    loaded, errors = compile_templates(registry)
+    for uri, error in sorted(errors.items()):
+        print 'error', uri, error
+    print 'compiled %s templates' % len(loaded)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    import sys
+    main(sys.argv[1])
+    sys.exit(0)
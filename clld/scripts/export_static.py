@@ -0,0 +1,40 @@
+"""
+Export a clld app as static site.
+
+python export_static.py production.ini /path/to/export [--workers 4] [--base-url URL]
+    [--force]
+
+Only resources which changed since the previous export into the same directory are
+re-rendered, unless --force is given.
+"""
+import argparse
+import multiprocessing
+
+from clld.web.export import export
+from clld.web.warmup import NO_WARM_UP
+from clld.scripts.util import get_app
+
+
+def main(args=None):  # pragma: no cover
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config_uri')
+    parser.add_argument('outdir')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--base-url', default=None)
+    parser.add_argument('--force', action='store_true', default=False)
+    args = parser.parse_args(args=args)
+    count, errors = export(
+        get_app(args.config_uri, **NO_WARM_UP),
+        args.outdir,
+        base_url=args.base_url,
+        workers=args.workers,
+        force=args.force)
+    for url_path in errors:
+        print 'error', url_path
+    print 'exported %s files' % count
+
+
+if __name__ == '__main__':  # pragma: no cover
+    import sys
+    main()
+    sys.exit(0)
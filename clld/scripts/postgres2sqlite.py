@@ -1,103 +1,44 @@
 """
-python postgres2sqlite.py apics 2>&1 >/dev/null | less
+Export the data of a clld app's PostgreSQL database to a SQLite database.
 
-Unfortunately this approach does not seem to work, thus, our only option is
-intialize_db and making sure all db changes are done via alembic migrations.
+python postgres2sqlite.py apics [workers]
+python postgres2sqlite.py development.ini [workers]
 """
-from subprocess import call
 from importlib import import_module
-import pkg_resources
-import re
 from tempfile import mktemp
 
+from sqlalchemy import engine_from_config, create_engine
+from pyramid.paster import get_appsettings
 from path import path
-from sqlalchemy import create_engine
 
 from clld.db.meta import Base
+from clld.db.util import dump_sqlite
+from clld.scripts.util import get_app_package
 
 
-def replace_booleans(line):
-    """replaces postgres boolean literals with 0|1 within the values in an INSERT
-    statement as created by pg_dump.
-
-    .. note::
-
-        - we rely on the INSERT statements not containing newlines.
-        - we somewhat naively split the values at commas and assume that if a single
-          token equals "true" or false", it was a boolean value in postgres. Obviously
-          this assumption does not hold for a text value like "..., true, ...".
-          We may switch to using sqlparse for a more robust detection of booleans.
-
-    >>> assert replace_booleans('INSERT (true, false);').strip() == 'INSERT (1, 0);'
+def postgres2sqlite(name, fname=None, workers=4, config_uri=None):  # pragma: no cover
     """
-    insert, values = line.split('(', 1)
-    assert values.endswith(');')
-    values = values[:-2]
-    clean_values = []
-    for token in values.split(', '):
-        if token == 'true':
-            token = "1"
-        elif token == 'false':
-            token = "0"
-        clean_values.append(token)
-    return '%s(%s);\n' % (insert, ', '.join(clean_values))
-
-
-STMT_END = re.compile("([^\']\'|\, [0-9]+)\)\;$")
-
-
-def inserts(iterator):
+    :param name: name of the app package, which by convention is also the name of its \
+    PostgreSQL database.
+    :param config_uri: ini file of the app; if given, the database is read from its \
+    sqlalchemy.url setting.
+    :return: path of the SQLite database file.
     """
-    >>> assert list(inserts(["INSERT (1, 1);"])) == ['INSERT (1, 1);']
-    >>> assert list(inserts(["INSERT ('a", "b');"])) == ["INSERT ('a__newline__b');"]
-    """
-    insert = []
-    for line in iterator:
-        line = line.strip()
-        if line.startswith('INSERT '):
-            if STMT_END.search(line):
-                yield line
-            else:
-                insert = [line]
-        else:
-            if insert:
-                # a continuation line!
-                insert.append(line)
-                if STMT_END.search(line):
-                    c = '__newline__'.join(insert)
-                    insert = []
-                    yield c
-
-
-def convert_dump(i, o):  # pragma: no cover
-    _insert = False
-    with file(o, 'w') as fp:
-        fp.write('.echo OFF\n.bail ON\n')
-        fp.write('BEGIN;\n')
-        for n, insert in enumerate(inserts(file(i))):
-            fp.write(replace_booleans(insert))
-        fp.write('END;\n')
-
-
-def postgres2sqlite(name):  # pragma: no cover
-    pg_sql = path(mktemp('.sql'))
-    sqlite_sql = path(mktemp('.sql'))
-    sqlite = mktemp('.sqlite')
-
-    call("pg_dump  -f {0} --data-only --inserts {1}".format(pg_sql, name), shell=True)
-    convert_dump(pg_sql, sqlite_sql)
-    engine = create_engine('sqlite:////{0}'.format(sqlite))
-    m = import_module('{0}.models'.format(name))
-    Base.metadata.create_all(engine)
-    call('sqlite3 -bail -init {0} {1} ".exit"'.format(sqlite_sql, sqlite), shell=True)
-    if pg_sql.exists():
-        pg_sql.remove()
-    if sqlite_sql.exists():
-        sqlite_sql.remove()
-    return sqlite
+    # make sure all custom models are registered with the metadata:
+    import_module('{0}.models'.format(name))
+    if config_uri:
+        engine = engine_from_config(get_appsettings(config_uri), 'sqlalchemy.')
+    else:
+        engine = create_engine('postgresql:///{0}'.format(name))
+    return dump_sqlite(
+        engine, fname or mktemp('.sqlite'), metadata=Base.metadata, workers=workers)
 
 
 if __name__ == '__main__':  # pragma: no cover
     import sys
-    postgres2sqlite(sys.argv[1])
+    arg, kw = sys.argv[1], {}
+    if path(arg.split('#')[0]).exists():
+        # an ini file - the package is the one providing the app factory:
+        arg, kw = get_app_package(arg), dict(config_uri=arg)
+    postgres2sqlite(arg, workers=int(sys.argv[2]) if len(sys.argv) > 2 else 4, **kw)
     sys.exit(0)
@@ -0,0 +1,37 @@
+"""
+Prime the caches of a clld app by replaying popular requests.
+
+python prime_caches.py production.ini [--log access.log ...] [--top 100] [--concurrency 4]
+    [--url http://localhost:6081]
+
+URLs are taken from the access logs or - if no logs are given - from the sitemap. They
+are replayed against the app in-process or, if --url is given, against a running server,
+e.g. to prime an HTTP cache like varnish; latency percentiles are reported per route.
+"""
+import argparse
+
+from clld.web.warmup import prime_urls, replay, report, NO_WARM_UP
+from clld.scripts.util import get_app
+
+
+def main(args=None):  # pragma: no cover
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config_uri')
+    parser.add_argument('--log', nargs='*', default=[])
+    parser.add_argument('--top', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--url', default=None)
+    args = parser.parse_args(args=args)
+    app = get_app(args.config_uri, **NO_WARM_UP)
+    urls = prime_urls(app, args.log or ['sitemap'], args.top)
+    stats = replay(app, urls, concurrency=args.concurrency, base_url=args.url)
+    print '%-30s %8s %8s %8s %8s %8s' % (
+        'route', 'requests', 'errors', 'p50', 'p90', 'p99')
+    for row in report(stats):
+        print '%-30s %8s %8s %6sms %6sms %6sms' % tuple(row)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    import sys
+    main()
+    sys.exit(0)
@@ -0,0 +1,45 @@
+"""
+Report where the startup time of a clld app goes.
+
+python profile_startup.py development.ini [runs]
+
+The first run of the app factory includes importing the app's modules; subsequent runs
+measure the app factory alone. The phases of get_configurator are reported as recorded in
+the registry, followed by the functions with the highest cumulative time.
+"""
+import sys
+import time
+import cProfile
+import pstats
+from cStringIO import StringIO
+
+from pyramid.paster import get_app
+
+
+def profile_startup(config_uri, runs=5, limit=30):  # pragma: no cover
+    start = time.time()
+    app = get_app(config_uri)
+    res = ['cold start: %.3fs' % (time.time() - start)]
+
+    times = []
+    for i in range(runs):
+        start = time.time()
+        app = get_app(config_uri)
+        times.append(time.time() - start)
+    res.append('app factory: %.3fs (min), %.3fs (mean) of %s runs' % (
+        min(times), sum(times) / len(times), runs))
+
+    res.extend(['', 'get_configurator phases:', app.registry.startup_profile.report()])
+
+    profiler = cProfile.Profile()
+    profiler.runcall(get_app, config_uri)
+    out = StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    res.extend(['', out.getvalue()])
+    return '\n'.join(res)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    print profile_startup(
+        sys.argv[1], runs=int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    sys.exit(0)
@@ -11,14 +11,17 @@ from functools import partial
 import transaction
 from sqlalchemy import engine_from_config, create_engine, Integer
 from sqlalchemy.sql.expression import cast
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, undefer
 from path import path
 from pyramid.paster import get_appsettings, setup_logging, bootstrap
-import requests
+from pyramid.settings import asbool
+from paste.deploy.loadwsgi import loadcontext, APP
 
-from clld.db.meta import VersionedDBSession, DBSession, Base
+from clld.db.meta import VersionedDBSession, DBSession, Base, JSONEncodedDict
 from clld.db.models import common
+from clld.db.util import compute_stats
 from clld.util import slug
+from clld.lib.harvest import JsonStore, Harvester
 from clld.interfaces import IDownload
 
 
@@ -39,6 +42,35 @@ def confirm(question, default=False):  # pragma: no cover
                 "Please respond with 'yes' or 'no' (or 'y' or 'n').\n")
 
 
+def get_app(config_uri, **settings):
+    """Load the app configured in an ini file - like pyramid.paster.get_app, but with the
+    settings of the app section updated with the keyword arguments.
+
+    >>> from clld.tests.util import TESTS_DIR
+    >>> app = get_app(TESTS_DIR.joinpath('test.ini'), custom_int='6')
+    >>> assert app.registry.settings['custom_int'] == '6'
+    """
+    ctx = _app_context(config_uri)
+    ctx.local_conf.update(settings)
+    return ctx.create()
+
+
+def get_app_package(config_uri):
+    """
+    :return: name of the package providing the factory of the app configured in an ini \
+    file.
+
+    >>> from clld.tests.util import TESTS_DIR
+    >>> assert get_app_package(TESTS_DIR.joinpath('test.ini')) == 'clld'
+    """
+    return _app_context(config_uri).object.__module__.split('.')[0]
+
+
+def _app_context(config_uri):
+    fname, _, name = ('%s' % config_uri).partition('#')
+    return loadcontext(APP, 'config:%s' % path(fname).abspath(), name=name or None)
+
+
 def data_file(module, *comps):
     """
     >>> assert data_file(common)
@@ -49,7 +81,9 @@ def data_file(module, *comps):
 def setup_session(config_uri, engine=None):
     setup_logging(config_uri)
     settings = get_appsettings(config_uri)
-    engine = engine or engine_from_config(settings, 'sqlalchemy.')
+    engine = engine or JSONEncodedDict.configure(
+        engine_from_config(settings, 'sqlalchemy.'),
+        asbool(settings.get('clld.native_json', False)))
     DBSession.configure(bind=engine)
     VersionedDBSession.configure(bind=engine)
     Base.metadata.create_all(engine)
@@ -118,9 +152,10 @@ def initializedb(create=None, prime_cache=None, **kw):  # pragma: no cover
         if create:
             with transaction.manager:
                 create(args)
-    if prime_cache:
-        with transaction.manager:
+    with transaction.manager:
+        if prime_cache:
             prime_cache(args)
+        compute_stats()
 
 
 def create_downloads(**kw):
@@ -134,6 +169,8 @@ def gbs(**kw):  # pragma: no cover
     add_args = [
         (("command",), dict(help="download|verify|update")),
         (("--api-key",), dict(default=kw.get('key', os.environ.get('GBS_API_KEY')))),
+        (("--workers",), dict(type=int, default=4, help="number of concurrent requests")),
+        (("--rate",), dict(type=float, default=5.0, help="max. requests per second")),
     ]
 
     args = parsed_args(*add_args, **kw)
@@ -144,43 +181,59 @@ def gbs(**kw):  # pragma: no cover
         gbs_func(args.command, args, kw.get('sources'))
 
 
-def gbs_func(command, args, sources=None):  # pragma: no cover
+def gbs_store(args):
+    """The store for Google Books Search results, keyed by source id.
+
+    JSON files of the form data/gbs/source<id>.json, as written by earlier versions of
+    gbs_func, are imported when the store is created.
+    """
+    dir_ = args.data_file('gbs')
+    if not dir_.exists():
+        dir_.makedirs()
+    fname = dir_.joinpath('gbs.sqlite')
+    new = not fname.exists()
+    store = JsonStore(fname)
+    if new:
+        for fpath in dir_.files('source*.json'):
+            with open(fpath) as fp:
+                try:
+                    store[fpath.namebase[len('source'):]] = json.load(fp)
+                except ValueError:
+                    args.log.warn('no JSON object found in: %s' % fpath)
+    return store
+
+
+def gbs_func(command, args, sources=None):
     def words(s):
         return set(slug(s.strip(), remove_whitespace=False).split())
 
     log = args.log
     count = 0
-    api_url = "https://www.googleapis.com/books/v1/volumes?"
+    api_url = getattr(
+        args, 'gbs_api_url', "https://www.googleapis.com/books/v1/volumes?")
+    store = gbs_store(args)
+    queries = []
 
     if not sources:
         sources = DBSession.query(common.Source)\
             .order_by(cast(common.Source.id, Integer))\
-            .options(joinedload(common.Source.data))
+            .options(joinedload(common.Source.data), undefer('jsondata'))
     if callable(sources):
         sources = sources()
 
+    i = 0
     for i, source in enumerate(sources):
-        filepath = args.data_file('gbs', 'source%s.json' % source.id)
-
         if command == 'update':
             source.google_book_search_id = None
             source.update_jsondata(gbs={})
 
         if command in ['verify', 'update']:
-            if filepath.exists():
-                with open(filepath) as fp:
-                    try:
-                        data = json.load(fp)
-                    except ValueError:
-                        log.warn('no JSON object found in: %s' % filepath)
-                        continue
-                if not data['totalItems']:
-                    continue
-                item = data['items'][0]
-            else:
+            data = store.get(source.id)
+            if not data or not data['totalItems']:
                 continue
+            item = data['items'][0]
 
-        if command == 'verify':
+        if command == 'verify':  # pragma: no cover
             stitle = source.description or source.title or source.booktitle
             needs_check = False
             year = item['volumeInfo'].get('publishedDate', '').split('-')[0]
@@ -194,9 +247,6 @@ def gbs_func(command, args, sources=None):  # pragma: no cover
                     or (len(iwords) > 2 and iwords.issubset(twords))\
                     or (len(twords) > 2 and twords.issubset(iwords)):
                 needs_check = False
-            if int(source.id) == 241:
-                log.info('%s' % sorted(list(words(stitle))))
-                log.info('%s' % sorted(list(iwords)))
             if needs_check:
                 log.info('------- %s -> %s' % (source.id, item['volumeInfo'].get('industryIdentifiers')))
                 log.info('%s %s' % (item['volumeInfo']['title'], item['volumeInfo'].get('subtitle', '')))
@@ -209,8 +259,7 @@ def gbs_func(command, args, sources=None):  # pragma: no cover
                 log.info(source.publisher)
                 if not confirm('Are the records the same?'):
                     log.warn('---- removing ----')
-                    with open(filepath, 'w') as fp:
-                        json.dump({"totalItems": 0}, fp)
+                    store[source.id] = {"totalItems": 0}
         elif command == 'update':
             source.google_book_search_id = item['id']
             source.update_jsondata(gbs=item)
@@ -218,8 +267,6 @@ def gbs_func(command, args, sources=None):  # pragma: no cover
         elif command == 'download':
             if source.author and (source.title or source.booktitle):
                 title = source.title or source.booktitle
-                if filepath.exists():
-                    continue
                 q = [
                     'inauthor:' + quote_plus(source.author.encode('utf8')),
                     'intitle:' + quote_plus(title.encode('utf8')),
@@ -227,16 +274,16 @@ def gbs_func(command, args, sources=None):  # pragma: no cover
                 if source.publisher:
                     q.append('inpublisher:' + quote_plus(
                         source.publisher.encode('utf8')))
-                url = api_url + 'q=%s&key=%s' % ('+'.join(q), args.api_key)
-                count += 1
-                r = requests.get(url, headers={'accept': 'application/json'})
-                log.info('%s - %s' % (r.status_code, url))
-                if r.status_code == 200:
-                    with open(filepath, 'w') as fp:
-                        fp.write(r.text.encode('utf8'))
-                elif r.status_code == 403:
-                    log.warn("limit reached")
-                    break
+                queries.append((
+                    source.id, api_url + 'q=%s&key=%s' % ('+'.join(q), args.api_key)))
+
+    if command == 'download':
+        harvester = Harvester(
+            store,
+            workers=getattr(args, 'workers', 4),
+            rate=getattr(args, 'rate', None))
+        count = len([
+            status for status in harvester.harvest(queries).values() if status == 200])
     if command == 'update':
         log.info('assigned gbs ids for %s out of %s sources' % (count, i))
     elif command == 'download':
@@ -5,6 +5,6 @@ from clld.db.versioned import Versioned
 from clld.db.meta import CustomModelMixin
 
 
-class CustomLanguage(common.Language, Versioned, CustomModelMixin):
+class CustomLanguage(CustomModelMixin, common.Language, Versioned):
     pk = Column(Integer, ForeignKey('language.pk'), primary_key=True)
     custom = Column(Unicode)
@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
-from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
+from sqlalchemy.orm.exc import (
+    NoResultFound, MultipleResultsFound, DetachedInstanceError,
+)
 
 from clld.tests.util import TestWithDb
 from clld.db.models.common import Language
@@ -66,3 +68,87 @@ class Tests(TestWithDb):
     def test_Base_get(self):
         self.assertEqual(42, Language.get('doesntexist', default=42))
         self.assertRaises(NoResultFound, Language.get, 'doesntexist')
+
+    def test_jsondata_deferred(self):
+        from clld.db.meta import json_value
+
+        DBSession.add(Language(id='abc', name='Name', jsondata={'i': 2, 's': 'x'}))
+        DBSession.flush()
+        DBSession.expunge_all()
+
+        lang = DBSession.query(Language).filter(Language.id == 'abc').one()
+        self.assertTrue('jsondata' not in lang.__dict__)
+        self.assertEqual(lang.jsondata['i'], 2)
+
+        q = DBSession.query(Language).filter(json_value(Language.jsondata, 's') == 'x')
+        self.assertEqual(q.one().id, 'abc')
+
+        DBSession.expunge_all()
+        lang = DBSession.query(Language).filter(Language.id == 'abc').one()
+        DBSession.expunge(lang)
+        self.assertRaises(DetachedInstanceError, getattr, lang, 'jsondata')
+
+    def test_fork_safety(self):
+        from mock import patch
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import QueuePool
+        from clld.db.meta import engines, prefork, after_fork
+
+        self.assertTrue(engines())
+
+        engine = create_engine('sqlite://', poolclass=QueuePool)
+        conn = engine.connect()
+        inherited = conn.connection.connection
+        conn.close()
+        with patch('clld.db.meta.os.getpid', return_value=-1):
+            conn = engine.connect()
+            # a connection opened by another process is not re-used:
+            self.assertIsNot(conn.connection.connection, inherited)
+            conn.close()
+
+        after_fork()
+        prefork()
+
+    def test_readonly_session(self):
+        from clld.db.meta import readonly_session
+
+        session = readonly_session()
+        self.assertIs(DBSession(), session)
+        self.assertFalse(session.autoflush)
+        self.assertEqual(DBSession.query(Language).count(), 0)
+        DBSession.remove()
+        self.assertIsNot(DBSession(), session)
+
+    def test_Replicas(self):
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        from sqlalchemy import create_engine
+        from clld.db.meta import Base, REPLICAS, readonly_session
+
+        tmp = mkdtemp()
+        try:
+            replicas = []
+            for name in ['r1', 'r2']:
+                engine = create_engine('sqlite:///%s/%s.sqlite' % (tmp, name))
+                Base.metadata.create_all(bind=engine)
+                engine.execute(Language.__table__.insert(), pk=1, id=name, name=name)
+                replicas.append(engine)
+            # a replica which cannot be connected to:
+            replicas.append(create_engine('sqlite:///%s/missing/r3.sqlite' % tmp))
+
+            REPLICAS.configure(replicas)
+            ids = []
+            for i in range(4):
+                readonly_session()
+                ids.append(DBSession.query(Language).one().id)
+                DBSession.remove()
+            self.assertEqual(ids, ['r1', 'r2', 'r1', 'r2'])
+
+            # without healthy replica, the primary db is used:
+            REPLICAS.configure(replicas[2:])
+            readonly_session()
+            self.assertEqual(DBSession.query(Language).count(), 0)
+            DBSession.remove()
+        finally:
+            REPLICAS.configure([])
+            rmtree(tmp)
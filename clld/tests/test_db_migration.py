@@ -0,0 +1,28 @@
+from mock import Mock
+
+from clld.tests.util import TestWithDb
+
+
+class Tests(TestWithDb):
+    def test_jsondata_migration(self):
+        from clld.db.meta import DBSession
+        from clld.db.migration import jsondata_to_json, jsondata_to_text
+
+        for func, type_ in [(jsondata_to_json, 'JSON'), (jsondata_to_text, 'VARCHAR')]:
+            op = Mock(get_bind=Mock(return_value=DBSession.connection()))
+            func(op)
+            statements = [call[0][0] for call in op.execute.call_args_list]
+            self.assertIn(
+                'ALTER TABLE language ALTER COLUMN jsondata TYPE %s' % type_,
+                '\n'.join(statements))
+
+    def test_statistic_migration(self):
+        from clld.db.meta import DBSession
+        from clld.db.models.common import Statistic
+        from clld.db.migration import add_statistic, drop_statistic
+
+        op = Mock(get_bind=Mock(return_value=DBSession.connection()))
+        drop_statistic(op)
+        assert not Statistic.__table__.exists(bind=DBSession.connection())
+        add_statistic(op)
+        assert Statistic.__table__.exists(bind=DBSession.connection())
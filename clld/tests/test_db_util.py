@@ -18,3 +18,89 @@ class Tests(TestWithDbAndData):
     def test_compute_number_of_values(self):
         from clld.db.util import compute_number_of_values
         compute_number_of_values()
+
+    def test_compute_stats(self):
+        from clld import RESOURCES
+        from clld.db.models.common import Dataset, Parameter, Statistic
+        from clld.db.meta import DBSession
+        from clld.db.util import compute_stats
+
+        compute_stats()
+        DBSession.flush()
+        param = Parameter.get('parameter')
+        self.assertEqual(Statistic.count(param, 'valueset'), 1)
+        self.assertEqual(Statistic.count(param.domain[0], 'value'), 1)
+        self.assertEqual(Statistic.count(param, 'unknown', default=0), 0)
+        self.assertEqual(
+            Dataset.first().get_stats(RESOURCES)['language'],
+            Statistic.totals()['language'])
+
+        Statistic.get('language', key='key').value = 1000
+        self.assertEqual(Dataset.first().get_stats(RESOURCES)['language'], 1000)
+        compute_stats()
+        DBSession.flush()
+        self.assertEqual(Statistic.totals()['language'], 101)
+
+        # without statistic table, counts are computed live:
+        Statistic.__table__.drop(bind=DBSession.connection())
+        Statistic._available.clear()
+        self.assertEqual(Statistic.totals(), {})
+        self.assertEqual(Statistic.count(param, 'valueset'), None)
+        self.assertEqual(Dataset.first().get_stats(RESOURCES)['language'], 101)
+
+    def test_polymorphic_loading(self):
+        from clld.db.models.common import Language
+        from clld.db.meta import DBSession
+        from clld.db.util import with_polymorphic, load_polymorphic
+        from clld.tests.fixtures import CustomLanguage
+
+        DBSession.add(CustomLanguage(id='custom', name='Custom', custom='c'))
+        DBSession.flush()
+        DBSession.expunge_all()
+
+        lang = with_polymorphic(DBSession.query(Language))\
+            .filter(Language.id == 'custom').one()
+        self.assertTrue('custom' in lang.__dict__)
+        DBSession.expunge_all()
+
+        lang = DBSession.query(Language).filter(Language.id == 'custom').one()
+        self.assertTrue('custom' not in lang.__dict__)
+        load_polymorphic([lang])
+        self.assertEqual(lang.__dict__['custom'], 'c')
+
+    def test_dump_sqlite(self):
+        from tempfile import mktemp
+
+        from path import path
+        from sqlalchemy import create_engine
+
+        from clld.db.models.common import Language
+        from clld.db.meta import DBSession
+        from clld.db.util import dump_sqlite
+
+        DBSession.flush()
+        fname = path(mktemp('.sqlite'))
+        dump_sqlite(DBSession.connection(), fname, blocksize=7)
+        engine = create_engine('sqlite:///%s' % fname)
+        self.assertEqual(
+            engine.execute('select count(*) from language').fetchone()[0],
+            DBSession.query(Language).count())
+
+        # copy the copy, reading tables concurrently:
+        fname2 = path(mktemp('.sqlite'))
+        dump_sqlite(engine, fname2, workers=3)
+        self.assertEqual(
+            create_engine('sqlite:///%s' % fname2).execute(
+                'select jsondata from language where id = ?', ('language',)).fetchone(),
+            engine.execute(
+                'select jsondata from language where id = ?', ('language',)).fetchone())
+
+        # readers must not block forever if the consumer stops early:
+        from clld.db.meta import Base
+        from clld.db.util import _parallel_blocks
+
+        blocks = _parallel_blocks(engine, Base.metadata.sorted_tables, 1, 2)
+        next(blocks)
+        blocks.close()
+        fname.remove()
+        fname2.remove()
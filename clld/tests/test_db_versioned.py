@@ -29,3 +29,40 @@ class Tests(TestWithDb):
         VersionedDBSession.delete(li)
         VersionedDBSession.delete(l)
         VersionedDBSession.flush()
+
+    def test_changes(self):
+        from datetime import datetime, timedelta
+
+        from clld.db.models.common import Language
+        from clld.db.meta import VersionedDBSession
+        from clld.db.util import changes
+
+        start = datetime.utcnow() - timedelta(seconds=1)
+        b = Language(id='b', name='B')
+        VersionedDBSession.add(Language(id='a', name='A'))
+        VersionedDBSession.add(b)
+        VersionedDBSession.flush()
+        self.assertEqual(
+            [(c[0], c[1]) for c in changes(Language, start)],
+            [('created', 'a'), ('created', 'b')])
+
+        VersionedDBSession.delete(b)
+        VersionedDBSession.flush()
+        res = dict((c[1], c) for c in changes(Language))
+        self.assertEqual(res['b'][0], 'deleted')
+        self.assertEqual(res['b'][3], 1)
+        self.assertEqual(res['a'][3], 1)
+        self.assertEqual(changes(Language, datetime.utcnow() + timedelta(days=1)), [])
+
+        # aware datetimes are compared in UTC:
+        from clld.util import UTC
+        self.assertEqual(
+            [c[1] for c in changes(Language, start.replace(tzinfo=UTC))], ['a', 'b'])
+        tomorrow = datetime.utcnow() + timedelta(days=1)
+        self.assertEqual(changes(Language, tomorrow.replace(tzinfo=UTC)), [])
+
+        # listings can be limited and resumed after the last change listed:
+        first = changes(Language, start, limit=1)
+        self.assertEqual([c[1] for c in first], ['a'])
+        self.assertEqual(
+            [c[1] for c in changes(Language, first[0][2], since_id=first[0][1])], ['b'])
@@ -17,7 +17,7 @@ from mock import Mock, MagicMock, patch
                 require=Mock(),
                 postgres=Mock())
 def test_deploy():
-    from clld.deploy.util import deploy
+    from clld.deploy.util import deploy, export_static
     from clld.deploy.config import App
 
     app = App('test', 9999, domain='d')
@@ -25,13 +25,14 @@ def test_deploy():
     deploy(app, 'test')
     deploy(app, 'test', with_alembic=True)
     deploy(app, 'production')
+    export_static(app)
 
 
 @patch.multiple('clld.deploy.tasks', execute=Mock())
 def test_tasks():
     from clld.deploy.tasks import (
         init, deploy, start, stop, maintenance, cache, uncache, run_script,
-        create_downloads, copy_files,
+        create_downloads, copy_files, export_static, prime_caches,
     )
 
     init('apics')
@@ -44,3 +45,5 @@ def test_tasks():
     run_script('test', 'script')
     create_downloads('test')
     copy_files('test')
+    export_static('test')
+    prime_caches('test')
@@ -27,7 +27,73 @@ class Tests(TestWithApp):
             self.app.get('/%ss.rdf' % rsc.name, status=200)
             self.app.get('/%ss?sEcho=1&iDisplayLength=5' % rsc.name, xhr=True, status=200)
 
+    def test_changes(self):
+        self.app.get('/changes', status=200)
+        self.app.get('/changes.jsonl', status=200)
+        self.app.get('/changes.nt?rsc=language', status=200)
+        self.app.get('/changes.jsonl?since=x', status=400)
+
     def test_source(self):
         for ext in 'bib en ris mods'.split():
             self.app.get('/sources/source.' + ext, status=200)
             self.app.get('/sources.' + ext, status=200)
+
+    def test_fragment_cache(self):
+        from clld.interfaces import IFragmentCache
+        from clld.db.models.common import Parameter
+
+        cache = self.env['registry'].getUtility(IFragmentCache)
+        res = self.app.get('/valuesets/valueset', status=200)
+        self.assertEqual(res.body, self.app.get('/valuesets/valueset').body)
+        self.assertEqual(cache.lru.hits, 1)
+        self.app.get('/languages/language.snippet.html', status=200)
+        self.app.get(
+            '/languages/language.snippet.html?parameter=%s' % Parameter.get('parameter').pk,
+            status=200)
+        self.app.get('/languages/language.snippet.html', status=200)
+        self.assertEqual(cache.lru.hits, 2)
+
+    def test_sources_export(self):
+        res = self.app.get('/sources.ris?language=language', status=200)
+        self.assertEqual(res.body.count('ER  - '), 1)
+        self.assertTrue('attachment' in res.headers['Content-Disposition'])
+        res = self.app.get('/sources.mods', status=200)
+        self.assertEqual(res.body.count('<mods '), 2)
+
+    def test_bundle(self):
+        from gzip import GzipFile
+        from contextlib import closing
+
+        from tempfile import mkdtemp
+
+        from path import path
+        from pyramid.request import Request
+
+        from clld.web.views import bundle
+
+        settings = self.env['registry'].settings
+        tmp, directory = path(mkdtemp()), settings['clld.assets_directory']
+        settings['clld.assets_directory'] = tmp
+        tmp.joinpath('js').mkdir()
+        fname = tmp.joinpath('js', 'packed.0123abcd.js')
+        with open(fname, 'w') as fp:
+            fp.write('var a = 1;')
+        with closing(GzipFile(fname + '.gz', 'w')) as fp:
+            fp.write('var a = 1;')
+        try:
+            res = self.app.get('/static/js/packed.0123abcd.js', status=200)
+            self.assertEqual(res.body, 'var a = 1;')
+            self.assertIn('immutable', res.headers['Cache-Control'])
+
+            # webtest decodes gzipped content, so we call the view directly:
+            req = Request.blank('/', headers={'Accept-Encoding': 'gzip'})
+            req.registry = self.env['registry']
+            req.matchdict = dict(type='js', version='0123abcd', ext='js')
+            res = bundle(req)
+            self.assertEqual(res.content_encoding, 'gzip')
+            self.assertEqual(res.vary, ('Accept-Encoding',))
+            fname.remove()
+            self.app.get('/static/js/packed.0123abcd.js', status=404)
+        finally:
+            settings['clld.assets_directory'] = directory
+            tmp.rmtree()
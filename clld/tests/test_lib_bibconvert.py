@@ -0,0 +1,55 @@
+import unittest
+from xml.etree import cElementTree as et
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        from clld.lib.bibtex import Record
+
+        self.records = [
+            Record(
+                'article', 'a',
+                author='Meier, Hans and Anna Smith', title='T<itle>', journal='J',
+                volume='3', number='2', pages='10--20', year='2000'),
+            Record(
+                'book', 'b',
+                editor='E. Ditor', title='Book', publisher='P', address='Berlin',
+                series='S'),
+            Record('misc', 'c'),
+        ]
+
+    def test_ris(self):
+        from clld.lib.bibconvert import convert
+
+        res = convert(self.records, 'ris')
+        self.assertEqual(res.count('ER  - '), 3)
+        self.assertTrue('AU  - Smith, Anna\n' in res)
+        self.assertTrue('SP  - 10\nEP  - 20\n' in res)
+        self.assertTrue('TY  - GEN' in res)
+
+    def test_endnote(self):
+        from clld.lib.bibconvert import convert
+
+        res = convert(self.records, 'en')
+        self.assertTrue('%0 Journal Article\n%A Meier, Hans' in res)
+        self.assertTrue('%E Ditor, E.' in res)
+        self.assertTrue('%I P' in res)
+
+    def test_mods(self):
+        from clld.lib.bibconvert import convert
+
+        ns = '{http://www.loc.gov/mods/v3}'
+        res = et.fromstring(convert(self.records, 'mods').encode('utf8'))
+        self.assertEqual(len(res.findall(ns + 'mods')), 3)
+        article = res.find(ns + 'mods')
+        self.assertEqual(article.find(ns + 'titleInfo/' + ns + 'title').text, 'T<itle>')
+        self.assertEqual(
+            article.find('%srelatedItem/%spart/%sextent/%send' % (ns, ns, ns, ns)).text,
+            '20')
+
+    def test_Database(self):
+        from clld.lib.bibtex import Database
+
+        db = Database(self.records)
+        self.assertEqual(''.join(db.iterformat('ris')), db.format('ris'))
+        self.assertEqual(len(list(db.iterformat('bib'))), 3)
@@ -1,6 +1,8 @@
 import unittest
+from tempfile import mkdtemp
 
 from mock import Mock
+from path import path
 
 from clld.tests.util import TESTS_DIR
 
@@ -35,3 +37,37 @@ class Tests(unittest.TestCase):
         self.assertEqual(len(db), 0)
         db = Database.from_file(TESTS_DIR.joinpath('test.bib'))
         self.assertEqual(len(db), 1)
+
+    def test_Database_lazy(self):
+        from clld.lib.bibtex import Database, iterentries
+
+        tmp = path(mkdtemp())
+        bib = tmp.joinpath('test.bib')
+        with open(bib, 'wb') as fp:
+            fp.write("""\
+@comment{ignore {me}}
+@book{a,
+  title = {The {IPA}
+    chart},
+  note = "contact: a@example.org",
+  year = 1999
+}
+@article{b, title = "x" # {y}}""".encode('utf8'))
+
+        with open(bib, 'rb') as fp:
+            self.assertEqual(len(list(iterentries(fp))), 2)
+
+        db = Database.from_file(bib, lazy=True)
+        self.assertTrue(tmp.joinpath('test.bib.idx').exists())
+        self.assertEqual(len(db), 2)
+        self.assertEqual(db['a']['title'], 'The {IPA} chart')
+        self.assertEqual(db['a']['note'], 'contact: a@example.org')
+        self.assertEqual(db['b']['title'], 'xy')
+        self.assertEqual(db['a'].keys(), ['title', 'note', 'year'])
+        self.assertEqual(
+            [r.id for r in db.records], [r.id for r in Database.from_file(bib).records])
+
+        # the persisted index is used:
+        self.assertEqual(Database.from_file(bib, lazy=True)['b'].genre, 'article')
+        self.assertEqual(len(Database.from_file(tmp.joinpath('x.bib'), lazy=True)), 0)
+        tmp.rmtree()
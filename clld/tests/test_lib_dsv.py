@@ -0,0 +1,31 @@
+# coding: utf8
+from __future__ import unicode_literals
+import unittest
+from cStringIO import StringIO
+
+
+class Tests(unittest.TestCase):
+    def test_iterrows(self):
+        from clld.lib.dsv import iterrows
+
+        fp = StringIO(b'pk,name\n1,"a, \nb"\n\n2,\xc3\xa4\n,x\n')
+        res = list(iterrows(
+            fp,
+            delimiter=',',
+            quotechar='"',
+            namedtuples=True,
+            encoding='utf8',
+            converters=dict(pk=int)))
+        self.assertEqual(len(res), 3)
+        self.assertEqual(res[0].name, 'a, \nb')
+        self.assertEqual(res[1], (2, 'ä'))
+        self.assertEqual(res[2].pk, None)
+
+        fp = StringIO(b'1\t2\r\n3\t4')
+        res = list(iterrows(fp, newline='\r\n', converters={1: int}))
+        self.assertEqual(res, [['1', 2], ['3', 4]])
+
+    def test_batched(self):
+        from clld.lib.dsv import batched
+
+        self.assertEqual(list(map(len, batched(range(2500)))), [1000, 1000, 500])
@@ -1,8 +1,24 @@
+import os
+import time
 import unittest
+import threading
+from urlparse import parse_qs
+from wsgiref.simple_server import make_server
+from tempfile import mkdtemp
 
 from mock import Mock, patch
+from path import path
 
-from clld.tests.util import TESTS_DIR
+from clld.tests.util import TESTS_DIR, Handler
+
+
+def fmpxml(ids, total):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<FMPXMLRESULT xmlns="http://www.filemaker.com/fmpxmlresult">'
+        '<METADATA><FIELD NAME="id" TYPE="NUMBER"/></METADATA>'
+        '<RESULTSET FOUND="%s">%s</RESULTSET></FMPXMLRESULT>' % (
+            total, ''.join('<ROW><COL><DATA>%s</DATA></COL></ROW>' % i for i in ids)))
 
 
 class Tests(unittest.TestCase):
@@ -10,6 +26,9 @@ class Tests(unittest.TestCase):
         from clld.lib.fmpxml import Result
 
         r = Result(file(TESTS_DIR.joinpath('fmpxmlresult.xml')).read())
+        self.assertEqual(r.total, 2)
+        self.assertEqual(len(r.items), 1)
+        self.assertTrue(isinstance(r.items[0]['Data_record_id'], (int, long)))
 
     def test_normalize_markup(self):
         from clld.lib.fmpxml import normalize_markup
@@ -26,3 +45,97 @@ class Tests(unittest.TestCase):
             c = Client(None, None, None, None, verbose=False)
             c.get('stuff')
             c.get('stuff')
+
+    def test_Client_error(self):
+        from requests import HTTPError
+        from clld.lib.fmpxml import Client
+
+        r = Mock(raise_for_status=Mock(side_effect=HTTPError()))
+
+        with patch('clld.lib.fmpxml.requests', Mock(get=lambda *a, **kw: r)):
+            c = Client(None, None, None, None, verbose=False)
+            self.assertRaises(HTTPError, c.get, 'stuff')
+            self.assertEqual(c.cache, {})
+
+    def test_Client_concurrent(self):
+        from clld.lib.fmpxml import Client
+
+        requests = []
+        content = file(TESTS_DIR.joinpath('fmpxmlresult.xml')).read()
+
+        def app(environ, start_response):
+            requests.append(environ['QUERY_STRING'])
+            start_response(
+                '200 OK', [(str('Content-Type'), str('text/xml; charset=utf-8'))])
+            return [content]
+
+        server = make_server('127.0.0.1', 0, app, handler_class=Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        cache = path(mkdtemp())
+        try:
+            host = '127.0.0.1:%s' % server.server_port
+            c = Client(host, 'db', 'u', 'pw', limit=1, cache=cache, verbose=False)
+            self.assertEqual(len(c.get('stuff')), 2)
+            self.assertEqual(len(requests), 2)
+
+            # batches are now retrieved from the cache:
+            c = Client(host, 'db', 'u', 'pw', limit=1, cache=cache, verbose=False)
+            self.assertEqual(len(list(c.iterget('stuff'))), 2)
+            self.assertEqual(len(requests), 2)
+        finally:
+            server.shutdown()
+            cache.rmtree()
+
+    def test_Client_capped_batches(self):
+        from clld.lib.fmpxml import Client
+
+        total, cap = 10, 3
+
+        def app(environ, start_response):
+            # the server returns at most cap rows per batch, whatever -max is:
+            params = dict((k, v[0]) for k, v in parse_qs(
+                environ['QUERY_STRING'], keep_blank_values=True).items())
+            skip = int(params['-skip'])
+            ids = range(skip, min(total, skip + min(int(params['-max']), cap)))
+            start_response(
+                '200 OK', [(str('Content-Type'), str('text/xml; charset=utf-8'))])
+            return [fmpxml(ids, total)]
+
+        server = make_server('127.0.0.1', 0, app, handler_class=Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            host = '127.0.0.1:%s' % server.server_port
+            for workers in [1, 4]:
+                c = Client(host, 'db', 'u', 'pw', limit=4, verbose=False, workers=workers)
+                self.assertEqual([i['id'] for i in c.iterget('stuff')], range(total))
+        finally:
+            server.shutdown()
+
+    def test_DiskCache(self):
+        from clld.lib.fmpxml import DiskCache
+
+        d = path(mkdtemp())
+        try:
+            cache = DiskCache(d, ttl=60)
+            cache['a'] = 'x'
+            cache['b'] = 'y'
+            self.assertIn('a', cache)
+            self.assertEqual(cache['a'], 'x')
+
+            # expired batches are not served:
+            past = time.time() - 120
+            os.utime(cache._path('a'), (past, past))
+            self.assertNotIn('a', cache)
+            self.assertIn('b', cache)
+
+            del cache['b']
+            self.assertNotIn('b', cache)
+            cache['c'] = 'z'
+            cache.clear()
+            self.assertNotIn('c', cache)
+        finally:
+            d.rmtree()
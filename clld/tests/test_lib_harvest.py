@@ -0,0 +1,85 @@
+import time
+import unittest
+import threading
+import json
+from wsgiref.simple_server import make_server
+
+from clld.tests.util import Handler
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+
+        def app(environ, start_response):
+            key = environ['PATH_INFO'][1:]
+            self.requests.append(key)
+            if key == 'flaky' and self.requests.count(key) == 1:
+                status = '503 Service Unavailable'
+            elif key == 'quota':
+                status = '403 Forbidden'
+            elif key == 'down':
+                status = '503 Service Unavailable'
+            elif key == 'missing':
+                status = '404 Not Found'
+            else:
+                status = '200 OK'
+            start_response(
+                status, [(str('Content-Type'), str('application/json'))])
+            if key == 'invalid':
+                return [b'<html>']
+            return [json.dumps({'key': key})]
+
+        self.server = make_server('127.0.0.1', 0, app, handler_class=Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_TokenBucket(self):
+        from clld.lib.harvest import TokenBucket
+
+        bucket = TokenBucket(50, capacity=1)
+        start = time.time()
+        for i in range(6):
+            bucket.acquire()
+        self.assertTrue(time.time() - start >= 0.09)
+
+    def test_Harvester(self):
+        from clld.lib.harvest import JsonStore, Harvester
+
+        store = JsonStore(':memory:')
+        store['a'] = {'key': 'cached'}
+        harvester = Harvester(store, workers=3, rate=100, backoff=0.01)
+        res = harvester.harvest(
+            (key, self.url + key) for key in ['a', 'b', 'flaky', 'missing', 'invalid'])
+        self.assertEqual(
+            res, {'b': 200, 'flaky': 200, 'missing': 404, 'invalid': None})
+        self.assertNotIn('a', self.requests)
+        self.assertEqual(self.requests.count('flaky'), 2)
+        self.assertEqual(store['flaky'], {'key': 'flaky'})
+        self.assertEqual(sorted(store.keys()), ['a', 'b', 'flaky'])
+        self.assertEqual(dict(store.items())['a'], {'key': 'cached'})
+
+        # a 403 response stops the harvest:
+        harvester = Harvester(store, workers=1)
+        res = harvester.harvest(
+            (key, self.url + key) for key in ['quota', 'c', 'd'])
+        self.assertEqual(res['quota'], 403)
+        self.assertNotIn('c', self.requests)
+        self.assertNotIn('c', store)
+
+    def test_Harvester_retries(self):
+        from clld.lib.harvest import JsonStore, Harvester
+
+        harvester = Harvester(JsonStore(':memory:'), workers=1, retries=2, backoff=0.2)
+        start = time.time()
+        res = harvester.harvest([('down', self.url + 'down')])
+        self.assertEqual(res, {'down': 503})
+        self.assertEqual(self.requests.count('down'), 3)
+        # we back off between attempts - 0.2 + 0.4 seconds - but not after the last one:
+        self.assertTrue(0.6 <= time.time() - start < 1.2)
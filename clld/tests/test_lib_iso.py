@@ -1,3 +1,5 @@
+# coding: utf8
+from __future__ import unicode_literals
 import unittest
 
 from mock import Mock, patch
@@ -35,3 +37,40 @@ class Tests(unittest.TestCase):
             self._requests('<h1>yyy</h1><table><tr><td/><td/></tr></table>')
         ):
             get_documentation('yyy')
+
+    def test_Mirror(self):
+        from clld.lib.iso import Mirror
+        from clld.db.models.common import Identifier
+
+        m = Mirror(':memory:')
+        self.assertEqual(m.code('abc'), None)
+        m.load(
+            codes=['Id\tPart2B\tScope\tRef_Name', 'abc\t\tI\tAbc', 'xyz\t\tM\tXyz'],
+            names=[
+                'Id\tPrint_Name\tInverted_Name', 'abc\tÄbc\tÄbc', 'abc\tAlt\tAlt', ''],
+            macrolanguages=['M_Id\tI_Id\tI_Status', 'xyz\tabc\tA'],
+            retired=['Id\tRef_Name\tRet_Reason\tChange_To', 'old\tOld\tC\tabc'])
+        self.assertEqual(m.code('abc').scope, 'I')
+        self.assertEqual(m.names('abc'), ['Äbc', 'Alt'])
+        self.assertEqual(m.by_name('äBC')[0].id, 'abc')
+        self.assertEqual(m.macrolanguage('abc'), 'xyz')
+        self.assertEqual(m.retirement('old').change_to, 'abc')
+
+        identifiers = [
+            Identifier(name='abc', type='iso639-3'),
+            Identifier(name='old', type='iso639-3'),
+            Identifier(name='abc', type='wals')]
+        retired = m.enrich(identifiers)
+        self.assertEqual(identifiers[0].description, 'Abc')
+        self.assertEqual(identifiers[2].description, None)
+        self.assertEqual(list(retired.keys()), ['old'])
+
+    def test_Mirror_download(self):
+        from clld.lib.iso import Mirror
+
+        with patch.multiple(
+            'clld.lib.iso',
+            requests=self._requests('Id\tRef_Name\nabc\tAbc\n'),
+            get_taburls=Mock(return_value={'codes': 'path'})
+        ):
+            self.assertEqual(Mirror.download(':memory:').code('abc').ref_name, 'Abc')
@@ -1,8 +1,15 @@
 import unittest
+import threading
+import json
+from wsgiref.simple_server import make_server
+from tempfile import mkdtemp
+from functools import partial
 
 from path import path
+from mock import Mock
 
 import clld
+from clld.tests.util import Handler
 
 
 class Tests(unittest.TestCase):
@@ -10,3 +17,37 @@ class Tests(unittest.TestCase):
         from clld.scripts.util import parsed_args
 
         parsed_args(args=[path(clld.__file__).dirname().joinpath('tests', 'test.ini')])
+
+    def test_gbs_func(self):
+        from clld.scripts.util import gbs_func
+
+        def app(environ, start_response):
+            start_response('200 OK', [(str('Content-Type'), str('application/json'))])
+            return [json.dumps({'totalItems': 1, 'items': [{'id': 'gbs-id'}]})]
+
+        server = make_server('127.0.0.1', 0, app, handler_class=Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        tmp = path(mkdtemp())
+        tmp.joinpath('gbs').mkdir()
+        with open(tmp.joinpath('gbs', 'source1.json'), 'w') as fp:
+            json.dump({'totalItems': 0}, fp)
+
+        args = Mock(
+            data_file=partial(tmp.joinpath),
+            gbs_api_url='http://127.0.0.1:%s/?' % server.server_port,
+            workers=2,
+            rate=None)
+        sources = [
+            Mock(id='%s' % i, author='a', title='t', publisher=None) for i in range(1, 4)]
+        try:
+            gbs_func('download', args, sources)
+            gbs_func('update', args, sources)
+            self.assertEqual(sources[0].google_book_search_id, None)
+            self.assertEqual(sources[1].google_book_search_id, 'gbs-id')
+            self.assertTrue(tmp.joinpath('gbs', 'gbs.sqlite').exists())
+        finally:
+            server.shutdown()
+            server.server_close()
+            tmp.rmtree()
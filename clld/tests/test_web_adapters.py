@@ -1,23 +1,49 @@
 import os
 import unittest
 from tempfile import mktemp
+from zipfile import ZipFile
 
 from mock import Mock
 
-from clld.interfaces import IIndex, IRepresentation
+from clld.interfaces import IIndex, IRepresentation, ILanguage
+from clld.db.meta import DBSession
 from clld.db.models.common import Contribution, Parameter, Language, Dataset, Source
 from clld.tests.util import TestWithEnv
 
 
 class Tests(TestWithEnv):
+    def test_biblio_iterrecords(self):
+        from clld.web.adapters.biblio import iterrecords
+        from clld.web.datatables.source import Sources
+
+        dt = Sources(self.env['request'], Source)
+        n = len(list(iterrecords(dt)))
+        assert n and n == len(list(iterrecords(dt, size=1)))
+
+    def test_biblio_streaming(self):
+        import transaction
+        from clld.web.adapters.biblio import Bibtex
+        from clld.web.datatables.source import Sources
+
+        res = Bibtex(None).render_to_response(
+            Sources(self.env['request'], Source), self.env['request'])
+        # the body is sent only after the request's transaction has ended and its session
+        # has been removed:
+        transaction.commit()
+        DBSession.remove()
+        body = ''.join(res.app_iter)
+        # streaming the sources did not leave a new session behind:
+        self.assertFalse(DBSession.registry.has())
+        self.assertEqual(body.count('@'), DBSession.query(Source).count())
+
     def testDownload(self):
         from clld.web.adapters.download import Download
 
         class TestDownload(Download):
             _path = mktemp()
 
-            def asset_spec(self, req):
-                return self._path
+            def asset_spec(self, req, delta=False):
+                return self._path + ('-delta' if delta else '')
 
         dl = TestDownload(Source, 'clld', ext='bib')
         abspath = dl.abspath(self.env['request'])
@@ -26,12 +52,79 @@ class Tests(TestWithEnv):
         dl.size(self.env['request'])
         dl.label(self.env['request'])
         assert os.path.exists(abspath)
+        assert not os.path.exists(dl.abspath(self.env['request'], delta=True))
+
+        # re-creating the download also creates a delta archive:
+        os.utime(abspath, (0, 0))
+        dl.create(self.env['request'], verbose=False)
+        delta = dl.abspath(self.env['request'], delta=True)
+        with ZipFile(delta) as zipfile:
+            assert 'deleted.txt' in zipfile.namelist()
         os.remove(abspath)
+        os.remove(delta)
 
         dl = TestDownload(Source, 'clld', ext='rdf')
         dl.create(self.env['request'], verbose=False)
         os.remove(dl.abspath(self.env['request']))
 
+    def testCsvDump(self):
+        from zipfile import ZipFile
+        from clld.web.adapters.download import CsvDump
+
+        class TestDump(CsvDump):
+            _path = mktemp()
+
+            def asset_spec(self, req):
+                return self._path
+
+        class CustomRow(TestDump):
+            def row(self, req, fp, item, index):
+                return [item.id, item.name.upper()]
+
+        class CustomQuery(TestDump):
+            def query(self, req):
+                return DBSession.query(Language)\
+                    .filter(Language.active == True)\
+                    .order_by(Language.pk)
+
+        class CustomDump(TestDump):
+            def dump(self, req, fp, item, index):
+                self.writer.writerow([item.id, item.name.upper()])
+
+        for cls, fast, upper in [
+            (TestDump, True, False),
+            (CustomRow, False, True),
+            (CustomQuery, False, False),
+            (CustomDump, False, True),
+        ]:
+            dl = cls(Language, 'clld', fields=['id', ('name', 'Name')])
+            self.assertEqual(dl.columns() is not None, fast)
+            dl.create(self.env['request'], verbose=False)
+            with ZipFile(dl.abspath(self.env['request'])) as zipfile:
+                rows = zipfile.read(dl.name).decode('utf8').split('\r\n')
+            self.assertEqual(rows[0], 'id,Name')
+            self.assertTrue(
+                ('language,LANGUAGE 1' if upper else 'language,Language 1') in rows)
+            self.assertEqual(len(rows), 103)
+            os.remove(dl.abspath(self.env['request']))
+
+    def testSqlite(self):
+        from zipfile import ZipFile
+        from clld.web.adapters.download import Sqlite
+
+        class TestSqlite(Sqlite):
+            _path = mktemp()
+
+            def asset_spec(self, req):
+                return self._path
+
+        dl = TestSqlite(Dataset, 'clld')
+        dl.create(self.env['request'], verbose=False)
+        with ZipFile(dl.abspath(self.env['request'])) as zipfile:
+            self.assertEqual(
+                sorted(zipfile.namelist()), ['README.txt', 'dataset.sqlite'])
+        os.remove(dl.abspath(self.env['request']))
+
     def test_BibTex(self):
         from clld.web.adapters import BibTex
 
@@ -63,7 +156,10 @@ class Tests(TestWithEnv):
 
         class MockLanguages(Mock):
             def get_query(self, *args, **kw):
-                return [Language.first()]
+                return DBSession.query(Language)
+
+            def load_rows(self, items):
+                return items
 
         adapter = GeoJsonLanguages(None)
         self.assertTrue(
@@ -76,10 +172,39 @@ class Tests(TestWithEnv):
         adapter.render({'hello': 'world'}, self.env['request'])
 
     def test_get_adapter(self):
-        from clld.web.adapters import get_adapter
+        from clld.web.adapters import get_adapter, dispatch_table
+        from clld.web.adapters.base import Representation
+
+        req = self.env['request']
+        self.assertEqual(None, get_adapter(IIndex, Language, req, name='text/html'))
 
+        lang = Language.first()
+        self.assertEqual(get_adapter(IRepresentation, lang, req).extension, 'html')
         self.assertEqual(
-            None, get_adapter(IIndex, Language, self.env['request'], name='text/html'))
+            get_adapter(IRepresentation, lang, req, ext='rdf').mimetype,
+            'application/rdf+xml')
+        self.assertEqual(
+            get_adapter(IRepresentation, lang, req, name='application/json').extension,
+            'json')
+        self.set_request_properties(accept='application/rdf+xml;q=0.9, text/html;q=0.1')
+        self.assertEqual(get_adapter(IRepresentation, lang, req).extension, 'rdf')
+
+        # dispatch tables are reused - until new adapters are registered:
+        spec = IRepresentation, Language.__implemented__
+        table = dispatch_table(req.registry, *spec)
+        self.assertTrue(dispatch_table(req.registry, *spec) is table)
+
+        class Custom(Representation):
+            mimetype = 'application/x-custom'
+            extension = 'custom'
+
+        req.registry.registerAdapter(
+            Custom, (ILanguage,), IRepresentation, name=Custom.mimetype)
+        self.assertFalse(dispatch_table(req.registry, *spec) is table)
+        self.assertTrue(
+            isinstance(get_adapter(IRepresentation, lang, req, ext='custom'), Custom))
+        req.registry.unregisterAdapter(
+            Custom, (ILanguage,), IRepresentation, name=Custom.mimetype)
 
     def test_adapter_factory(self):
         from clld.web.adapters.base import adapter_factory
@@ -7,7 +7,8 @@ from purl import URL
 
 from clld.db.models.common import Contribution, ValueSet, Language, Language_files
 from clld.tests.util import TestWithEnv, Route, TESTS_DIR
-from clld.interfaces import IMapMarker
+from clld.interfaces import IMapMarker, IIcon
+from clld.web.icon import ICONS
 from clld.web.adapters.download import N3Dump
 
 
@@ -56,14 +57,23 @@ class Tests(TestWithEnv):
 
     def test_get_configurator(self):
         from clld.web.app import get_configurator, menu_item
+        from clld.db.meta import REPLICAS
 
         class IF(Interface):
             """" """""
 
         config = get_configurator(
             'clld',
-            settings={'sqlalchemy.url': 'sqlite://'},
+            settings={
+                'sqlalchemy.url': 'sqlite://',
+                'clld.profile_startup': 'true',
+                'clld.replicas': 'sqlite://\nsqlite://'},
             routes=[('languages', '/other')])
+        self.assertIn('adapters', config.registry.startup_profile)
+        self.assertEqual(len(REPLICAS.engines), 2)
+        REPLICAS.configure([])
+        self.assertEqual(
+            len(list(config.registry.getUtilitiesFor(IIcon))), len(ICONS))
         # should have no effect, because a resource with this name is registered by
         # default:
         config.register_resource('language', None, None)
@@ -0,0 +1,54 @@
+import unittest
+from gzip import GzipFile
+from contextlib import closing
+from tempfile import mkdtemp
+
+from path import path
+from webassets import Environment
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = path(mkdtemp())
+        self.tmp.joinpath('js').mkdir()
+        for name in ['a', 'b']:
+            with open(self.tmp.joinpath('js', name + '.js'), 'w') as fp:
+                fp.write('var %s = 1;\n' % name)
+
+        self.out = path(mkdtemp())
+
+    def tearDown(self):
+        self.tmp.rmtree()
+        self.out.rmtree()
+
+    def test_build(self):
+        from clld.web.assets import build, load_manifest
+
+        env = Environment(self.tmp, '/src/', manifest='json:', auto_build=False)
+        env.append_path(self.tmp, url='/src/')
+        env.register('js', 'js/a.js', 'js/b.js', output='js/packed.%(version)s.js')
+        self.assertEqual(load_manifest(self.out), None)
+
+        env.debug = True
+        manifest = build(self.out, '/static/', env, names=['js'])
+        self.assertTrue(env.debug)
+        self.assertEqual(env.directory, self.tmp)
+        self.assertEqual(len(manifest['js']), 1)
+        # output and manifest are written to the output directory only:
+        fname = self.out.joinpath(manifest['js'][0].split('?')[0][len('/static/'):])
+        with closing(GzipFile(fname + '.gz')) as fp:
+            self.assertEqual(fp.read(), fname.bytes())
+        self.assertEqual(self.tmp.joinpath('js').files('packed.*'), [])
+
+        # rebuilding unchanged bundles results in identical files:
+        gz = path(fname + '.gz').bytes()
+        self.assertEqual(build(self.out, '/static/', env, names=['js']), manifest)
+        self.assertEqual(path(fname + '.gz').bytes(), gz)
+        self.assertEqual(load_manifest(self.out)['js'].urls(), manifest['js'])
+
+    def test_output_directory(self):
+        from clld.web.assets import output_directory
+
+        self.assertEqual(
+            output_directory('clld', {'clld.assets_directory': self.out}), self.out)
+        self.assertTrue(output_directory('clld').endswith('static'))
@@ -50,3 +50,64 @@ class Tests(TestWithEnv):
 
         self.set_request_properties(params={'sSearch_0': '> 1', 'sSearch_1': '> 1'})
         self.handle_dt(TestTable, common.Language)
+
+    def test_DataTable_compiled(self):
+        from clld.web.datatables.base import DataTable, Col
+
+        calls = []
+
+        class TestTable(DataTable):
+            cache_col_defs = True
+
+            def __init__(self, req, model, language=None, **kw):
+                self.language = language
+                DataTable.__init__(self, req, model, **kw)
+
+            def col_defs(self):
+                calls.append(1)
+                return [Col(self, 'name')]
+
+        req = self.env['request']
+        dt1 = TestTable(req, common.Language)
+        dt1.render()
+        dt2 = TestTable(req, common.Language)
+        dt2.render()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(dt1.signature(), dt2.signature())
+        self.assertIs(dt2.cols[0].dt, dt2)
+        self.assertIsNot(dt1.cols[0], dt2.cols[0])
+        self.assertEqual(dt1.toolbar(), dt2.toolbar())
+
+        dt3 = TestTable(req, common.Language, language=common.Language.first())
+        dt3.render()
+        self.assertEqual(len(calls), 2)
+
+        dt4 = TestTable(req, common.Language, language=object())
+        self.assertIsNone(dt4.signature())
+        dt4.cols
+        dt4.cols
+        self.assertEqual(len(calls), 3)
+
+        TestTable.cache_col_defs = False
+        TestTable(req, common.Language).cols
+        self.assertEqual(len(calls), 4)
+
+    def test_DataTable_polymorphic_loading(self):
+        from clld.web.datatables.base import DataTable
+
+        class Languages(DataTable):
+            def col_defs(self):
+                return []
+
+        dt = Languages(self.env['request'], common.Language)
+        self.assertIn('customlanguage', str(dt.get_query()))
+
+        dt.polymorphic_loading = None
+        self.assertNotIn('customlanguage', str(dt.get_query()))
+
+        dt.polymorphic_loading = 'selectin'
+        query = dt.get_query()
+        self.assertNotIn('customlanguage', str(query))
+        items = dt.load_rows(query)
+        self.assertTrue(isinstance(items, list) and items)
+        self.assertEqual(dt.count_all, len(items))
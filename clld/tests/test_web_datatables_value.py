@@ -23,6 +23,27 @@ class Tests(TestWithEnv):
         dt = Values(self.env['request'], common.Value)
         dt.get_query()
 
+    def test_Values_count_all(self):
+        from clld.web.datatables.value import Values
+        from clld.db.meta import DBSession
+        from clld.db.models.common import Statistic
+        from clld.db.util import compute_stats
+
+        compute_stats()
+        DBSession.query(Statistic)\
+            .filter_by(key='value', object_pk=None).one().value = 1000
+
+        class FilteredValues(Values):
+            def base_query(self, query):
+                return Values.base_query(self, query).filter(common.Value.pk < 0)
+
+        dt = Values(self.env['request'], common.Value)
+        dt.get_query()
+        self.assertEqual(dt.count_all, 1000)
+        dt = FilteredValues(self.env['request'], common.Value)
+        dt.get_query()
+        self.assertEqual(dt.count_all, 0)
+
     def test_Values_with_language(self):
         from clld.web.datatables.value import Values
 
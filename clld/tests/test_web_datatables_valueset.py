@@ -31,3 +31,11 @@ class Tests(TestWithEnv):
     def test_Valuesets_with_parameter(self):
         self.set_request_properties(params={'parameter': 'parameter'})
         self._get_dt()
+
+    def test_Valuesets_sources_jsondata(self):
+        from clld.db.meta import DBSession
+
+        DBSession.expunge_all()
+        for vs in self._get_dt(language=common.Language.get('language')).get_query():
+            for ref in vs.references:
+                self.assertIn('jsondata', ref.source.__dict__)
@@ -0,0 +1,75 @@
+import json
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from path import path
+from mock import patch
+
+from clld.tests.util import TestWithEnv
+
+
+class Tests(TestWithEnv):
+    def setUp(self):
+        TestWithEnv.setUp(self)
+        self.outdir = path(mkdtemp())
+
+    def tearDown(self):
+        TestWithEnv.tearDown(self)
+        rmtree(self.outdir)
+
+    def test_export(self):
+        from clld.db.models.common import Language
+        from clld.web.export import export
+
+        count, errors = export(
+            self.env['app'], self.outdir, base_url='http://example.org')
+        assert count
+        for fname in [
+            'index.html',
+            'legal.html',
+            'languages.html',
+            'languages/language.html',
+            'languages/language.rdf',
+            'export.types',
+        ]:
+            assert self.outdir.joinpath(fname).exists(), fname
+        assert 'http://example.org/' in self.outdir.joinpath('legal.html').text()
+        assert 'application/rdf+xml rdf;' in self.outdir.joinpath('export.types').text()
+        assert not self.outdir.joinpath('olac.html').exists()
+
+        # only changed resources are re-rendered:
+        count2, errors = export(self.env['app'], self.outdir)
+        assert count2 < count
+        self.outdir.joinpath('languages', 'language.html').remove()
+        Language.get('language').name = 'changed'
+        export(self.env['app'], self.outdir)
+        assert self.outdir.joinpath('languages', 'language.html').exists()
+
+        # files of deleted resources are removed:
+        manifest = json.loads(self.outdir.joinpath('.export.json').text())
+        manifest['files']['language gone'] = ['languages/gone.html']
+        self.outdir.joinpath('.export.json').write_text(json.dumps(manifest))
+        self.outdir.joinpath('languages', 'gone.html').write_text('')
+        export(self.env['app'], self.outdir)
+        assert not self.outdir.joinpath('languages', 'gone.html').exists()
+        assert self.outdir.joinpath('languages', 'language.html').exists()
+
+        # resources with pages which could not be exported are re-rendered next time:
+        from clld.web import export as module
+
+        def render(app, url_path, base_url=None):
+            if url_path == '/languages/language.rdf':
+                return 500, None, None
+            return _render(app, url_path, base_url=base_url)
+
+        _render = module.render
+        with patch('clld.web.export.render', render):
+            count, errors = export(self.env['app'], self.outdir, force=True)
+        self.assertIn('/languages/language.rdf', errors)
+        manifest = json.loads(self.outdir.joinpath('.export.json').text())
+        assert 'language language' not in manifest['signatures']
+        assert 'language language' in manifest['files']
+        count, errors = export(self.env['app'], self.outdir)
+        assert self.outdir.joinpath('languages', 'language.rdf').exists()
+        manifest = json.loads(self.outdir.joinpath('.export.json').text())
+        assert 'language language' in manifest['signatures']
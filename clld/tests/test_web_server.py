@@ -0,0 +1,37 @@
+import os
+import signal
+import unittest
+from urllib2 import urlopen
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return ['%s' % os.getpid()]
+
+
+class Tests(unittest.TestCase):
+    def _serve(self, **kw):
+        from clld.web.server import PreforkServer
+
+        server = PreforkServer(host='127.0.0.1', port=0, workers=2, **kw)
+        pid = os.fork()
+        if not pid:  # pragma: no cover
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        server.server.server_close()
+        try:
+            url = 'http://%s:%s/' % server.address
+            pids = set(urlopen(url).read() for i in range(10))
+            self.assertNotIn('%s' % pid, pids)
+            self.assertNotIn('%s' % os.getpid(), pids)
+        finally:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+
+    def test_PreforkServer(self):
+        self._serve(app=app)
+
+    def test_PreforkServer_threaded(self):
+        self._serve(app_factory=lambda: app, threads=4)
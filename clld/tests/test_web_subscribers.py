@@ -12,3 +12,66 @@ class Tests(TestWithEnv):
         ctx = {'renderer_name': 'path/base.ext.mako', 'request': None}
         add_renderer_globals(Mock(path_base_ext=lambda **kw: {'a': 3}), ctx)
         self.assertEqual(ctx['a'], 3)
+
+    def test_init_session(self):
+        from pyramid.request import Request
+        from clld.web.subscribers import readonly_aware
+        from clld.db.meta import DBSession
+
+        registry = self.env['registry']
+        settings = registry.settings
+
+        class Route(object):
+            def __init__(self, name):
+                self.name = name
+
+        def request(path, method='GET'):
+            req = Request.blank(path, method=method)
+            req.registry = registry
+            req.matched_route = Route(path.split('/')[1])
+            return req
+
+        def invoke(req, root_factory):
+            try:
+                return readonly_aware(root_factory)(req)
+            finally:
+                req._process_finished_callbacks()
+
+        # read-only sessions do not autoflush:
+        readonly = lambda req: not DBSession().autoflush
+
+        def session(path, method='GET', **kw):
+            DBSession.remove()
+            registry.settings = dict(settings, **kw)
+            try:
+                return invoke(request(path, method=method), readonly)
+            finally:
+                registry.settings = settings
+                DBSession.remove()
+
+        self.assertFalse(session('/languages'))
+        # configuring replicas does not make sessions read-only:
+        self.assertFalse(session('/languages', **{'clld.replicas': 'sqlite://'}))
+        self.assertTrue(session('/languages', **{'clld.readonly_sessions': 'true'}))
+        self.assertFalse(
+            session('/languages', method='POST', **{'clld.readonly_sessions': 'true'}))
+
+        registry.readonly_routes['languages'] = True
+        try:
+            self.assertTrue(session('/languages'))
+            self.assertFalse(session('/contributions'))
+
+            # subrequests share the session of the request they are invoked from:
+            DBSession.remove()
+            outer = DBSession()
+            self.assertIs(
+                invoke(request('/contributions'),
+                       lambda r: invoke(request('/languages'), lambda r: DBSession())),
+                outer)
+            self.assertIs(DBSession(), outer)
+        finally:
+            del registry.readonly_routes['languages']
+            DBSession.remove()
+
+        factory = readonly_aware(readonly)
+        self.assertIs(readonly_aware(factory), factory)
@@ -99,6 +99,29 @@ class Tests(TestWithEnv):
         rendered_sentence(common.Sentence.first())
         rendered_sentence(common.Sentence.first(), abbrs=dict(SG='singular'))
 
+    def test_rendered_sentences(self):
+        from clld.db.meta import DBSession
+        from clld.web.util.helpers import rendered_sentences, SENTENCE_CACHE
+
+        sentence = common.Sentence.first()
+        DBSession.add(common.GlossAbbreviation(id='PL', name='plural'))
+        DBSession.add(common.GlossAbbreviation(
+            id='SG', name='singular', language=sentence.language))
+        DBSession.flush()
+
+        res = rendered_sentences([sentence])
+        self.assertTrue('first person singular' in res[0])
+        abbrs = SENTENCE_CACHE.app_abbrs()
+        self.assertEqual(abbrs[None], {'PL': 'plural'})
+        self.assertTrue('PL' in abbrs[sentence.language_pk])
+        self.assertEqual(rendered_sentences([sentence])[0], res[0])
+
+        # other apps served from the same process don't share the cached abbreviations:
+        other = Mock(application_url='http://other.example.org')
+        self.assertEqual(SENTENCE_CACHE.app_abbrs(other), {})
+        SENTENCE_CACHE.load_abbrs([sentence.language_pk], req=other)
+        self.assertTrue(SENTENCE_CACHE.app_abbrs(other))
+
     def test_language_identifier(self):
         from clld.web.util.helpers import language_identifier
 
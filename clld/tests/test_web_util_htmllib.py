@@ -14,3 +14,14 @@ class Tests(unittest.TestCase):
 
         self.assertEqual(literal.escape('<div/>'), '&lt;div/&gt;')
         self.assertEqual(literal.escape(None), EMPTY)
+
+    def test_make_tag(self):
+        from clld.web.util.htmllib import HTML, literal, escape
+
+        for i in range(2):
+            self.assertEqual(
+                HTML.a('<&>', literal('<b/>'), 2, href='"\'', title=None, class_='c'),
+                '<a class="c" href="&#34;&#39;">&lt;&amp;&gt;<b/>2</a>')
+        self.assertEqual(HTML.img(height=20, src='<'), '<img height="20" src="&lt;" />')
+        self.assertTrue(isinstance(HTML.div(), literal))
+        self.assertEqual(HTML.div(escape('<')), '<div>&lt;</div>')
@@ -33,6 +33,15 @@ class Tests(TestWithEnv):
         res = index_view(X(self.env['request'], common.Contributor), self.env['request'])
         self.assertEqual(res.content_type, 'application/json')
 
+        ctx = self.env['registry'].getUtility(IDataTable, name='languages')
+        for loading in [None, 'eager', 'selectin']:
+            class Y(ctx):
+                polymorphic_loading = loading
+
+            res = index_view(
+                Y(self.env['request'], common.Language), self.env['request'])
+            self.assertEqual(res.content_type, 'application/json')
+
     def test_resource_view(self):
         from clld.web.views import resource_view
 
@@ -0,0 +1,63 @@
+import json
+from urlparse import urlparse, parse_qsl
+
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+
+from clld.tests.util import TestWithEnv
+
+
+class Tests(TestWithEnv):
+    def changes(self, ext, **params):
+        from clld.web.views.changes import changes
+
+        self.set_request_properties(matchdict=dict(ext=ext), params=params)
+        return changes(self.env['request'])
+
+    def test_changes_jsonl(self):
+        items = [json.loads(l) for l in self.changes('jsonl').body.splitlines()]
+        assert items
+        assert set(item['change'] for item in items) == set(['created'])
+
+        items = [json.loads(l) for l in
+                 self.changes('jsonl', rsc='language').body.splitlines()]
+        assert items and all(item['type'] == 'language' for item in items)
+        assert 'version' in items[0]
+
+        assert not self.changes('jsonl', since='2100-01-01T00:00Z').body
+
+    def test_changes_nt(self):
+        res = self.changes('nt', rsc='language')
+        assert 'http://purl.org/dc/terms/created' in res.body
+        assert 'versionInfo' in res.body
+
+    def test_changes_bad_timestamp(self):
+        self.assertRaises(HTTPBadRequest, self.changes, 'jsonl', since='yesterday')
+
+    def test_changes_unknown_format(self):
+        self.assertRaises(HTTPNotFound, self.changes, 'xml')
+
+    def test_changes_paging(self):
+        expected = [
+            (item['type'], item['id']) for item in
+            map(json.loads, self.changes('jsonl').body.splitlines())]
+        self.assertTrue(len(expected) > 2)
+        self.assertNotIn('Link', self.changes('jsonl').headers)
+
+        items, params = [], dict(limit='2')
+        while True:
+            res = self.changes('jsonl', **params)
+            page = map(json.loads, res.body.splitlines())
+            self.assertTrue(len(page) <= 2)
+            items.extend((item['type'], item['id']) for item in page)
+            if 'Link' not in res.headers:
+                break
+            link = res.headers['Link']
+            self.assertTrue(link.endswith('; rel="next"'))
+            params = dict(parse_qsl(urlparse(link[1:link.index('>')]).query))
+            self.assertEqual(params['limit'], '2')
+        self.assertEqual(items, expected)
+
+    def test_changes_bad_paging(self):
+        self.assertRaises(HTTPBadRequest, self.changes, 'jsonl', limit='0')
+        self.assertRaises(HTTPBadRequest, self.changes, 'jsonl', limit='x')
+        self.assertRaises(HTTPBadRequest, self.changes, 'jsonl', cursor='2014-01-01')
@@ -0,0 +1,71 @@
+import gzip
+from tempfile import mktemp
+
+from mock import Mock
+
+from clld.tests.util import TestWithEnv
+
+
+class Tests(TestWithEnv):
+    def test_compile_templates(self):
+        from clld.web.warmup import template_uris, compile_templates
+
+        registry = self.env['registry']
+        uris = template_uris(registry)
+        self.assertIn('language/detail_html.mako', uris)
+        self.assertIn('clld:web/templates/language/kml.mako', uris)
+        self.assertIn('olac.mako', uris)
+        loaded, errors = compile_templates(registry)
+        self.assertEqual(errors, {})
+        self.assertIn('olac.mako', loaded)
+        self.assertNotIn('unit/snippet_html.mako', loaded)
+
+    def test_warm_up(self):
+        from clld.web.warmup import warm_up
+
+        count, errors = warm_up(self.env['app'])
+        self.assertTrue(count > 0)
+
+    def test_prepare_app(self):
+        from clld.web.warmup import prepare_app
+
+        registry = Mock(settings={})
+        prepare_app(Mock(app=Mock(registry=registry)))
+        self.assertFalse(registry.registeredAdapters.called)
+
+        registry = self.env['registry']
+        settings = registry.settings
+        registry.settings = dict(
+            settings,
+            **{'clld.warm_up': 'true', 'clld.prime_urls': 'sitemap', 'clld.prime_top': '2'})
+        try:
+            prepare_app(Mock(app=self.env['app']))
+        finally:
+            registry.settings = settings
+
+    def test_prime_urls(self):
+        from clld.web.warmup import prime_urls
+
+        urls = prime_urls(self.env['app'], ['sitemap'], n=5)
+        self.assertEqual(len(urls), 5)
+        self.assertTrue(urls[0].startswith('/languages/'))
+
+        fname = mktemp('.gz')
+        with gzip.open(fname, 'w') as fp:
+            fp.write('1.2.3.4 - - [31/Jan/2014:10:00:00 +0100] '
+                     '"GET /languages/language HTTP/1.1" 200 5 "-" "-"\n')
+        self.assertEqual(prime_urls(self.env['app'], [fname]), ['/languages/language'])
+
+    def test_replay(self):
+        from clld.web.warmup import replay, report
+
+        stats = replay(
+            self.env['app'], ['/languages/language', '/legal', '/xyz'], concurrency=1)
+        self.assertEqual(len(stats['language']), 1)
+        rows = dict((row[0], row) for row in report(stats))
+        self.assertEqual(rows['-'][2], 1)
+        self.assertEqual(rows['legal'][:3], ['legal', 1, 0])
+
+        # with concurrent threads:
+        stats = replay(self.env['app'], ['/legal', '/legal'], concurrency=2)
+        self.assertEqual(len(stats['legal']), 2)
@@ -33,6 +33,7 @@ from clld.db.models import common
 from clld.web.adapters import Representation
 from clld.web.adapters.download import N3Dump
 from clld.web.icon import MapMarker
+from clld.web.util.helpers import SENTENCE_CACHE
 from clld import interfaces
 
 
@@ -68,10 +69,14 @@ class TestWithDb(unittest.TestCase):
 
         assert CustomLanguage
         engine = create_engine('sqlite://')
+        # sessions left over from previous tests would still be bound to their engine:
+        DBSession.remove()
+        VersionedDBSession.remove()
         DBSession.configure(bind=engine)
         VersionedDBSession.configure(bind=engine)
         Base.metadata.bind = engine
         Base.metadata.create_all()
+        SENTENCE_CACHE.clear()
 
     def tearDown(self):
         transaction.abort()
@@ -187,6 +192,9 @@ class TestWithEnv(TestWithDbAndData):
 
         self.env = ENV
         self._prop_cache = {}
+        fragment_cache = self.env['registry'].queryUtility(interfaces.IFragmentCache)
+        if fragment_cache is not None:
+            fragment_cache.clear()
 
     def _set_request_property(self, k, v):
         if k == 'is_xhr':
@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 import re
 import unicodedata
 import string
+from datetime import tzinfo, timedelta
 
 from six import PY3
 from sqlalchemy.types import SchemaType, TypeDecorator, Enum
@@ -13,6 +14,31 @@ class NoDefault(object):
 NO_DEFAULT = NoDefault()
 
 
+class _UTC(tzinfo):
+    def utcoffset(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        return 'UTC'
+
+    def dst(self, dt):
+        return timedelta(0)
+
+UTC = _UTC()
+
+
+def as_utc(dt):
+    """
+    :return: timezone aware datetime in UTC; naive datetimes are taken to be in UTC.
+
+    >>> from datetime import datetime
+    >>> assert as_utc(datetime(2014, 1, 1)) == as_utc(datetime(2014, 1, 1, tzinfo=UTC))
+    """
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
 def xmlchars(text):
     invalid = range(0x9)
     invalid.extend([0xb, 0xc])
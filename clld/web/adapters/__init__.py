@@ -1,4 +1,4 @@
-from zope.interface import implementer, implementedBy
+from zope.interface import implementer, implementedBy, providedBy
 
 from clld import RESOURCES
 from clld import interfaces
@@ -36,7 +36,7 @@ def includeme(config):
         # ... as html snippet (if the template exists)
         specs.append(
             (interface, Representation, 'application/vnd.clld.snippet+xml',
-             'snippet.html', name + '/snippet_html.mako', {}))
+             'snippet.html', name + '/snippet_html.mako', {'cached': True}))
 
         # ... as RDF in various notations
         for notation in RDF_NOTATIONS.values():
@@ -114,17 +114,87 @@ def includeme(config):
     config.include(biblio)
 
 
+class DispatchTable(object):
+    """Adapter factories for one interface and one type of context, indexed by name
+    (i.e. mimetype) and by file extension.
+
+    Since adapters are only instantiated once chosen, looking up an adapter does not
+    cost more than a couple of dict lookups.
+    """
+    # maximal number of distinct Accept headers for which negotiation results are kept:
+    max_negotiated = 1000
+
+    def __init__(self, factories):
+        self.factories = factories
+        self.by_name = dict(factories)
+        self.offers = list(self.by_name.keys())
+        self.by_extension = {}
+        for factory in self.by_name.values():
+            self.by_extension.setdefault(getattr(factory, 'extension', None), factory)
+        self.negotiated = {}
+
+    def negotiate(self, accept):
+        """
+        :return: the factory for the mimetype best matching an Accept header or None.
+        """
+        key = str(accept)
+        if key not in self.negotiated:
+            if len(self.negotiated) >= self.max_negotiated:
+                self.negotiated.clear()
+            self.negotiated[key] = self.by_name.get(accept.best_match(self.offers))
+        return self.negotiated[key]
+
+
+def _spec(ctx):
+    # ctx can be a DataTable instance. In this case we look up adapters for the model
+    # class associated with the DataTable.
+    return implementedBy(ctx.model) if hasattr(ctx, 'model') else providedBy(ctx)
+
+
+def dispatch_table(registry, interface, spec):
+    """
+    :param spec: interface specification of the objects to adapt.
+    :return: DispatchTable instance.
+
+    Tables are computed once and kept until adapters are registered for the interface.
+    """
+    # lookupAll results are cached by zope.interface - until the registry changes.
+    factories = registry.adapters.lookupAll((spec,), interface)
+    tables = registry.__dict__.setdefault('_clld_dispatch_tables', {})
+    table = tables.get((interface, spec))
+    if table is None or table.factories is not factories:
+        table = tables[(interface, spec)] = DispatchTable(factories)
+    return table
+
+
+def prime_dispatch_tables(event):
+    """Compute dispatch tables for all resources when the app is created.
+    """
+    for rsc in RESOURCES:
+        for interface in [
+            interfaces.IRepresentation, interfaces.IIndex, interfaces.IMetadata
+        ]:
+            dispatch_table(event.app.registry, interface, implementedBy(rsc.model))
+
+
 def get_adapters(interface, ctx, req):
-    # ctx can be a DataTable instance. In this case we create a resource by instantiating
-    # the model class associated with the DataTable
-    resource = ctx.model() if hasattr(ctx, 'model') else ctx
-    return req.registry.getAdapters([resource], interface)
+    """
+    :return: list of pairs (name, adapter) for all adapters of ctx to interface.
+    """
+    res = []
+    for name, factory in dispatch_table(req.registry, interface, _spec(ctx)).factories:
+        adapter = factory(ctx)
+        if adapter is not None:
+            res.append((name, adapter))
+    return res
 
 
 def get_adapter(interface, ctx, req, ext=None, name=None):
     """
+    :return: the adapter of ctx to interface with the given extension or name, or the \
+    adapter for the mimetype best matching the request's Accept header.
     """
-    adapters = dict(get_adapters(interface, ctx, req))
+    table = dispatch_table(req.registry, interface, _spec(ctx))
 
     if not ext and not name and (not req.accept or str(req.accept) == '*/*'):
         # force text/html in case there are no specific criteria to decide
@@ -132,16 +202,11 @@ def get_adapter(interface, ctx, req, ext=None, name=None):
 
     if ext:
         # find adapter by requested file extension
-        adapter = [r for r in adapters.values() if r.extension == ext]
+        factory = table.by_extension.get(ext)
     elif name:
         # or by mime type
-        adapter = adapters.get(name)
+        factory = table.by_name.get(name)
     else:
         # or by content negotiation
-        adapter = adapters.get(req.accept.best_match(adapters.keys()))
-
-    if isinstance(adapter, list):
-        if adapter:
-            return adapter[0]
-        return None
-    return adapter
+        factory = table.negotiate(req.accept)
+    return factory(ctx) if factory else None
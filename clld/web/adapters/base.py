@@ -3,6 +3,7 @@ from pyramid.response import Response
 from pyramid.renderers import render as pyramid_render
 
 from clld import interfaces
+from clld.web.util.cache import cached_fragment
 
 
 class Renderable(object):
@@ -10,6 +11,8 @@ class Renderable(object):
 
     Adapters can provide custom behaviour either by specifying a template to use for
     rendering, or by overwriting the render method.
+    Adapters with `cached = True` store the output of the template in the fragment
+    cache, keyed by template, context object, locale and request parameters.
 
     >>> r = Renderable(None)
     >>> assert r.label == 'Renderable'
@@ -18,6 +21,7 @@ class Renderable(object):
     mimetype = 'text/plain'
     extension = None
     send_mimetype = None
+    cached = False
 
     def __init__(self, obj):
         self.obj = obj
@@ -43,6 +47,12 @@ class Renderable(object):
         return res
 
     def render(self, ctx, req):
+        if self.cached:
+            return cached_fragment(
+                req,
+                self.template,
+                [ctx],
+                lambda: pyramid_render(self.template, {'ctx': ctx}, request=req))
         return pyramid_render(self.template, {'ctx': ctx}, request=req)
 
 
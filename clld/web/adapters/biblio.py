@@ -1,25 +1,77 @@
 """Adapters to render bibtex
 """
+from pyramid.response import Response
+from sqlalchemy.orm import Session
+
+from clld.db.meta import DBSession
+from clld.db.util import with_polymorphic, load_polymorphic
 from clld.web.adapters.base import Representation
 from clld.lib.bibtex import IDatabase, IRecord, Database
 from clld.interfaces import IRepresentation, IIndex, ISource, IDataTable
 
 
+def iterrecords(datatable, size=500):
+    """
+    :return: generator of the bibtex records of the sources matching the filters of a \
+    datatable, retrieved from the db in pages of size items.
+
+    Since the generator is typically consumed when a streamed response is sent - i.e.
+    after the request's transaction has ended - the keys of the matching sources are
+    retrieved right away, while the sources are loaded in a session of its own.
+    """
+    model = datatable.model
+    pks = [
+        row[0] for row in datatable.get_query(limit=None).with_entities(model.pk)]
+    return _iterrecords(
+        DBSession.get_bind(), model, datatable.polymorphic_loading, pks, size)
+
+
+def _iterrecords(bind, model, polymorphic_loading, pks, size):
+    session = Session(bind=bind, autoflush=False)
+    try:
+        for offset in range(0, len(pks), size):
+            page = pks[offset:offset + size]
+            order = dict((pk, i) for i, pk in enumerate(page))
+            sources = sorted(
+                with_polymorphic(session.query(model), polymorphic_loading)
+                .filter(model.pk.in_(page)),
+                key=lambda source: order[source.pk])
+            if polymorphic_loading == 'selectin':
+                load_polymorphic(sources, session=session)
+            for source in sources:
+                yield source.bibtex()
+    finally:
+        session.close()
+
+
 class _Format(Representation):
     def filename(self, ctx, req):
         return '%s-refs.%s' % (req.dataset.id, self.extension)
 
     def render_to_response(self, ctx, req):
-        res = super(_Format, self).render_to_response(ctx, req)
+        if IDataTable.providedBy(ctx):
+            # The bulk export of all sources matching the filters of the datatable is
+            # streamed, retrieving the sources page by page.
+            res = Response(app_iter=(
+                chunk.encode('utf8') for chunk in
+                self.convertable(ctx, req).iterformat(self.extension)))
+            res.vary = 'Accept'
+            res.content_type = self.send_mimetype or self.mimetype
+            res.charset = 'utf-8'
+        else:
+            res = super(_Format, self).render_to_response(ctx, req)
         res.content_disposition = 'attachment; filename="%s"' % self.filename(ctx, req)
         return res
 
-    def render(self, ctx, req):
+    def convertable(self, ctx, req):
         if ISource.providedBy(ctx):
-            ctx = ctx.bibtex()
-        elif IDataTable.providedBy(ctx):
-            ctx = Database([s.bibtex() for s in ctx.get_query()])
-        return ctx.format(self.extension)
+            return ctx.bibtex()
+        if IDataTable.providedBy(ctx):
+            return Database(iterrecords(ctx))
+        return ctx
+
+    def render(self, ctx, req):
+        return self.convertable(ctx, req).format(self.extension)
 
 
 class Bibtex(_Format):
@@ -1,7 +1,9 @@
 from zipfile import ZipFile, ZIP_DEFLATED
 from gzip import GzipFile
 from cStringIO import StringIO
+from tempfile import mktemp
 from contextlib import closing
+from datetime import datetime
 import time
 
 from path import path
@@ -16,8 +18,8 @@ from clld.web.util.helpers import rdf_namespace_attrs
 from clld.interfaces import IRepresentation, IDownload
 from clld.db.meta import DBSession
 from clld.db.models.common import Language, Source, LanguageIdentifier
-from clld.util import format_size
-from clld.scripts.postgres2sqlite import postgres2sqlite
+from clld.util import format_size, UTC
+from clld.db.util import dump_sqlite, changes
 
 
 def page_query(q, n=1000, verbose=False):
@@ -47,8 +49,13 @@ class Download(object):
     >>> from mock import Mock
     >>> dl = Download(Source, 'clld', ext='x')
     >>> assert dl.asset_spec(Mock()).startswith('clld:')
+
+    When a download is re-created, a delta archive - containing the items created or
+    updated since the previous archive was created and a list of the ids of deleted
+    items - is created as well, unless the download has delta = False.
     """
     ext = None
+    delta = True
 
     def __init__(self, model, pkg, **kw):
         if self.ext is None:
@@ -63,15 +70,23 @@ class Download(object):
     def name(self):
         return '%s.%s' % (class_mapper(self.model).class_.__name__.lower(), self.ext)
 
-    def asset_spec(self, req):
-        return '%s:static/download/%s-%s.%s' % (
-            self.pkg, req.dataset.id, self.name, 'gz' if self.rdf else 'zip')
+    def asset_spec(self, req, delta=False):
+        return '%s:static/download/%s-%s%s.%s' % (
+            self.pkg,
+            req.dataset.id,
+            self.name,
+            '-delta' if delta else '',
+            'gz' if self.rdf else 'zip')
+
+    def _asset_spec(self, req, delta):
+        # subclasses may override asset_spec without support for delta archives.
+        return self.asset_spec(req, delta=True) if delta else self.asset_spec(req)
 
-    def url(self, req):
-        return req.static_url(self.asset_spec(req))
+    def url(self, req, delta=False):
+        return req.static_url(self._asset_spec(req, delta))
 
-    def abspath(self, req):
-        return path(AssetResolver().resolve(self.asset_spec(req)).abspath())
+    def abspath(self, req, delta=False):
+        return path(AssetResolver().resolve(self._asset_spec(req, delta)).abspath())
 
     def size(self, req):
         _path = self.abspath(req)
@@ -86,27 +101,43 @@ class Download(object):
         if not p.dirname().exists():
             p.dirname().mkdir()
 
+        # the modification time of the previous archive marks the previous release.
+        since = datetime.fromtimestamp(p.mtime, UTC) \
+            if self.delta and not filename and p.exists() else None
+
+        self._create(req, p, filename, verbose)
+        if since:
+            self._create(req, self.abspath(req, delta=True), None, verbose, since=since)
+
+    def _create(self, req, p, filename, verbose, since=None):
+        query = self.query(req)
+        if since:
+            query = query.filter(self.model.updated > since)
+
         if self.rdf:
             # we do not create archives with a readme for rdf downloads, because each
             # RDF entity points to the dataset and the void description of the dataset
             # covers all relevant metadata.
             with closing(GzipFile(p, 'w')) as fp:
                 self.before(req, fp)
-                for i, item in enumerate(page_query(self.query(req), verbose=verbose)):
-                    self.dump(req, fp, item, i)
+                self.dump_all(req, fp, page_query(query, verbose=verbose))
                 self.after(req, fp)
         else:
             with ZipFile(p, 'w', ZIP_DEFLATED) as zipfile:
                 if not filename:
                     fp = StringIO()
                     self.before(req, fp)
-                    for i, item in enumerate(page_query(self.query(req), verbose=verbose)):
-                        self.dump(req, fp, item, i)
+                    self.dump_all(req, fp, page_query(query, verbose=verbose))
                     self.after(req, fp)
                     fp.seek(0)
                     zipfile.writestr(self.name, fp.read())
                 else:
                     zipfile.write(filename, self.name)
+                if since:
+                    zipfile.writestr('deleted.txt', ''.join(
+                        '%s\n' % id_ for change, id_, updated, version
+                        in changes(self.model, since) if change == 'deleted'
+                    ).encode('utf8'))
                 zipfile.writestr('README.txt', """
 {0} data download
 {1}
@@ -136,6 +167,10 @@ It should be cited as
     def before(self, req, fp):
         pass
 
+    def dump_all(self, req, fp, items):
+        for i, item in enumerate(items):
+            self.dump(req, fp, item, i)
+
     def dump(self, req, fp, item, index):
         adapter = get_adapter(IRepresentation, item, req, ext=self.ext)
         self.dump_rendered(req, fp, item, index, adapter.render(item, req))
@@ -160,10 +195,39 @@ class CsvDump(Download):
         self.writer.writerow(
             [f if isinstance(f, basestring) else f[1] for f in self.fields])
 
+    def columns(self):
+        """
+        :return: list of column attributes to select, if all fields are plain columns of \
+        the model and neither query nor rows are customized, else None.
+        """
+        cls = type(self)
+        if any(getattr(cls, name) != getattr(CsvDump, name)
+               for name in ['row', 'query', 'dump']):
+            return None
+        mapper = class_mapper(self.model)
+        names = [f if isinstance(f, basestring) else f[0] for f in self.fields]
+        if all(name in mapper.column_attrs for name in names):
+            return [getattr(self.model, name) for name in names]
+
+    def query(self, req):
+        columns = self.columns()
+        if columns is None:
+            return super(CsvDump, self).query(req)
+        # selecting just the columns spares us the instantiation of ORM objects.
+        return DBSession.query(*columns)\
+            .filter(self.model.active == True)\
+            .order_by(self.model.pk)
+
     def row(self, req, fp, item, index):
         return [getattr(item, f if isinstance(f, basestring) else f[0])
                 for f in self.fields]
 
+    def dump_all(self, req, fp, items):
+        if self.columns() is not None:
+            self.writer.writerows(items)
+        else:
+            super(CsvDump, self).dump_all(req, fp, items)
+
     def dump(self, req, fp, item, index):
         self.writer.writerow(self.row(req, fp, item, index))
 
@@ -194,14 +258,25 @@ class RdfXmlDump(Download):
 
 
 class Sqlite(Download):
+    """A SQLite database with a copy of all tables of the app's database.
+
+    If the download is configured with workers > 1, tables are read concurrently via
+    separate connections of the session's engine; otherwise the session's connection is
+    used.
+    """
     ext = 'sqlite'
+    workers = 1
+    delta = False
 
-    def create(self, req):
-        print '+---------------------------------------------+'
-        print '| This download must be created "by hand".'
-        print '| Make sure a suitable file is available at'
-        print '|', self.abspath(req)
-        print '| when the app is started.'
-        print '+---------------------------------------------+'
-        return
-        #super(Sqlite, self).create(req, filename=postgres2sqlite(self.pkg))
+    def create(self, req, filename=None, verbose=True):
+        fname = mktemp('.sqlite')
+        try:
+            DBSession.flush()
+            dump_sqlite(
+                DBSession.get_bind() if self.workers > 1 else DBSession.connection(),
+                fname,
+                workers=self.workers)
+            super(Sqlite, self).create(req, filename=fname, verbose=verbose)
+        finally:
+            if path(fname).exists():
+                path(fname).remove()
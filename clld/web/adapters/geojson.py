@@ -1,6 +1,6 @@
 from zope.interface import implementer
 from pyramid.renderers import render as pyramid_render
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, joinedload_all, undefer
 
 from clld.web.adapters.base import Renderable
 from clld import interfaces
@@ -83,8 +83,15 @@ class GeoJsonParameter(GeoJson):
         return {'name': ctx.name}
 
     def feature_iterator(self, ctx, req):
+        # the feature properties contain the json representation of the values and their
+        # domainelements and valuesets - including jsondata, so we load it upfront.
         q = DBSession.query(ValueSet).join(Value).filter(ValueSet.parameter_pk == ctx.pk)\
-            .options(joinedload(ValueSet.values), joinedload(ValueSet.language))
+            .options(
+                joinedload_all(ValueSet.values, Value.domainelement),
+                joinedload(ValueSet.language),
+                undefer('jsondata'),
+                undefer('values.jsondata'),
+                undefer('values.domainelement.jsondata'))
         de = req.params.get('domainelement')
         if de:
             return [vs for vs in ctx.valuesets
@@ -103,4 +110,5 @@ class GeoJsonLanguages(GeoJson):
     """Render a collection of languages as geojson feature collection.
     """
     def feature_iterator(self, ctx, req):
-        return ctx.get_query(limit=5000)
+        # the json representation of a language includes jsondata.
+        return ctx.load_rows(ctx.get_query(limit=5000).options(undefer('jsondata')))
@@ -3,12 +3,15 @@ Common functionality of CLLD Apps is cobbled together here.
 """
 from functools import partial
 from collections import OrderedDict
+from contextlib import contextmanager
 import re
+import time
 import importlib
+import logging
 from hashlib import md5
 
 from sqlalchemy import engine_from_config
-from sqlalchemy.orm import joinedload_all, joinedload
+from sqlalchemy.orm import joinedload_all, joinedload, undefer
 from sqlalchemy.orm.exc import NoResultFound
 
 from path import path
@@ -22,25 +25,36 @@ from pyramid.response import Response
 from pyramid.interfaces import IRoutesMapper
 from pyramid.asset import abspath_from_asset_spec
 from pyramid.config import Configurator
+from pyramid.settings import asbool, aslist
 from purl import URL
 
 import clld
 from clld.config import get_config
-from clld.db.meta import DBSession, Base
+from clld.db.meta import DBSession, Base, REPLICAS, JSONEncodedDict
 from clld.db.models import common
+from clld.db.util import with_polymorphic
 from clld import Resource, RESOURCES
 from clld import interfaces
-from clld.web.adapters import get_adapters
+from clld.web.adapters import get_adapters, prime_dispatch_tables
 from clld.web.adapters import excel
-from clld.web.views import index_view, resource_view, _raise, _ping, js, unapi
+from clld.web.views import (
+    index_view, resource_view, _raise, _ping, js, unapi, bundle,
+)
 from clld.web.views.olac import olac, OlacConfig
 from clld.web.views.sitemap import robots, sitemapindex, sitemap
-from clld.web.subscribers import add_renderer_globals, add_localizer, init_map
+from clld.web.views.changes import changes
+from clld.web.subscribers import (
+    add_renderer_globals, add_localizer, init_map, init_session,
+)
 from clld.web.datatables.base import DataTable
 from clld.web import datatables
 from clld.web.maps import Map, ParameterMap, LanguageMap
 from clld.web.icon import ICONS, MapMarker
+from clld.web.util.cache import LRUFragmentCache
 from clld.web import assets
+from clld.web.warmup import prepare_app
+
+log = logging.getLogger(__name__)
 
 
 class ClldRequest(Request):
@@ -65,7 +79,7 @@ class ClldRequest(Request):
         """Properties of the dataset an application serves are used in various places,
         so we want to have a reference to it.
         """
-        return self.db.query(common.Dataset).first()
+        return self.db.query(common.Dataset).options(undefer('jsondata')).first()
 
     def get_datatable(self, name, model, **kw):
         dt = self.registry.getUtility(interfaces.IDataTable, name)
@@ -141,6 +155,10 @@ class CtxFactoryQuery(object):
     for the ICtxFactoryQuery interface. Usually this will be a class derived from
     CtxFactoryQuery.
     """
+    # Detail pages typically display the attributes of custom models, so we load them
+    # eagerly, see clld.db.util.with_polymorphic.
+    polymorphic_loading = 'eager'
+
     def refined_query(self, query, model, req):
         """Derived classes may override this method to add model-specific query
         refinements of their own.
@@ -148,7 +166,8 @@ class CtxFactoryQuery(object):
         return query
 
     def __call__(self, model, req):
-        query = req.db.query(model).filter(model.id == req.matchdict['id'])
+        query = with_polymorphic(req.db.query(model), self.polymorphic_loading)\
+            .filter(model.id == req.matchdict['id'])
         custom_query = self.refined_query(query, model, req)
 
         if query == custom_query:
@@ -192,7 +211,7 @@ def ctx_factory(model, type_, req):
 
     try:
         if model == common.Dataset:
-            ctx = req.db.query(model).one()
+            ctx = with_polymorphic(req.db.query(model)).one()
         else:
             ctx = req.registry.getUtility(interfaces.ICtxFactoryQuery)(model, req)
         ctx.metadata = get_adapters(interfaces.IMetadata, ctx, req)
@@ -201,6 +220,40 @@ def ctx_factory(model, type_, req):
         raise HTTPNotFound()
 
 
+class StartupProfile(OrderedDict):
+    """Wall clock time spent in the phases of app configuration, in seconds.
+
+    >>> p = StartupProfile()
+    >>> p.mark('a')
+    >>> with p('b'):
+    ...     pass
+    >>> assert list(p.keys()) == ['a', 'b'] and 'total' in p.report()
+    """
+    def __init__(self):
+        super(StartupProfile, self).__init__()
+        self.start = self.last = time.time()
+
+    def mark(self, phase):
+        """Attribute the time since the last mark to phase.
+        """
+        now = time.time()
+        self[phase] = self.get(phase, 0) + now - self.last
+        self.last = now
+
+    @contextmanager
+    def __call__(self, phase):
+        self.last = time.time()
+        try:
+            yield
+        finally:
+            self.mark(phase)
+
+    def report(self):
+        lines = ['%-30s %8.3fs' % item for item in self.items()]
+        lines.append('%-30s %8.3fs' % ('total', sum(self.values())))
+        return '\n'.join(lines)
+
+
 def maybe_import(name):
     try:
         return importlib.import_module(name)
@@ -275,6 +328,12 @@ def register_download(config, download):
     config.registry.registerUtility(download, interfaces.IDownload, name=download.name)
 
 
+def set_route_readonly(config, route_name, readonly=True):
+    """Serve GET requests to the route with - or without - a read-only db session.
+    """
+    config.registry.readonly_routes[route_name] = readonly
+
+
 def add_settings_from_file(config, file_):
     if file_.exists():
         cfg = get_config(file_)
@@ -287,10 +346,15 @@ def get_configurator(pkg, *utilities, **kw):
     """
     .. seealso:: https://groups.google.com/d/msg/pylons-discuss/Od6qIGaLV6A/3mXVBQ13zWQJ
     """
+    profile = StartupProfile()
     kw.setdefault('package', pkg)
     routes = kw.pop('routes', [])
 
     config = Configurator(**kw)
+    # note: routes and views are only registered when the configuration is committed,
+    # i.e. the time needed for this is not included in the profile.
+    config.registry.startup_profile = profile
+    config.registry.readonly_routes = {}
 
     for name, pattern in routes:
         config.add_route(name, pattern)
@@ -298,11 +362,29 @@ def get_configurator(pkg, *utilities, **kw):
     config.set_request_factory(ClldRequest)
     config.registry.registerUtility(CtxFactoryQuery(), interfaces.ICtxFactoryQuery)
     config.registry.registerUtility(OlacConfig(), interfaces.IOlacConfig)
-
-    # initialize the db connection
-    engine = engine_from_config(config.registry.settings, 'sqlalchemy.')
+    fragment_cache_size = int(
+        config.registry.settings.get('clld.fragment_cache_size', 1000))
+    if fragment_cache_size:
+        config.registry.registerUtility(
+            LRUFragmentCache(fragment_cache_size), interfaces.IFragmentCache)
+
+    # initialize the db connection; native JSON columns must be enabled explicitly,
+    # since existing databases store jsondata as text - see clld.db.migration.
+    native_json = asbool(config.registry.settings.get('clld.native_json', False))
+    engine = JSONEncodedDict.configure(
+        engine_from_config(config.registry.settings, 'sqlalchemy.'), native_json)
     DBSession.configure(bind=engine)
     Base.metadata.bind = engine
+    # read replicas, serving the requests with read-only db sessions - see
+    # clld.readonly_sessions - are configured as whitespace separated list of URLs; other
+    # engine options are the same as for the primary database.
+    REPLICAS.configure([
+        JSONEncodedDict.configure(engine_from_config(
+            dict(config.registry.settings, **{'sqlalchemy.url': url}), 'sqlalchemy.'),
+            native_json)
+        for url in aslist(config.registry.settings.get('clld.replicas', ''))])
+
+    profile.mark('setup')
 
     config.add_settings({'pyramid.default_locale_name': 'en'})
     if 'clld.files' in config.registry.settings:
@@ -312,8 +394,11 @@ def get_configurator(pkg, *utilities, **kw):
         config.add_static_view('files', abspath)
 
     # event subscribers:
+    config.add_subscriber(init_session, events.ApplicationCreated)
     config.add_subscriber(add_localizer, events.NewRequest)
     config.add_subscriber(init_map, events.ContextFound)
+    config.add_subscriber(prime_dispatch_tables, events.ApplicationCreated)
+    config.add_subscriber(prepare_app, events.ApplicationCreated)
     config.add_subscriber(
         partial(add_renderer_globals, maybe_import('%s.util' % config.package_name)),
         events.BeforeRender)
@@ -330,12 +415,22 @@ def get_configurator(pkg, *utilities, **kw):
         'register_download': register_download,
         'add_route_and_view': add_route_and_view,
         'add_settings_from_file': add_settings_from_file,
+        'set_route_readonly': set_route_readonly,
     }.items():
         config.add_directive(name, func)
 
     #
     # routes and views
     #
+    # content-hashed asset bundles are built into the app's static directory - or the
+    # directory configured as clld.assets_directory - and served - precompressed if
+    # possible - with far-future expiry; note that this route must be added before the
+    # static view.
+    config.add_settings({'clld.assets_directory': assets.output_directory(
+        config.package_name, config.registry.settings)})
+    config.add_route(
+        '_bundle', '/static/{type:js|css}/packed.{version:[0-9a-f]+}.{ext:js|css}')
+    config.add_view(bundle, route_name='_bundle')
     config.add_static_view('clld-static', 'clld:web/static')
     config.add_static_view('static', '%s:static' % config.package_name)
 
@@ -360,6 +455,7 @@ def get_configurator(pkg, *utilities, **kw):
 
     config.add_route_and_view('unapi', '/unapi', unapi)
     config.add_route_and_view('olac', '/olac', olac)
+    config.add_route_and_view('changes', '/changes', changes)
 
     for rsc in RESOURCES:
         name, model = rsc.name, rsc.model
@@ -383,12 +479,15 @@ def get_configurator(pkg, *utilities, **kw):
     config.register_map('languages', Map)
     config.register_map('language', LanguageMap)
     config.register_map('parameter', ParameterMap)
+    profile.mark('routes, views and datatables')
 
     config.include('clld.web.adapters')
+    profile.mark('adapters')
 
     for icon in ICONS:
         config.registry.registerUtility(icon, interfaces.IIcon, name=icon.name)
     config.registry.registerUtility(MapMarker(), interfaces.IMapMarker)
+    profile.mark('icons')
 
     #
     # now we exploit the default package layout as created via the CLLD scaffold:
@@ -396,6 +495,14 @@ def get_configurator(pkg, *utilities, **kw):
     # note: the following exploits the import time side effect of modifying the webassets
     # environment!
     maybe_import('%s.assets' % config.package_name)
+    prod = config.registry.settings.get('clld.environment') == 'production'
+    assets.environment.debug = not prod
+    if prod:
+        # in production we only read the manifest written by build_assets.
+        manifest = assets.load_manifest(
+            config.registry.settings['clld.assets_directory'])
+        if manifest:
+            config.add_settings({'clld.assets': manifest})
 
     pkg_dir = path(config.package.__file__).dirname().abspath()
 
@@ -432,4 +539,7 @@ def get_configurator(pkg, *utilities, **kw):
 
     for utility, interface in utilities:
         config.registry.registerUtility(utility, interface)
+    profile.mark('app package')
+    if asbool(config.registry.settings.get('clld.profile_startup')):
+        log.info('startup profile:\n%s' % profile.report())
     return config
@@ -1,5 +1,14 @@
+import json
+from gzip import GzipFile
+from contextlib import closing
+
 from webassets import Environment, Bundle
 from path import path
+from pyramid.path import AssetResolver
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
 
 import clld
 
@@ -57,3 +66,85 @@ bundles = {
 for name in bundles:
     environment.register(
         name, *bundles[name], **dict(output='{0}/packed.%(version)s.{0}'.format(name)))
+
+
+# name of the file, in the output directory, recording the URLs of built bundles:
+MANIFEST = 'assets.json'
+
+
+class BuiltBundle(object):
+    """Stand-in for a webassets Bundle, providing the URLs recorded in a manifest.
+    """
+    def __init__(self, urls):
+        self._urls = urls
+
+    def urls(self):
+        return self._urls
+
+
+def compress(fname, brotli_=False):
+    """Write compressed siblings fname.gz (and fname.br) of a file.
+    """
+    fname = path(fname)
+    with open(fname, 'rb') as fp:
+        content = fp.read()
+    with open(fname + '.gz', 'wb') as fp:
+        # we pass a fixed mtime, to get identical output for identical content.
+        with closing(GzipFile(fname.basename(), 'wb', 9, fp, mtime=0)) as gz:
+            gz.write(content)
+    if brotli_ and brotli:
+        with open(fname + '.br', 'wb') as fp:
+            fp.write(brotli.compress(content))
+
+
+def output_directory(package_name, settings=None):
+    """
+    :return: directory for built bundles and the manifest, as configured with \
+    clld.assets_directory, defaulting to the static directory of the app package.
+    """
+    if settings and settings.get('clld.assets_directory'):
+        return path(settings['clld.assets_directory']).abspath()
+    return path(AssetResolver().resolve('%s:static' % package_name).abspath())
+
+
+def build(directory, url, env=None, names=None, brotli_=False):
+    """Compile, minify and version bundles, write compressed copies of the output files
+    and record the resulting URLs in a manifest.
+
+    Sources are resolved via the load path of the environment, so the output can be
+    written to a directory other than the environment's.
+
+    :param directory: output directory, see output_directory.
+    :param url: URL prefix for the output files, e.g. '/app:static/'.
+    :param names: names of the bundles to build, defaults to the names in bundles.
+    :return: dict mapping bundle names to lists of URLs.
+    """
+    env = env or environment
+    directory = path(directory)
+    if not directory.exists():
+        directory.makedirs()
+    config = env.debug, env.directory, env.url
+    env.debug, env.directory, env.url = False, directory, url
+    manifest = {}
+    try:
+        for name in names or bundles:
+            bundle = env[name]
+            bundle.build(env=env, force=True)
+            compress(bundle.resolve_output(env), brotli_=brotli_)
+            manifest[name] = bundle.urls(env=env)
+    finally:
+        env.debug, env.directory, env.url = config
+    with open(directory.joinpath(MANIFEST), 'w') as fp:
+        json.dump(manifest, fp, indent=4)
+    return manifest
+
+
+def load_manifest(directory):
+    """
+    :return: dict mapping bundle names to BuiltBundle instances or None, if no manifest \
+    has been built.
+    """
+    fname = path(directory).joinpath(MANIFEST)
+    if fname.exists():
+        with open(fname) as fp:
+            return dict((k, BuiltBundle(v)) for k, v in json.load(fp).items())
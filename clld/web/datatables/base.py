@@ -4,6 +4,7 @@ nature: On the client they provide the information to instantiate a jquery DataT
 object. Server side they know how to provide the data to the client-side table.
 """
 from json import dumps
+from copy import copy
 import re
 
 from sqlalchemy import desc
@@ -11,12 +12,14 @@ from sqlalchemy.types import String, Unicode, Float, Integer, Boolean
 from pyramid.renderers import render
 from markupsafe import Markup
 from zope.interface import implementer
+from repoze.lru import LRUCache
 
-from clld.db.meta import DBSession
+from clld.db.meta import DBSession, Base
 from clld.db.models.common import Language
-from clld.db.util import icontains
+from clld.db.util import icontains, with_polymorphic, load_polymorphic
 from clld.web.util.htmllib import HTML
 from clld.web.util.helpers import link, button, icon, JSMap, JS_CLLD
+from clld.web.adapters import get_adapters
 from clld.interfaces import IDataTable, IIndex
 
 
@@ -78,6 +81,15 @@ class Col(object):
             if not hasattr(self, 'choices'):
                 self.choices = ['True', 'False']
 
+    def bind(self, dt):
+        """
+        :return: a copy of the column specification, bound to DataTable dt.
+        """
+        col = copy(self)
+        col.dt = dt
+        col.js_args = dict(self.js_args)
+        return col
+
     def order(self):
         return self.model_col
 
@@ -178,14 +190,37 @@ class DetailsRowLinkCol(Col):
             tag=HTML.button)
 
 
+def _signature(value):
+    if isinstance(value, Base):
+        return (value.__class__.__name__, value.pk, getattr(value, 'version', None))
+    if value is None or isinstance(value, (basestring, int, long, float)):
+        return value
+    raise TypeError(value)
+
+
 @implementer(IDataTable)
 class DataTable(object):
+    # How to load attributes of custom models for the rows of the table, see
+    # clld.db.util.with_polymorphic. DataTables not displaying custom attributes may set
+    # this to None, to skip joining the tables of custom models.
+    polymorphic_loading = 'eager'
+
+    # If True, column specifications, options and toolbar are computed once per signature
+    # and then only bound to the DataTables of subsequent requests. Only DataTables whose
+    # columns depend on nothing but the context objects stored as attributes - i.e. not
+    # on request parameters, the user or the locale - should set this to True.
+    cache_col_defs = False
+
+    # maximal number of signatures for which compiled column specs are kept:
+    max_compiled = 1000
+
     def __init__(self, req, model, eid=None, **kw):
         self.model = model
         self.req = req
         self.eid = eid or self.__class__.__name__
         self._cols = None
         self._options = None
+        self._compiled = False
         self.count_all = None
         self.count_filtered = None
 
@@ -198,16 +233,74 @@ class DataTable(object):
     def col_defs(self):
         raise NotImplementedError  # pragma: no cover
 
+    def signature(self):
+        """
+        :return: hashable key, identifying DataTables with the same column specs, or \
+        None if the column specs cannot be shared.
+
+        The signature is made up of class, model and locale, and of the public \
+        attributes of the DataTable, e.g. the parameter a DataTable of values is \
+        restricted to.
+        """
+        if not self.cache_col_defs:
+            return
+        ctx = []
+        for attr, value in sorted(self.__dict__.items()):
+            if attr.startswith('_') \
+                    or attr in ['req', 'model', 'eid', 'count_all', 'count_filtered']:
+                continue
+            try:
+                ctx.append((attr, _signature(value)))
+            except TypeError:
+                return
+        return (
+            self.__class__,
+            self.model,
+            self.eid,
+            getattr(self.req, 'locale_name', None),
+            getattr(self.req, 'application_url', None),
+            tuple(ctx))
+
+    def compiled(self):
+        """
+        :return: dict holding column specs, options and toolbar shared by all \
+        DataTables with the same signature, or None.
+        """
+        if self._compiled is False:
+            self._compiled = None
+            registry = getattr(self.req, 'registry', None)
+            key = self.signature()
+            if registry is not None and key is not None:
+                cache = registry.__dict__.get('_clld_compiled_datatables')
+                if cache is None:
+                    cache = registry.__dict__['_clld_compiled_datatables'] = \
+                        LRUCache(self.max_compiled)
+                self._compiled = cache.get(key)
+                if self._compiled is None:
+                    self._compiled = {}
+                    cache.put(key, self._compiled)
+        return self._compiled
+
+    def _from_compiled(self, name, creator):
+        compiled = self.compiled()
+        if compiled is None:
+            return creator()
+        if name not in compiled:
+            compiled[name] = creator()
+        return compiled[name]
+
     @property
     def cols(self):
         if not self._cols:
-            self._cols = self.col_defs()
+            self._cols = [
+                col.bind(self) for col in self._from_compiled(
+                    'cols', lambda: [col.bind(None) for col in self.col_defs()])]
         return self._cols
 
     @property
     def options(self):
         if not self._options:
-            self._options = self.get_options()
+            self._options = dict(self._from_compiled('options', self.get_options))
             self._options['bServerSide'] = True
             self._options['bProcessing'] = True
             if 'sAjaxSource' not in self._options:
@@ -219,6 +312,12 @@ class DataTable(object):
         """
         return query
 
+    def get_count_all(self, query):
+        """Custom DataTables can overwrite this method to look up the total number of
+        rows - e.g. from materialized statistics - rather than counting them.
+        """
+        return query.count()
+
     def render(self):
         return Markup(render(
             'clld:web/templates/datatable.mako',
@@ -226,9 +325,19 @@ class DataTable(object):
             request=self.req))
 
     def get_query(self, limit=1000, offset=0):
-        query = self.base_query(DBSession.query(self.model))
-        self.count_all = query.count()
-
+        """
+        :return: query for the rows of the table. Since attributes of custom models are \
+        only loaded upon iteration with polymorphic_loading 'selectin', rows should be \
+        retrieved via load_rows.
+        """
+        # rows are counted on the plain query, without joining the tables of custom
+        # models.
+        count_query = self.base_query(DBSession.query(self.model))
+        query = self.base_query(
+            with_polymorphic(DBSession.query(self.model), self.polymorphic_loading))
+        self.count_all = self.get_count_all(count_query)
+
+        clauses = []
         for name, val in self.req.params.items():
             if val and name.startswith('sSearch_'):
                 try:
@@ -236,9 +345,12 @@ class DataTable(object):
                 except ValueError:  # pragma: no cover
                     clause = None
                 if clause is not None:
-                    query = query.filter(clause)
+                    clauses.append(clause)
 
-        self.count_filtered = query.count()
+        for clause in clauses:
+            query = query.filter(clause)
+            count_query = count_query.filter(clause)
+        self.count_filtered = count_query.count()
 
         for index in range(int(self.req.params.get('iSortingCols', 0))):
             col = self.cols[int(self.req.params['iSortCol_%s' % index])]
@@ -261,9 +373,22 @@ class DataTable(object):
             .offset(int(self.req.params.get('iDisplayStart', offset)))
         return query
 
+    def load_rows(self, items):
+        """
+        :param items: query - or list of objects - for rows of the table.
+        :return: iterable of the rows, with attributes of custom models loaded as \
+        specified by polymorphic_loading.
+        """
+        if self.polymorphic_loading == 'selectin':
+            return load_polymorphic(items)
+        return items
+
     def toolbar(self):
         """
         """
+        return self._from_compiled('toolbar', self._toolbar)
+
+    def _toolbar(self):
         return HTML.div(
             HTML.a(
                 icon('download-alt'),
@@ -282,7 +407,7 @@ class DataTable(object):
                     href="#",
                     onclick="document.location.href = CLLD.DataTable.current_url('%s'); return false;" % fmt,
                     id='dt-dl-%s' % fmt))
-                  for fmt in [a.extension for n, a in self.req.registry.getAdapters([self.model()], IIndex)] if fmt != 'html'],
+                  for fmt in [a.extension for n, a in get_adapters(IIndex, self, self.req)] if fmt != 'html'],
                 **dict(class_="dropdown-menu")),
             button(icon('info-sign', inverted=True), class_='btn-info', id='cdOpener'),
             class_='btn-group right')
@@ -1,7 +1,8 @@
-from sqlalchemy.orm import joinedload, joinedload_all
+from sqlalchemy.orm import joinedload, joinedload_all, undefer
 
 from clld.db.models.common import (
     Value, ValueSet, Parameter, DomainElement, Language, Contribution, ValueSetReference,
+    Statistic,
 )
 from clld.db.util import icontains
 from clld.web.datatables.base import (
@@ -89,7 +90,9 @@ class Values(DataTable):
 
     def base_query(self, query):
         query = query.join(ValueSet).options(
-            joinedload_all(Value.valueset, ValueSet.references, ValueSetReference.source)
+            joinedload_all(Value.valueset, ValueSet.references, ValueSetReference.source),
+            # the jsondata of sources is needed to render links to google books.
+            undefer('valueset.references.source.jsondata'),
         )
 
         if self.language:
@@ -108,6 +111,18 @@ class Values(DataTable):
 
         return query
 
+    def get_count_all(self, query):
+        if type(self).base_query != Values.base_query:
+            # the stored counts do not account for additional filters of subclasses.
+            return query.count()
+        for attr in ['language', 'parameter', 'contribution']:
+            if getattr(self, attr):
+                count = Statistic.count(getattr(self, attr), 'value')
+                break
+        else:
+            count = Statistic.totals().get('value')
+        return query.count() if count is None else count
+
     def col_defs(self):
         #
         # TODO: move the first col def to apics-specific table!
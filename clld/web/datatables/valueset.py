@@ -1,7 +1,8 @@
-from sqlalchemy.orm import joinedload, joinedload_all
+from sqlalchemy.orm import joinedload, joinedload_all, undefer
 
 from clld.db.models.common import (
     ValueSet, Parameter, Language, Contribution, ValueSetReference,
+    Statistic,
 )
 from clld.web.datatables.base import (
     DataTable, Col, LinkCol, DetailsRowLinkCol, LinkToMapCol, LanguageCol,
@@ -54,7 +55,9 @@ class Valuesets(DataTable):
         query = query.join(Language)\
             .options(
                 joinedload(ValueSet.language),
-                joinedload_all(ValueSet.references, ValueSetReference.source))
+                joinedload_all(ValueSet.references, ValueSetReference.source),
+                # the jsondata of sources is needed to render links to google books.
+                undefer('references.source.jsondata'))
 
         if self.language:
             query = query.join(Parameter).options(joinedload(ValueSet.parameter))
@@ -69,6 +72,18 @@ class Valuesets(DataTable):
 
         return query
 
+    def get_count_all(self, query):
+        if type(self).base_query != Valuesets.base_query:
+            # the stored counts do not account for additional filters of subclasses.
+            return query.count()
+        for attr in ['language', 'parameter', 'contribution']:
+            if getattr(self, attr):
+                count = Statistic.count(getattr(self, attr), 'valueset')
+                break
+        else:
+            count = Statistic.totals().get('valueset')
+        return query.count() if count is None else count
+
     def col_defs(self):
         #
         # TODO: move the first col def to apics-specific table!
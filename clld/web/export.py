@@ -0,0 +1,250 @@
+"""
+Exporting a clld app as static site.
+
+Between releases the data of a clld app does not change, so all pages can be rendered
+once and served as files by the web server. export renders
+
+- the pages of the routes without placeholders (home page, legal, download, ...),
+- the index pages of all resources, in all formats,
+- the pages of all resources, in all formats,
+
+into a directory tree mirroring the URL space. For example, the page for the URL path
+/languages/abc is written to languages/abc.html and its JSON representation to
+languages/abc.json. The mimetypes of the exported files are listed in an nginx types
+block in the file export.types. The nginx site configuration created by clld.deploy
+serves these files, if they exist, for requests without query string; all other
+requests are passed to the app.
+
+Re-running the export only re-renders the resources whose version or time of last update
+changed since the previous export, as recorded in the file .export.json - unless some of
+their pages could not be exported, in which case they are re-rendered, too.
+"""
+import os
+import json
+import logging
+import multiprocessing
+from urllib import unquote
+
+from zope.interface import implementedBy
+from pyramid.request import Request
+from pyramid.interfaces import IRequestFactory, IRoutesMapper
+from pyramid.scripting import prepare
+from path import path
+
+from clld import RESOURCES
+from clld import interfaces
+from clld.db.meta import DBSession, prefork, after_fork
+from clld.web.adapters import dispatch_table
+from clld.web.warmup import compile_templates
+
+
+log = logging.getLogger(__name__)
+
+MANIFEST = '.export.json'
+TYPES = 'export.types'
+
+# routes which serve query APIs rather than pages:
+DYNAMIC_ROUTES = ['olac', 'unapi', 'changes']
+
+
+def filename(url_path):
+    """
+    :return: path of the file for a URL path, relative to the export directory.
+
+    >>> filename('/')
+    'index.html'
+    >>> filename('/languages')
+    'languages.html'
+    >>> filename('/languages/a%20b.json')
+    'languages/a b.json'
+    """
+    p = unquote(url_path).lstrip('/')
+    if not p or p.endswith('/'):
+        return p + 'index.html'
+    if '.' not in p.split('/')[-1]:
+        p += '.html'
+    return p
+
+
+def _extensions(registry, interface, model):
+    # nginx determines the mimetype by the last extension only, so formats with compound
+    # extensions - like snippet.html - are left to the app.
+    table = dispatch_table(registry, interface, implementedBy(model))
+    return sorted(
+        ext for ext in table.by_extension if ext and ext != 'html' and '.' not in ext)
+
+
+def pages(req):
+    """
+    :return: generator of (key, list of URL paths) pairs for the pages of the routes \
+    without placeholders and the index pages of all resources.
+    """
+    mapper = req.registry.getUtility(IRoutesMapper)
+    names = set(rsc.name for rsc in RESOURCES) | set(rsc.plural for rsc in RESOURCES)
+    for route in mapper.get_routes():
+        if route.name.startswith('_') \
+                or route.name.endswith('_alt') \
+                or route.name in names \
+                or route.name in DYNAMIC_ROUTES \
+                or '{' in route.pattern \
+                or '*' in route.pattern:
+            continue
+        yield route.name, [req.route_path(route.name)]
+
+    for rsc in RESOURCES:
+        if rsc.with_index and mapper.get_route(rsc.plural):
+            yield rsc.plural, [req.route_path(rsc.plural)] + [
+                req.route_path(rsc.plural + '_alt', ext=ext)
+                for ext in _extensions(req.registry, interfaces.IIndex, rsc.model)]
+
+
+def resources(req):
+    """
+    :return: generator of (key, signature, list of URL paths) triples for all resources.
+    """
+    mapper = req.registry.getUtility(IRoutesMapper)
+    for rsc in RESOURCES:
+        if not mapper.get_route(rsc.name):
+            continue
+        exts = _extensions(req.registry, interfaces.IRepresentation, rsc.model)
+        model = rsc.model
+        query = DBSession.query(model.id, model.version, model.updated)
+        for id_, version, updated in query:
+            yield (
+                '%s %s' % (rsc.name, id_),
+                '%s %s' % (version, updated),
+                [req.resource_path(id_, rsc=rsc)] + [
+                    req.resource_path(id_, rsc=rsc, ext=ext) for ext in exts])
+
+
+def render(app, url_path, base_url=None):
+    """
+    :return: triple (status code, mimetype, body) of the response to a GET request.
+    """
+    request_factory = app.registry.queryUtility(IRequestFactory, default=Request)
+    kw = {'base_url': base_url} if base_url else {}
+    try:
+        res = app.invoke_subrequest(request_factory.blank(url_path, **kw))
+    except Exception as e:
+        log.warn('could not render %s: %s' % (url_path, e))
+        return 500, None, None
+    return res.status_int, res.content_type, res.body
+
+
+_app = None
+_rendered = 0
+
+# number of pages after which a worker discards its db session:
+SESSION_PAGES = 100
+
+
+def _init_worker(app):
+    global _app
+    after_fork()
+    _app = app
+
+
+def _render(task):
+    global _rendered
+    key, url_path, base_url = task
+    try:
+        return (key, url_path) + render(_app, url_path, base_url)
+    finally:
+        # workers must not accumulate the objects of all rendered pages - but objects
+        # shared by many pages, like the dataset, should not be reloaded for each page.
+        _rendered += 1
+        if _rendered % SESSION_PAGES == 0:
+            DBSession.remove()
+
+
+def export(app, outdir, base_url=None, workers=1, force=False):
+    """Render all pages of an app into a directory.
+
+    :param app: the pyramid router of the app.
+    :param base_url: scheme and host used for absolute URLs in the pages.
+    :param workers: number of processes rendering pages; if 1, pages are rendered in \
+    the calling process.
+    :param force: if True, resources are re-rendered regardless of their version.
+    :return: pair (number of files written, list of URL paths which could not be \
+    rendered).
+    """
+    outdir = path(outdir)
+    if not outdir.exists():
+        outdir.makedirs()
+    manifest = outdir.joinpath(MANIFEST)
+    prev = json.loads(manifest.text()) if manifest.exists() else {}
+    prev_signatures, prev_files = prev.get('signatures', {}), prev.get('files', {})
+    # signatures of the resources, recorded once all their pages have been exported:
+    signatures, pending, files, types = {}, {}, {}, dict(prev.get('types', {}))
+
+    env = prepare(registry=app.registry)
+    tasks = []
+    try:
+        req = env['request']
+        for key, url_paths in pages(req):
+            tasks.extend((key, p, base_url) for p in url_paths)
+        for key, signature, url_paths in resources(req):
+            if not force and prev_signatures.get(key) == signature and key in prev_files:
+                signatures[key] = signature
+                files[key] = prev_files[key]
+            else:
+                pending[key] = signature
+                tasks.extend((key, p, base_url) for p in url_paths)
+    finally:
+        env['closer']()
+
+    if workers > 1:  # pragma: no cover
+        # compile the templates once, for all workers.
+        compile_templates(app.registry)
+        prefork()
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(app,))
+        results = pool.imap_unordered(_render, tasks, chunksize=20)
+    else:
+        results = ((key, p) + render(app, p, b) for key, p, b in tasks)
+
+    rendered, failed, count, errors = set(), set(), 0, []
+    for key, url_path, status, mimetype, body in results:
+        if key not in rendered:
+            rendered.add(key)
+            files[key] = []
+        if status != 200:
+            errors.append(url_path)
+            failed.add(key)
+            continue
+        fname = filename(url_path)
+        ext = fname.split('.')[-1]
+        if types.setdefault(ext, mimetype) != mimetype:
+            # nginx determines the mimetype by extension, so pages with a different
+            # mimetype must be served by the app.
+            errors.append(url_path)
+            failed.add(key)
+            continue
+        target = outdir.joinpath(fname)
+        if not target.dirname().exists():
+            target.dirname().makedirs()
+        with open(target, 'wb') as fp:
+            fp.write(body)
+        files[key].append(fname)
+        count += 1
+
+    if workers > 1:  # pragma: no cover
+        pool.close()
+        pool.join()
+
+    for key, signature in pending.items():
+        if key not in failed:
+            signatures[key] = signature
+
+    # remove the files of deleted resources and of formats no longer rendered:
+    current = set(fname for fnames in files.values() for fname in fnames)
+    for fnames in prev_files.values():
+        for fname in fnames:
+            if fname not in current and outdir.joinpath(fname).exists():
+                os.remove(outdir.joinpath(fname))
+
+    with open(outdir.joinpath(TYPES), 'w') as fp:
+        fp.write('types {\n%s}\n' % ''.join(
+            '    %s %s;\n' % (mimetype, ext) for ext, mimetype in sorted(types.items())))
+    with open(manifest, 'w') as fp:
+        json.dump(dict(signatures=signatures, files=files, types=types), fp)
+    return count, errors
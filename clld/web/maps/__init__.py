@@ -2,6 +2,7 @@ from markupsafe import Markup
 from pyramid.renderers import render
 
 from clld.interfaces import IDataTable, IMapMarker, IIcon
+from clld.db.models.common import Statistic
 from clld.web.util import helpers
 from clld.web.util.htmllib import HTML
 from clld.web.adapters import GeoJsonLanguages
@@ -164,14 +165,19 @@ class Map(object):
 class ParameterMap(Map):
     def get_layers(self):
         if self.ctx.domain:
+            counts = Statistic.counts(self.ctx.domain, 'value')
             for de in self.ctx.domain:
+                kw = {}
+                if de.pk in counts:
+                    kw['representation'] = counts[de.pk]
                 yield Layer(
                     de.id,
                     de.name,
                     self.req.resource_url(
                         self.ctx, ext='geojson', _query=dict(domainelement=str(de.id))
                     ),
-                    marker=helpers.map_marker_img(self.req, de, marker=self.map_marker))
+                    marker=helpers.map_marker_img(self.req, de, marker=self.map_marker),
+                    **kw)
         else:
             yield Layer(
                 self.ctx.id, self.ctx.name, self.req.resource_url(self.ctx, ext='geojson'))
@@ -0,0 +1,176 @@
+"""
+A pre-forking WSGI server, to serve a clld app from several processes during development.
+
+.. note::
+
+    The server is built on wsgiref, i.e. speaks HTTP/1.0 only, without keep-alive. It is
+    meant for development and testing of multi-process setups; in production, clld apps
+    are served by gunicorn, configured with the hooks gunicorn_pre_fork and
+    gunicorn_post_fork from clld.db.meta.
+
+The server is configured in the app's ini file::
+
+    [server:main]
+    use = egg:clld#prefork
+    host = 0.0.0.0
+    port = 6543
+    workers = 4
+    threads = 0
+    preload = true
+
+and run via ``pserve``. In preload mode - the default - the app is created once, in the
+master process, and the worker processes share its memory; otherwise each worker
+creates the app from the ini file. Before forking, all database connections of the
+master are released, and each worker starts with fresh connection pools.
+
+With threads > 0, each worker serves requests from a pool of at most this many
+threads; otherwise requests are served one at a time.
+"""
+import os
+import sys
+import errno
+import signal
+import logging
+import threading
+from SocketServer import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+from pyramid.settings import asbool
+from pyramid.paster import get_app
+
+from clld.db.meta import prefork, after_fork
+
+
+log = logging.getLogger(__name__)
+
+
+class RequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    # semaphore limiting the number of threads serving requests concurrently:
+    slots = None
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        try:
+            ThreadingMixIn.process_request(self, request, client_address)
+        except Exception:  # pragma: no cover
+            self.slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            ThreadingMixIn.process_request_thread(self, request, client_address)
+        finally:
+            self.slots.release()
+
+
+class PreforkServer(object):
+    """Master process, binding the listening socket and supervising the workers.
+
+    :param app: WSGI app; if None, each worker calls app_factory to create its own app.
+    """
+    def __init__(self,
+                 app=None,
+                 app_factory=None,
+                 host='0.0.0.0',
+                 port=6543,
+                 workers=2,
+                 threads=0):
+        assert app is not None or app_factory is not None
+        self.app = app
+        self.app_factory = app_factory
+        self.workers = workers
+        self.server = make_server(
+            host,
+            port,
+            app,
+            server_class=ThreadingWSGIServer if threads else WSGIServer,
+            handler_class=RequestHandler)
+        if threads:
+            self.server.slots = threading.BoundedSemaphore(threads)
+        self.pids = set()
+        self.running = False
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            return pid
+
+        # in the worker process:
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            after_fork()
+            self.server.set_app(self.app if self.app is not None else self.app_factory())
+            self.server.serve_forever()
+        except Exception:  # pragma: no cover
+            log.exception('worker %s failed' % os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+
+    def stop(self, *args):
+        self.running = False
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:  # pragma: no cover
+                pass
+
+    def serve_forever(self):
+        prefork()
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        for i in range(self.workers):
+            self.spawn()
+        log.info('serving on http://%s:%s with %s workers' % (
+            self.address[0], self.address[1], self.workers))
+        try:
+            while self.pids:
+                try:
+                    pid, status = os.wait()
+                except OSError as e:  # pragma: no cover
+                    if e.errno == errno.ECHILD:
+                        break
+                    # interrupted by a signal
+                    continue
+                except KeyboardInterrupt:
+                    self.stop()
+                    continue
+                self.pids.discard(pid)
+                if self.running:
+                    log.warn(
+                        'worker %s exited with status %s; respawning' % (pid, status))
+                    self.spawn()
+        finally:
+            self.server.server_close()
+
+
+def server_runner(wsgi_app, global_conf, **kw):  # pragma: no cover
+    """Server factory for PasteDeploy, i.e. for ``use = egg:clld#prefork``.
+    """
+    app_factory = None
+    if not asbool(kw.get('preload', True)):
+        app_factory = lambda: get_app(global_conf['__file__'])
+        wsgi_app = None
+    server = PreforkServer(
+        wsgi_app,
+        app_factory=app_factory,
+        host=kw.get('host', '0.0.0.0'),
+        port=int(kw.get('port', 6543)),
+        workers=int(kw.get('workers', 2)),
+        threads=int(kw.get('threads', 0)))
+    print('Starting HTTP server on http://%s:%s' % server.address)
+    sys.stdout.flush()
+    server.serve_forever()
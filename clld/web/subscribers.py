@@ -1,9 +1,12 @@
+import threading
 from collections import defaultdict
 
 from six import PY3
 from pyramid.i18n import get_localizer, TranslationStringFactory
+from pyramid.settings import asbool
 
 from clld import interfaces
+from clld.db.meta import DBSession, ReadOnlySession, readonly_session
 from clld.web.util import helpers
 
 if PY3:  # pragma: no cover
@@ -23,11 +26,12 @@ def add_renderer_globals(module, event):
     if event['request']:
         _add_localizer(event['request'])
         event['_'] = event['request'].translate
-        prod = event['request'].registry.settings.get('clld.environment') == 'production'
-        environment.debug = not prod
+        # built bundles, as recorded in the manifest, are set up in get_configurator.
+        event['assets'] = event['request'].registry.settings.get(
+            'clld.assets', environment)
     else:
         event['_'] = lambda s, **kw: s
-    event['assets'] = environment
+        event['assets'] = environment
     event['h'] = helpers
     event['u'] = module  # pragma: no cover
     if module:
@@ -47,6 +51,69 @@ def add_renderer_globals(module, event):
 tsf = TranslationStringFactory('clld')
 
 
+# number of requests - i.e. a request and its subrequests - in progress per thread:
+_requests = threading.local()
+
+
+def _leave(request):
+    _requests.depth -= 1
+
+
+def use_readonly_session(request):
+    """Use a read-only db session for requests with safe HTTP method to read-only routes.
+
+    Routes are read-only if clld.readonly_sessions is set, unless configured otherwise
+    using the set_route_readonly directive. Read-only sessions use the read replicas
+    configured as clld.replicas, if any.
+    Subrequests share the session of the request they are invoked from.
+    """
+    if request.method not in ['GET', 'HEAD', 'OPTIONS']:
+        return
+    registry = request.registry
+    routes = getattr(registry, 'readonly_routes', {})
+    default = asbool(registry.settings.get('clld.readonly_sessions'))
+    if not routes and not default:
+        return
+    route = getattr(request, 'matched_route', None)
+    if not routes.get(route.name if route else None, default):
+        return
+    if DBSession.registry.has() and isinstance(DBSession(), ReadOnlySession.class_):
+        return
+    readonly_session()
+    request.add_finished_callback(lambda r: DBSession.remove())
+
+
+def readonly_aware(root_factory):
+    """
+    :return: root factory, calling use_readonly_session before root_factory - i.e. after \
+    the route of the request has been matched, but before the context is retrieved.
+    """
+    if getattr(root_factory, 'readonly_aware', False):
+        return root_factory
+
+    def factory(request):
+        depth = getattr(_requests, 'depth', 0)
+        _requests.depth = depth + 1
+        request.add_finished_callback(_leave)
+        if depth == 0:
+            use_readonly_session(request)
+        return root_factory(request)
+
+    factory.readonly_aware = True
+    return factory
+
+
+def init_session(event):
+    """Subscriber for ApplicationCreated, making the root factories of all routes of the
+    app readonly_aware.
+    """
+    app = event.app
+    if app.routes_mapper is not None:
+        for route in app.routes_mapper.get_routes():
+            route.factory = readonly_aware(route.factory or app.root_factory)
+    app.root_factory = readonly_aware(app.root_factory)
+
+
 def add_localizer(event):
     _add_localizer(event.request)
 
@@ -9,6 +9,9 @@
         % for dl in dls:
         <dd>
             <a href="${dl.url(request)}">${dl.label(req)}</a>
+            % if dl.delta and dl.abspath(request, delta=True).exists():
+            (<a href="${dl.url(request, delta=True)}">changes since the previous release</a>)
+            % endif
         </dd>
         % endfor
     % endfor
@@ -22,4 +25,10 @@
         ${h.external_link("http://en.wikipedia.org/wiki/README", label="README")}
         file.
     </p>
+    <p>
+        Where available, the changes since the previous release are provided as delta
+        archives, listing the ids of deleted items in a file deleted.txt; a feed of changes
+        since any point in time is available at
+        <a href="${request.route_url('changes')}">${request.route_url('changes')}</a>.
+    </p>
 </div>
@@ -1,4 +1,5 @@
 <%namespace name="util" file="../util.mako"/>
+<%! from clld.db.models.common import Statistic %>
 
 % if ctx.description:
 <p>
@@ -8,6 +9,7 @@
 
 % if ctx.domain:
 <% total = 0 %>
+<% counts = Statistic.counts(ctx.domain, 'value') %>
 <table class="table table-hover table-condensed domain" style="width: auto;">
     <thead>
         <tr>
@@ -17,10 +19,11 @@
     <tbody>
         % for de in ctx.domain:
         <tr>
-            <% total += len(de.values) %>
+            <% count = counts[de.pk] if de.pk in counts else len(de.values) %>
+            <% total += count %>
             <td>${h.map_marker_img(request, de)}</td>
             <td>${de.description or de.name}</td>
-            <td class="right">${len(de.values)}</td>
+            <td class="right">${count}</td>
         </tr>
         % endfor
         <tr>
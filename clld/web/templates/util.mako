@@ -161,19 +161,25 @@
     % endif
 </%def>
 
+##
+## cache the rendered body, keyed by name and the objects it depends upon
+##
+<%def name="cached(name, *objs)">${h.cached_fragment(request, name, objs, lambda: capture(caller.body))|n}</%def>
+
 ##
 ## format the sentences associated with a Value instance
 ##
 <%def name="sentences(obj=None, fmt='long')">
     <% obj = obj or ctx %>
+    <% rendered = h.rendered_sentences([a.sentence for a in obj.sentence_assocs], fmt=fmt) %>
     <dl id="sentences-${obj.pk}">
-        % for a in obj.sentence_assocs:
+        % for a, sentence in zip(obj.sentence_assocs, rendered):
         <dt>${h.link(request, a.sentence, label='%s %s:' % (_('Sentence'), a.sentence.id))}</dt>
         <dd>
             % if a.description and fmt == 'long':
             <p>${a.description}</p>
             % endif
-            ${h.rendered_sentence(a.sentence, fmt=fmt)}
+            ${sentence}
             % if a.sentence.references and fmt == 'long':
             <p>Source: ${h.linked_references(request, a.sentence)|n}</p>
             % endif
@@ -10,6 +10,7 @@ ${h.text2html(h.Markup(ctx.markup_description) if ctx.markup_description else ct
 % endif
 
 <h3>${_('Values')} ${h.map_marker_img(request, ctx, height='25', width='25')|n}</h3>
+<%call expr="util.cached('valueset/values', ctx, *ctx.values)">
 % for i, value in enumerate(ctx.values):
 <div style="clear: right;">
     <ul class="nav nav-pills pull-right">
@@ -31,6 +32,7 @@ ${h.text2html(h.Markup(ctx.markup_description) if ctx.markup_description else ct
     </div>
 </div>
 % endfor
+</%call>
 <%def name="sidebar()">
 <div class="well well-small">
 <dl>
@@ -0,0 +1,92 @@
+"""
+Caching of rendered HTML fragments.
+
+Since the data of clld apps is typically changed only with a new release, fragments are
+keyed by the primary keys and versions of the objects they depend on, plus the
+application URL, the locale and the query parameters of the request. Thus, repeated
+partials are rendered once per data version, without any explicit invalidation.
+
+.. note::
+
+    Only the versions of the objects passed to cached_fragment are part of the key; a
+    fragment rendering data of related objects - e.g. the sources of a valueset - is not
+    invalidated when these change, unless they are passed as well. Apps which edit data
+    between releases should clear the cache after edits.
+"""
+from hashlib import md5
+
+from zope.interface import implementer
+from repoze.lru import LRUCache
+
+from clld.interfaces import IFragmentCache
+from clld.web.util.htmllib import literal
+
+
+@implementer(IFragmentCache)
+class LRUFragmentCache(object):
+    """Bounded in-process fragment store.
+    """
+    def __init__(self, size=1000):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.lru = LRUCache(self.size)
+
+    def get(self, key):
+        return self.lru.get(key)
+
+    def set(self, key, value):
+        self.lru.put(key, value)
+
+
+def _obj_key(obj):
+    if hasattr(obj, 'pk'):
+        return '%s:%s:%s' % (obj.__class__.__name__, obj.pk, getattr(obj, 'version', ''))
+    return '%s' % (obj,)
+
+
+def fragment_key(req, name, *objs):
+    """
+    :param name: name of the fragment, e.g. the template it is rendered with.
+    :param objs: objects (or plain values) the fragment depends upon.
+    :return: str suitable as key for any IFragmentCache implementation.
+
+    Since fragments may contain absolute URLs, the key includes the application URL, \
+    i.e. scheme, host and script name of the request.
+
+    >>> class Req(object):
+    ...     def __init__(self, url):
+    ...         self.application_url = url
+    >>> assert fragment_key(Req('http://a'), 'f') != fragment_key(Req('https://a'), 'f')
+    """
+    parts = [
+        name, getattr(req, 'application_url', ''), getattr(req, 'locale_name', '')]
+    parts.extend(_obj_key(obj) for obj in objs)
+    params = getattr(req, 'params', None)
+    if params:
+        parts.extend('%s=%s' % item for item in sorted(params.items()))
+    return md5('|'.join(parts).encode('utf8')).hexdigest()
+
+
+def cached_fragment(req, name, objs, creator):
+    """Retrieve a rendered fragment from the cache, or render and store it.
+
+    :param creator: callable returning the rendered fragment.
+    :return: the fragment as literal.
+
+    >>> class Req(object):
+    ...     registry = None
+    >>> cached_fragment(Req(), 'f', [], lambda: '<br/>')
+    literal(u'<br/>')
+    """
+    cache = req.registry.queryUtility(IFragmentCache) if req.registry else None
+    if cache is None:
+        return literal(creator())
+
+    key = fragment_key(req, name, *objs)
+    res = cache.get(key)
+    if res is None:
+        res = '%s' % creator()
+        cache.set(key, res)
+    return literal(res)
@@ -13,12 +13,15 @@ else:
 
 from sqlalchemy import or_
 from markupsafe import Markup
+from repoze.lru import LRUCache
 from pyramid.renderers import render as pyramid_render
 from pyramid.threadlocal import get_current_request
 
 from clld import interfaces
 from clld import RESOURCES
 from clld.web.util.htmllib import HTML, literal
+# we import cached_fragment to have it available in templates:
+from clld.web.util.cache import cached_fragment  # noqa
 from clld.db.meta import DBSession
 from clld.db.models import common as models
 from clld.web.adapters import get_adapter, get_adapters
@@ -192,56 +195,141 @@ def cite_button(req, ctx):
 GLOSS_ABBR_PATTERN = re.compile(
     '(?P<personprefix>1|2|3)?(?P<abbr>[A-Z]+)(?P<personsuffix>1|2|3)?(?=([^a-z]|$))')
 
+PERSON_MAP = {
+    '1': 'first person',
+    '2': 'second person',
+    '3': 'third person',
+}
+
+
+class SentenceCache(object):
+    """Process-wide cache for gloss abbreviations per language and rendered sentences.
+
+    Since the data of clld apps is typically changed only with a new release - i.e. a
+    restart of the app - we do not bother with invalidation, but key rendered sentences
+    by pk and version. Since several apps may be served from one process, all entries
+    are keyed by app as well, i.e. by registry and application URL like fragment_key.
+    """
+    def __init__(self, size=5000, max_apps=20):
+        self.size = size
+        self.max_apps = max_apps
+        self.clear()
+
+    def clear(self):
+        # map app key to dict mapping language_pk to dict of abbreviations (including
+        # global ones):
+        self.abbrs = LRUCache(self.max_apps)
+        self.sentences = LRUCache(self.size)
+
+    @staticmethod
+    def app_key(req=None):
+        """
+        :return: key of the app serving req - or the current request.
+        """
+        req = req or get_current_request()
+        return (
+            getattr(getattr(req, 'registry', None), '__name__', None),
+            getattr(req, 'application_url', None))
+
+    def app_abbrs(self, req=None):
+        """
+        :return: dict mapping language_pk to dict of abbreviations for the app.
+        """
+        key = self.app_key(req)
+        abbrs = self.abbrs.get(key)
+        if abbrs is None:
+            abbrs = {}
+            self.abbrs.put(key, abbrs)
+        return abbrs
+
+    def get_sentence(self, key, req=None):
+        return self.sentences.get((self.app_key(req),) + key)
+
+    def put_sentence(self, key, value, req=None):
+        self.sentences.put((self.app_key(req),) + key, value)
+
+    def load_abbrs(self, language_pks, req=None):
+        """Retrieve missing abbreviation maps for a set of languages in one query.
+        """
+        cached = self.app_abbrs(req)
+        language_pks = set(language_pks) - set(cached.keys())
+        if not language_pks:
+            return
+
+        if None not in cached:
+            language_pks.add(None)
+        abbrs = dict((pk, {}) for pk in language_pks)
+        clauses = []
+        pks = [pk for pk in language_pks if pk is not None]
+        if pks:
+            clauses.append(models.GlossAbbreviation.language_pk.in_(pks))
+        if None in language_pks:
+            clauses.append(models.GlossAbbreviation.language_pk == None)
+        for ga in DBSession.query(models.GlossAbbreviation).filter(or_(*clauses)):
+            abbrs[ga.language_pk][ga.id] = ga.name
+
+        if None in abbrs:
+            cached[None] = abbrs.pop(None)
+        for pk, _abbrs in abbrs.items():
+            cached[pk] = dict(cached[None], **_abbrs)
+
+    def get_abbrs(self, language_pk, req=None):
+        self.load_abbrs([language_pk], req=req)
+        return self.app_abbrs(req)[language_pk]
+
+
+SENTENCE_CACHE = SentenceCache()
+
+
+def gloss_with_tooltip(gloss, abbrs):
+    res = []
+    end = 0
+    for match in GLOSS_ABBR_PATTERN.finditer(gloss):
+        if match.start() > end:
+            res.append(literal(gloss[end:match.start()]))
+
+        abbr = match.group('abbr')
+        if abbr in abbrs:
+            explanation = abbrs[abbr]
+            if match.group('personprefix'):
+                explanation = '%s %s' % (
+                    PERSON_MAP[match.group('personprefix')], explanation)
+
+            if match.group('personsuffix'):
+                explanation = '%s %s' % (
+                    explanation, PERSON_MAP[match.group('personsuffix')])
+
+            res.append(HTML.span(
+                HTML.span(gloss[match.start():match.end()].lower(), class_='sc'),
+                **{'data-hint': explanation, 'class': 'hint--bottom'}))
+        else:
+            res.append(abbr)
+
+        end = match.end()
+
+    res.append(literal(gloss[end:]))
+    return filter(None, res)
+
 
 #
 # TODO: enumerate exceptions: 1SG, 2SG, 3SG, ?PL, ?DU
 #
 def rendered_sentence(sentence, abbrs=None, fmt='long'):
+    """
+    :param abbrs: dict of gloss abbreviations; if None, the cached abbreviations for the \
+    sentence's language are used, and the rendered HTML is cached as well.
+    """
     if sentence.xhtml:
         return HTML.div(
             HTML.div(Markup(sentence.xhtml), class_='body'), class_="sentence")
 
+    key = None
     if abbrs is None:
-        q = DBSession.query(models.GlossAbbreviation).filter(
-            or_(models.GlossAbbreviation.language_pk == sentence.language_pk,
-                models.GlossAbbreviation.language_pk == None)
-        )
-        abbrs = dict((g.id, g.name) for g in q)
-
-    def gloss_with_tooltip(gloss):
-        person_map = {
-            '1': 'first person',
-            '2': 'second person',
-            '3': 'third person',
-        }
-
-        res = []
-        end = 0
-        for match in GLOSS_ABBR_PATTERN.finditer(gloss):
-            if match.start() > end:
-                res.append(literal(gloss[end:match.start()]))
-
-            abbr = match.group('abbr')
-            if abbr in abbrs:
-                explanation = abbrs[abbr]
-                if match.group('personprefix'):
-                    explanation = '%s %s' % (
-                        person_map[match.group('personprefix')], explanation)
-
-                if match.group('personsuffix'):
-                    explanation = '%s %s' % (
-                        explanation, person_map[match.group('personsuffix')])
-
-                res.append(HTML.span(
-                    HTML.span(gloss[match.start():match.end()].lower(), class_='sc'),
-                    **{'data-hint': explanation, 'class': 'hint--bottom'}))
-            else:
-                res.append(abbr)
-
-            end = match.end()
-
-        res.append(literal(gloss[end:]))
-        return filter(None, res)
+        key = (sentence.pk, getattr(sentence, 'version', None), fmt)
+        res = SENTENCE_CACHE.get_sentence(key)
+        if res is not None:
+            return res
+        abbrs = SENTENCE_CACHE.get_abbrs(sentence.language_pk)
 
     units = []
     if sentence.analyzed and sentence.gloss:
@@ -250,10 +338,10 @@ def rendered_sentence(sentence, abbrs=None, fmt='long'):
         for morpheme, gloss in zip(analyzed.split('\t'), glossed.split('\t')):
             units.append(HTML.div(
                 HTML.div(literal(morpheme), class_='morpheme'),
-                HTML.div(*gloss_with_tooltip(gloss), **{'class': 'gloss'}),
+                HTML.div(*gloss_with_tooltip(gloss, abbrs), **{'class': 'gloss'}),
                 class_='gloss-unit'))
 
-    return HTML.p(
+    res = HTML.p(
         HTML.div(
             HTML.div(
                 HTML.div(literal(sentence.markup_text or sentence.name), class_='object-language'),
@@ -269,6 +357,20 @@ def rendered_sentence(sentence, abbrs=None, fmt='long'):
         ),
         class_="sentence",
     )
+    if key is not None and sentence.pk is not None:
+        SENTENCE_CACHE.put_sentence(key, res)
+    return res
+
+
+def rendered_sentences(sentences, fmt='long'):
+    """Render a list of sentences, retrieving the gloss abbreviations for all related
+    languages in one query.
+
+    :return: list of rendered sentences.
+    """
+    sentences = list(sentences)
+    SENTENCE_CACHE.load_abbrs(s.language_pk for s in sentences)
+    return [rendered_sentence(s, fmt=fmt) for s in sentences]
 
 
 def icon(class_, inverted=False, **kw):
@@ -293,6 +293,52 @@ def _attr_decode(v):
         return v
 
 
+# We cache the sorted attribute names and the format string for each set of attribute
+# names encountered, thus the attributes of tags created repeatedly with the same
+# keyword arguments - e.g. links in DataTables - don't have to be sorted again.
+_ATTRS_TEMPLATES = {}
+_ATTRS_TEMPLATES_MAX_SIZE = 1000
+
+
+def _attrs_template(names):
+    try:
+        return _ATTRS_TEMPLATES[names]
+    except KeyError:
+        if len(_ATTRS_TEMPLATES) >= _ATTRS_TEMPLATES_MAX_SIZE:
+            _ATTRS_TEMPLATES.clear()  # pragma: no cover
+        sorted_names = sorted(names)
+        res = _ATTRS_TEMPLATES[names] = (
+            sorted_names,
+            ''.join(' %s="%%s"' % _attr_decode(name) for name in sorted_names))
+        return res
+
+
+def _escape(s):
+    """Same as escape, but returning a plain unicode string rather than a literal; this
+    saves the overhead of creating intermediate literal objects when building tags.
+    """
+    if type(s) is not unicode:
+        if hasattr(s, '__html__'):
+            return s.__html__()
+        if s is None:
+            return ''
+        s = unicode(s)
+    return s.replace('&', '&amp;').replace('>', '&gt;').replace('<', '&lt;')\
+        .replace("'", '&#39;').replace('"', '&#34;')
+
+
+def _format_attrs(attrs):
+    """
+    :return: unicode string of formatted attributes.
+    """
+    if None in attrs.values():
+        attrs = dict((k, v) for k, v in attrs.items() if v is not None)
+    if not attrs:
+        return ''
+    names, template = _attrs_template(frozenset(attrs))
+    return template % tuple([_escape(attrs[name]) for name in names])
+
+
 def make_tag(tag, *args, **kw):
     if "c" in kw:  # pragma: no cover
         assert not args, "The special 'c' keyword argument cannot be used "\
@@ -300,22 +346,19 @@ def make_tag(tag, *args, **kw):
         args = kw.pop("c")
     closed = kw.pop("_closed", True)
     nl = kw.pop("_nl", False)
-    attrs_str = format_attrs(**kw)
+    attrs_str = _format_attrs(kw) if kw else ''
     if not args and tag in empty_tags and closed:
-        substr = '<%s%s />'
-        html = literal(substr % (tag, attrs_str))
+        html = '<%s%s />' % (tag, attrs_str)
     else:
         chunks = ["<%s%s>" % (tag, attrs_str)]
-        chunks.extend(escape(x) for x in args)
+        chunks.extend([_escape(x) for x in args])
         if closed:
             chunks.append("</%s>" % tag)
-        if nl:
-            html = "\n".join(chunks)  # pragma: no cover
-        else:
-            html = "".join(chunks)
+        html = ("\n" if nl else "").join(chunks)
     if nl:
         html += "\n"
-    return literal(html)
+    # html is a unicode string, so we can bypass the checks in literal.__new__
+    return unicode.__new__(literal, html)
 
 
 def format_attrs(**attrs):
@@ -330,11 +373,7 @@ def format_attrs(**attrs):
     >>> assert format_attrs(p=2, q=None) == literal(' p="2"')
     >>> assert format_attrs(p=None) == literal('')
     """
-    strings = [
-        ' %s="%s"' % (_attr_decode(attr), escape(value))
-        for attr, value in sorted(attrs.items())
-        if value is not None]
-    return literal("".join(strings))
+    return literal(_format_attrs(attrs))
 
 
 empty_tags = set([
@@ -1,7 +1,9 @@
 from json import dumps
 import re
+import mimetypes
 
-from pyramid.response import Response
+from path import path
+from pyramid.response import Response, FileResponse
 from pyramid.httpexceptions import (
     HTTPNotAcceptable, HTTPFound, HTTPNotFound, HTTPMultipleChoices,
 )
@@ -37,7 +39,7 @@ def resource_view(ctx, req):
 
 def datatable_xhr_view(ctx, req):
     # call get_query, thereby - as side effect - making sure, the counts are set.
-    items = ctx.get_query()
+    items = ctx.load_rows(ctx.get_query())
     if hasattr(ctx, 'row_class'):
         data = []
         for item in items:
@@ -78,6 +80,30 @@ def js(req):
     return Response('\n'.join(res), content_type="text/javascript")
 
 
+def bundle(req):
+    """Serve a content-hashed asset bundle, using a precompressed copy if possible.
+
+    Since the file name changes whenever the content does, responses can be cached
+    forever.
+    """
+    fname = path(req.registry.settings['clld.assets_directory']).joinpath(
+        req.matchdict['type'], 'packed.%(version)s.%(ext)s' % req.matchdict)
+    content_type = mimetypes.guess_type(fname)[0]
+    for encoding, ext in [('br', '.br'), ('gzip', '.gz')]:
+        if encoding in req.accept_encoding and fname.exists() \
+                and path(fname + ext).exists():
+            res = FileResponse(
+                fname + ext, req, content_type=content_type, content_encoding=encoding)
+            break
+    else:
+        if not fname.exists():
+            return HTTPNotFound()
+        res = FileResponse(fname, req, content_type=content_type)
+    res.vary = ('Accept-Encoding',)
+    res.cache_control = 'public, max-age=31536000, immutable'
+    return res
+
+
 def _raise(req):
     raise ValueError('test')
 
@@ -0,0 +1,175 @@
+"""
+A feed listing the resources created, updated or deleted since a point in time, allowing
+mirrors to keep up-to-date incrementally:
+
+    /changes?since=2014-01-31T12:00:00Z
+    /changes.jsonl?since=2014-01-31T12:00:00Z&limit=500
+    /changes.nt?since=2014-01-31&rsc=language
+
+Records are ordered by time of change, type and id; JSON lines records look like
+
+    {"change": "updated", "type": "language", "id": "abc", "url": "...",
+     "updated": "2014-02-01T10:11:12Z", "version": 2}
+
+with version given for versioned resources only.
+
+A response lists at most limit records - DEFAULT_LIMIT if not specified, MAX_LIMIT at
+most. If there may be more, the URL of the next page is sent in a Link header with
+rel="next"; it resumes the listing after the last record via a cursor parameter.
+"""
+import re
+from json import dumps
+from datetime import datetime
+from urllib import urlencode
+
+from pyramid.response import Response
+from pyramid.interfaces import IRoutesMapper
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+
+from clld import RESOURCES
+from clld.db.util import changes as model_changes
+from clld.lib.rdf import FORMATS
+from clld.web.views.olac import timestamp
+from clld.util import as_utc
+
+
+TIMESTAMP_PATTERN = re.compile(
+    '(?P<date>[0-9]{4}-[0-9]{2}-[0-9]{2})(T(?P<time>[0-9]{2}:[0-9]{2}(:[0-9]{2})?)Z?)?$')
+
+DCTERMS = 'http://purl.org/dc/terms/'
+OWL = 'http://www.w3.org/2002/07/owl#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+CURSOR_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def parse_timestamp(s):
+    """
+    >>> parse_timestamp('2014-01-31T10:00Z')
+    datetime.datetime(2014, 1, 31, 10, 0)
+    >>> parse_timestamp('2014-01-31')
+    datetime.datetime(2014, 1, 31, 0, 0)
+    """
+    match = TIMESTAMP_PATTERN.match(s)
+    if not match:
+        raise ValueError(s)
+    time = (match.group('time') or '00:00').split(':')
+    return datetime(*map(int, match.group('date').split('-') + time))
+
+
+def format_cursor(updated, type_, id_):
+    """
+    >>> format_cursor(datetime(2014, 1, 31, 10, 0, 0, 123), 'language', 'abc')
+    '2014-01-31T10:00:00.000123|language|abc'
+    """
+    return '|'.join([as_utc(updated).strftime(CURSOR_TIMESTAMP_FORMAT), type_, id_])
+
+
+def parse_cursor(s):
+    """
+    :return: triple (updated, type, id) of the last record of the previous page.
+
+    >>> parse_cursor('2014-01-31T10:00:00.000123|language|abc')[0]
+    datetime.datetime(2014, 1, 31, 10, 0, 0, 123)
+    """
+    parts = s.split('|', 2)
+    if len(parts) != 3:
+        raise ValueError(s)
+    return (datetime.strptime(parts[0], CURSOR_TIMESTAMP_FORMAT),) + tuple(parts[1:])
+
+
+def get_changes(req):
+    """
+    :return: pair (items, next_url) of the list of dicts describing changed resources \
+    and the URL of the next page or None.
+    """
+    try:
+        limit = min(int(req.params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise HTTPBadRequest('invalid limit: %s' % req.params['limit'])
+
+    since, cursor_type, cursor_id = None, None, None
+    if req.params.get('cursor'):
+        try:
+            since, cursor_type, cursor_id = parse_cursor(req.params['cursor'])
+        except ValueError:
+            raise HTTPBadRequest('invalid cursor: %s' % req.params['cursor'])
+    elif req.params.get('since'):
+        try:
+            since = parse_timestamp(req.params['since'])
+        except ValueError:
+            raise HTTPBadRequest('invalid timestamp: %s' % req.params['since'])
+
+    res = []
+    mapper = req.registry.getUtility(IRoutesMapper)
+    for rsc in RESOURCES:
+        if req.params.get('rsc') and req.params['rsc'] != rsc.name:
+            continue
+        if not mapper.get_route(rsc.name):
+            # resources may be registered without routes, e.g. by apps or tests.
+            continue
+        # when resuming, changes at the time of the cursor are listed for the types and
+        # ids sorting after the last record of the previous page:
+        since_id = None
+        if cursor_type is not None and rsc.name >= cursor_type:
+            since_id = cursor_id if rsc.name == cursor_type else ''
+        for change, id_, updated, version in model_changes(
+                rsc.model, since, limit=limit, since_id=since_id):
+            res.append((as_utc(updated), rsc.name, id_, change, version))
+    res = sorted(res)[:limit]
+
+    items = []
+    for updated, type_, id_, change, version in res:
+        item = dict(
+            change=change,
+            type=type_,
+            id=id_,
+            url=req.route_url(type_, id=id_),
+            updated=timestamp(updated.replace(tzinfo=None)))
+        if version is not None:
+            item['version'] = version
+        items.append(item)
+
+    next_url = None
+    if len(res) == limit:
+        params = dict(
+            (k, v) for k, v in req.params.items() if k not in ['since', 'cursor'])
+        params['cursor'] = format_cursor(*res[-1][:3])
+        next_url = '%s?%s' % (req.path_url, urlencode(sorted(params.items())))
+    return items, next_url
+
+
+def _triples(item):
+    literal = lambda v, t: '"%s"^^<%s%s>' % (v, XSD, t)
+    yield (
+        DCTERMS + ('created' if item['change'] == 'created' else 'modified'),
+        literal(item['updated'], 'dateTime'))
+    if item['change'] == 'deleted':
+        yield OWL + 'deprecated', literal('true', 'boolean')
+    if 'version' in item:
+        yield OWL + 'versionInfo', '"%s"' % item['version']
+
+
+def changes(req):
+    ext = req.matchdict.get('ext', 'jsonl')
+    if ext not in ['jsonl', 'nt']:
+        raise HTTPNotFound()
+    # the changes are retrieved while handling the request, only serialization is
+    # deferred to streaming the response.
+    items, next_url = get_changes(req)
+    if ext == 'nt':
+        app_iter = (
+            '<%s> <%s> %s .\n' % (item['url'], p, o)
+            for item in items for p, o in _triples(item))
+        content_type = FORMATS['nt'].mimetype
+    else:
+        app_iter = (dumps(item) + '\n' for item in items)
+        content_type = 'application/x-jsonlines'
+    res = Response(app_iter=app_iter, content_type=content_type, charset='utf-8')
+    if next_url:
+        res.headers['Link'] = '<%s>; rel="next"' % next_url
+    return res
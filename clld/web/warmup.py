@@ -0,0 +1,323 @@
+"""
+Preparing an app to serve requests without first-hit latencies.
+
+Mako templates are compiled when they are first rendered. If the setting
+mako.module_directory is configured, the compiled templates are written to this directory
+and imported from there by subsequent processes - as long as the template source has
+not changed. Thus, running compile_templates at build time spares each worker compiling
+the templates; the settings
+
+- clld.load_templates = true  (load all templates when the app is created)
+- clld.warm_up = true  (also request one object of each resource in each representation)
+
+make workers do the remaining work before accepting traffic.
+
+The caches filled while serving - fragment caches, compiled datatables, and any HTTP
+cache in front of the app - are best primed by replaying the most popular requests, as
+recorded in the web server's access log, or the pages listed in the sitemap; setting
+
+- clld.prime_urls = sitemap  (or paths of access log files)
+- clld.prime_top = 100  (number of URLs to replay)
+
+makes the app replay these URLs when it is created, i.e. - for pre-forking servers -
+before the workers are forked. The prime_caches script replays URLs against an app or - to
+prime an HTTP cache - against a running server, and reports the latencies per route.
+"""
+import os
+import re
+import gzip
+import math
+import time
+import logging
+import threading
+import urllib2
+from Queue import Queue
+from collections import Counter, defaultdict
+from xml.etree import cElementTree as et
+
+from purl import URL
+
+from mako.exceptions import TopLevelLookupException
+from pyramid.renderers import get_renderer
+from pyramid.request import Request
+from pyramid.interfaces import IRequestFactory, IRoutesMapper
+from pyramid.settings import asbool, aslist
+from pyramid.scripting import prepare
+
+from clld import RESOURCES
+from clld import interfaces
+from clld.db.meta import DBSession
+from clld.web.adapters import get_adapters
+
+
+log = logging.getLogger(__name__)
+
+# request line and status of the "combined" log format of nginx:
+LOG_PATTERN = re.compile(
+    '"(?P<method>[A-Z]+) (?P<path>/\\S*) HTTP/[0-9.]+" (?P<status>[0-9]{3}) ')
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+
+def template_lookup(registry):
+    """
+    :return: the mako TemplateLookup used by the mako renderer of the app.
+    """
+    # the lookup is created - and registered - with the first mako renderer.
+    env = prepare(registry=registry)
+    try:
+        return get_renderer('lookup.mako').lookup
+    finally:
+        env['closer']()
+
+
+def template_uris(registry):
+    """
+    :return: sorted list of the URIs of all mako templates in the template directories \
+    and of the templates of all registered adapters.
+    """
+    lookup = template_lookup(registry)
+    res = set()
+    for directory in lookup.directories:
+        for root, dirs, files in os.walk(directory):
+            for fname in files:
+                if fname.endswith('.mako'):
+                    res.add(os.path.relpath(
+                        os.path.join(root, fname), directory).replace(os.sep, '/'))
+
+    for reg in registry.registeredAdapters():
+        template = getattr(reg.factory, 'template', None)
+        if template and template.endswith('.mako'):
+            res.add(template)
+    return sorted(res)
+
+
+def compile_templates(registry):
+    """Load - and compile, if necessary - all mako templates of the app.
+
+    :return: pair (list of URIs of loaded templates, dict mapping URIs to errors).
+
+    .. note:: Adapters may be registered for templates which do not exist, e.g. snippets;
+        these are skipped.
+    """
+    lookup = template_lookup(registry)
+    loaded, errors = [], {}
+    for uri in template_uris(registry):
+        try:
+            lookup.get_template(uri)
+            loaded.append(uri)
+        except TopLevelLookupException:
+            continue
+        except Exception as e:
+            errors[uri] = e
+            log.warn('could not compile template %s: %s' % (uri, e))
+    return loaded, errors
+
+
+def warm_up(app):
+    """Request the first object of each resource in each of its representations.
+
+    :param app: the pyramid router of the app.
+    :return: pair (number of requests, dict mapping (resource, mimetype) to errors).
+    """
+    env = prepare(registry=app.registry)
+    req, count, errors = env['request'], 0, {}
+    request_factory = app.registry.queryUtility(IRequestFactory, default=Request)
+    try:
+        for rsc in RESOURCES:
+            obj = DBSession.query(rsc.model).first()
+            if obj is None:
+                continue
+            for name, adapter in get_adapters(interfaces.IRepresentation, obj, req):
+                if '/' in name:
+                    subreq = request_factory.blank(
+                        req.resource_path(obj), headers={'Accept': name})
+                else:
+                    # adapters not named by mimetype can only be requested by extension.
+                    subreq = request_factory.blank(
+                        req.resource_path(obj, ext=adapter.extension))
+                try:
+                    res = app.invoke_subrequest(subreq)
+                    if res.status_int >= 400:
+                        raise ValueError(res.status)
+                    count += 1
+                except TopLevelLookupException:
+                    continue
+                except Exception as e:
+                    errors[(rsc.name, name)] = e
+                    log.warn('could not render %s as %s: %s' % (rsc.name, name, e))
+    finally:
+        # we do not want to hand a connection or any objects to forked workers.
+        DBSession.remove()
+        env['closer']()
+    return count, errors
+
+
+def log_lines(fnames):
+    """
+    :return: generator of the lines of access log files - rotated files may be gzipped.
+    """
+    for fname in fnames:
+        with (gzip.open if fname.endswith('.gz') else open)(fname) as fp:
+            for line in fp:
+                yield line
+
+
+def top_urls(lines, n=100):
+    """
+    :return: list of the paths of the n most requested pages in an access log.
+
+    >>> top_urls([
+    ...     '1.2.3.4 - - [31/Jan/2014:10:00:00 +0100] "GET /a HTTP/1.1" 200 5 "-" "-"',
+    ...     '1.2.3.4 - - [31/Jan/2014:10:00:00 +0100] "GET /b HTTP/1.1" 200 5 "-" "-"',
+    ...     '1.2.3.4 - - [31/Jan/2014:10:00:00 +0100] "GET /b HTTP/1.1" 200 5 "-" "-"',
+    ...     '1.2.3.4 - - [31/Jan/2014:10:00:00 +0100] "GET /c HTTP/1.1" 404 5 "-" "-"',
+    ...     '1.2.3.4 - - [31/Jan/2014:10:00:00 +0100] "POST /d HTTP/1.1" 200 5 "-" "-"'])
+    ['/b', '/a']
+    """
+    counts = Counter()
+    for line in lines:
+        match = LOG_PATTERN.search(line)
+        if match and match.group('method') == 'GET' and match.group('status') == '200':
+            counts[match.group('path')] += 1
+    return [url for url, count in counts.most_common(n)]
+
+
+def sitemap_urls(app, n=100):
+    """
+    :return: list of the paths of the first n pages listed in the sitemaps of an app.
+    """
+    request_factory = app.registry.queryUtility(IRequestFactory, default=Request)
+
+    def locs(path):
+        res = app.invoke_subrequest(request_factory.blank(path))
+        if res.status_int != 200:
+            return []
+        return [URL(e.text).path() for e in et.fromstring(res.body).iter()
+                if e.tag == SITEMAP_NS + 'loc']
+
+    urls = []
+    for sitemap in locs('/sitemap.xml'):
+        urls.extend(locs(sitemap))
+        if len(urls) >= n:
+            break
+    return urls[:n]
+
+
+def percentile(values, p):
+    """
+    :return: the p-th percentile of values, by the nearest-rank method.
+
+    >>> percentile([4, 1, 3, 2], 50)
+    2
+    >>> percentile([4, 1, 3, 2], 99)
+    4
+    """
+    values = sorted(values)
+    return values[max(0, int(math.ceil(p / 100.0 * len(values))) - 1)]
+
+
+def replay(app, urls, concurrency=4, base_url=None):
+    """Request URLs from an app - in-process or, if base_url is given, over HTTP.
+
+    :param concurrency: number of threads sending requests; if 1, requests are sent from \
+    the calling thread.
+    :return: dict mapping route names to lists of pairs (status code, latency in seconds).
+    """
+    mapper = app.registry.getUtility(IRoutesMapper)
+    request_factory = app.registry.queryUtility(IRequestFactory, default=Request)
+    stats = defaultdict(list)
+
+    def request(url):
+        route = mapper(request_factory.blank(url))['route']
+        start = time.time()
+        try:
+            if base_url:
+                status = urllib2.urlopen(base_url.rstrip('/') + url).getcode()
+            else:
+                status = app.invoke_subrequest(request_factory.blank(url)).status_int
+        except urllib2.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            log.warn('could not request %s: %s' % (url, e))
+            status = 500
+        stats[route.name if route else None].append((status, time.time() - start))
+
+    if concurrency == 1:
+        for url in urls:
+            request(url)
+        return stats
+
+    queue = Queue()
+
+    def work():
+        try:
+            while True:
+                url = queue.get()
+                if url is None:
+                    break
+                request(url)
+        finally:
+            DBSession.remove()
+
+    threads = [threading.Thread(target=work) for i in range(concurrency)]
+    for url in urls:
+        queue.put(url)
+    for thread in threads:
+        queue.put(None)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def report(stats, percentiles=(50, 90, 99)):
+    """
+    :return: list of rows (route, number of requests, number of errors, latency \
+    percentiles in milliseconds), ordered by total latency.
+    """
+    rows = []
+    for route, results in stats.items():
+        latencies = [latency for status, latency in results]
+        rows.append(
+            [route or '-', len(results), len([s for s, l in results if s >= 400])]
+            + [int(percentile(latencies, p) * 1000) for p in percentiles]
+            + [sum(latencies)])
+    return [row[:-1] for row in sorted(rows, key=lambda r: r[-1], reverse=True)]
+
+
+def prime_urls(app, sources, n=100):
+    """
+    :param sources: ['sitemap'] or list of paths of access log files.
+    :return: list of the n URLs to replay.
+    """
+    if 'sitemap' in sources:
+        return sitemap_urls(app, n)
+    return top_urls(log_lines(sources), n)
+
+
+# settings disabling all of the above, for scripts which load the app for other purposes:
+NO_WARM_UP = {
+    'clld.load_templates': 'false', 'clld.warm_up': 'false', 'clld.prime_urls': ''}
+
+
+def prepare_app(event):
+    """Subscriber for ApplicationCreated, loading templates and warming up according to
+    the app settings.
+    """
+    registry = event.app.registry
+    settings = registry.settings or {}
+    warm_up_ = asbool(settings.get('clld.warm_up'))
+    if asbool(settings.get('clld.load_templates')) or warm_up_:
+        loaded, errors = compile_templates(registry)
+        log.info('loaded %s templates' % len(loaded))
+    if warm_up_:
+        count, errors = warm_up(event.app)
+        log.info('warmed up with %s renderings' % count)
+    if settings.get('clld.prime_urls'):
+        urls = prime_urls(
+            event.app,
+            aslist(settings['clld.prime_urls']),
+            int(settings.get('clld.prime_top', 100)))
+        replay(event.app, urls)
+        DBSession.remove()
+        log.info('primed caches with %s requests' % len(urls))
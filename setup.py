@@ -37,6 +37,7 @@ install_requires = [
     'webassets',
     'yuicompressor',
     'markupsafe',
+    'repoze.lru',
     'requests',
     'rdflib',
     'colander',
@@ -104,5 +105,7 @@ setup(name='clld',
       entry_points = """\
         [pyramid.scaffold]
         clld_app=clld.scaffolds:ClldAppTemplate
+        [paste.server_runner]
+        prefork=clld.web.server:server_runner
       """
       )